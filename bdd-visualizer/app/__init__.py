@@ -1,12 +1,20 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .api import routes_bdd, routes_export, routes_utils
+from .utils import shutdown_process_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_process_pool()
 
 def create_app() -> FastAPI:
     """App factory to create FastAPI instance."""
     app = FastAPI(
         title="BDD/ROBDD Engine API",
         description="Backend service for BDD/ROBDD generation, and LaTeX/TikZ export.",
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=lifespan
     )
 
     app.include_router(routes_utils.router, tags=["Utils"])
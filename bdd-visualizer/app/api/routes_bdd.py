@@ -1,21 +1,324 @@
-from fastapi import APIRouter, Body
-#from fastapi import Request
+import os
+import json
+import base64
+import random
+import numpy as np
+import time
+import asyncio
+from fractions import Fraction
+from fastapi import APIRouter, Body, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
+from concurrent.futures.process import BrokenProcessPool
 from app.utils import*
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.core import*
+from app.core.reorder import seed_jobs, search_seed, merge_seeds, DEFAULT_SEEDS, STRATEGIES
+from app.core.jobs import build_job, batch_build_job, operation_job, construct_job
+from app.core.ops import OPERATORS, QUANTIFIERS, merge_orders
+from app.core.checks import BINARY_CHECKS, check_roots
+from app.utils.wire import check_format, make_etag, etag_matches, not_modified, wire_response
+from app.core.evaluate import CompiledBDD, ColumnError
+from app.core.truthtable import EngineError
+from app.core import analysis
 
 router = APIRouter()
 logger = get_logger('BDD API')
+builds = SingleFlight("builds")
+BATCH_MAX_ITEMS = int(os.getenv("BDD_BATCH_MAX_ITEMS", 500))
+# seeds of auto_order 'parallel': on several workers every seed job must fit in the queue at once,
+# otherwise they run one after the other in a single job
+SEEDS_MAX = QUEUE_SIZE if POOL_WORKERS > 1 else int(os.getenv("BDD_SEEDS_MAX", 64))
+# flat arrays of recently evaluated diagrams, keyed by structure and number of variables
+compiled_cache = LRUCache(int(os.getenv("BDD_COMPILED_CACHE_SIZE", 64)))
+SAMPLE_MAX = int(os.getenv("BDD_SAMPLE_MAX", 10000))
+# diagram id -> {"formula", "var_order"}, see register_diagram
+diagram_ids = LRUCache(int(os.getenv("BDD_DIAGRAM_IDS", 4096)))
+# results of /equivalent, /implies, /tautology and /satisfiable
+check_cache = LRUCache(int(os.getenv("BDD_CHECK_CACHE_SIZE", 4096)))
+
+def parse_canonical(formula_str):
+    """(AST, canonical string, {var: canonical var}) of a formula."""
+    ast = parse_formula(formula_str)
+    canon_str, _, canon = canonical_form(ast, BDD_Cache.RENAME)
+    return ast, canon_str, canon
+
+def cache_config(formula_str, graph_type="robdd", var_order=None, auto_order=None, parsed=None, engine="apply",
+                 search=None):
+    """
+    Parsed formula, {var: canonical var}, effective variable order and cache key of a build.
+    Equivalent inputs (operand order, parentheses, variable names) share one key.
+    A string var_order may name only some variables, a list must be a permutation of them, auto_order one
+    of reorder.STRATEGIES (else OrderError), engine one of BDD.ENGINES that can build it (else EngineError).
+    parsed is parse_canonical(formula_str) when already known, search the (seeds, time_budget, node_budget)
+    of the auto_order search.
+    """
+    message = check_auto_order(auto_order)
+    if message:
+        raise OrderError(message)
+    var_name = get_var_name(formula_str)
+    if var_order:
+        if isinstance(var_order, str):
+            var_name = get_var_order(var_name, var_order)
+        else:
+            check_var_order(var_name, var_order)
+            var_name = list(var_order)
+    ast, canon_str, canon = parsed if parsed is not None else parse_canonical(formula_str)
+    BDD.check_engine(engine, len(var_name))
+    cache_key = BDD_Cache.make_key(canon_str, [canon[v] for v in var_name], auto_order, graph_type, engine, search)
+    return ast, canon, var_name, cache_key
+
+def robdd_store_key(cache_key):
+    # both graph types are derived from the same ROBDD, the search parameters of auto_order select it too
+    search = cache_key[5]
+    return DiskStore.key("robdd", cache_key[:3] if search is None else cache_key[:3] + (search,))
+
+def load_stored(formula_str, ast, canon, cache_key, engine="apply"):
+    """Diagram of cache_key from the disk store (built by any worker), added to the memory cache. None if not stored."""
+    data = DiskStore.get("robdd", robdd_store_key(cache_key))
+    if data is None:
+        return None
+    bdd = BDD.load(formula_str, data, ast, canon, cache_key[3] == "robdd", engine)
+    return BDD_Cache.add_to_cache(cache_key, bdd, bdd.size())
+
+class FieldError(ValueError):
+    """A request field of the wrong type or out of range."""
+
+def error_status(e):
+    """
+    (HTTP status, message) of an error, 500 unless the formula does not parse or is too deep to process,
+    the variable order, the engine or the input columns do not fit it, a field is invalid, or the pool job failed on capacity, deadline
+    or cancellation.
+    """
+    if isinstance(e, (FormulaError, OrderError, ColumnError, EngineError, FieldError)):
+        return 400, str(e)
+    if isinstance(e, RecursionError):
+        # the parser and the diagram walks are iterative, this is a label or layout library giving up
+        return 422, "Diagram too deep to process"
+    if isinstance(e, QueueFull):
+        return 429, str(e)
+    if isinstance(e, BrokenProcessPool):
+        return 503, "Worker pool unavailable, try again later"
+    if isinstance(e, TimeoutError):
+        return 504, "Request deadline exceeded"
+    if isinstance(e, JobCancelled):
+        # nobody reads it, the client is gone
+        return 499, str(e)
+    return 500, str(e)
+
+def pool_error(e):
+    """Response for an invalid formula or order, or a pool job failed on capacity, deadline or cancellation, None for other errors."""
+    status, message = error_status(e)
+    if status == 500:
+        return None
+    headers = {"Retry-After": "1"} if status in (429, 503) else None
+    return JSONResponse(status_code=status, headers=headers, content={"status": "error", "message": message})
+
+async def build_serialized(formula_str, ast, var_name, canon, auto_order=None, time_budget=None, node_budget=None,
+                           seeds=None, engine="apply", timeout=None, is_disconnected=None):
+    """
+    Build stage on the process pool, return BDD.serialize() data.
+    auto_order 'parallel' runs its seeds as separate pool jobs, then builds the best order. With a single
+    worker the fan-out gains nothing: the seeds run one after the other in one job, holding one queue slot.
+    """
+    if auto_order != "parallel" or POOL_WORKERS == 1:
+        return await run_in_pool(build_job, formula_str, var_name, canon, auto_order, time_budget, node_budget,
+                                 seeds, engine, timeout=timeout, is_disconnected=is_disconnected)
+    start = time.perf_counter()
+    deadline = time.time() + min(timeout or REQUEST_TIMEOUT, REQUEST_TIMEOUT)
+    jobs = seed_jobs(ast, formula_str, var_name, n_seeds=seeds or min(DEFAULT_SEEDS, SEEDS_MAX),
+                     time_budget=time_budget, node_budget=node_budget)
+    results = await pool_map(search_seed, [(job,) for job in jobs], deadline - time.time(), is_disconnected)
+    info = merge_seeds(results, "sift", start)
+    return await run_in_pool(build_job, formula_str, info["order"], canon, None, None, None, None, engine, info,
+                             timeout=max(deadline - time.time(), 0.001), is_disconnected=is_disconnected)
+
+def check_seeds(seeds):
+    """
+    Error message for a 'seeds' field the queue cannot take at once (each seed is a pool job, a request
+    above QUEUE_SIZE would be refused however idle the server is), None when it is fine.
+    """
+    if seeds is None:
+        return None
+    if isinstance(seeds, bool) or not isinstance(seeds, int) or not 1 <= seeds <= SEEDS_MAX:
+        return f"'seeds' must be an integer between 1 and {SEEDS_MAX}, got {seeds!r}."
+    return None
+
+def check_paging(max_depth=None, page=None, page_size=None):
+    """Error message for 'max_depth', 'page' or 'page_size' fields that are not non-negative integers, None when they are fine."""
+    for name, x in (("max_depth", max_depth), ("page", page), ("page_size", page_size)):
+        if x is not None and (isinstance(x, bool) or not isinstance(x, int) or x < 0):
+            return f"'{name}' must be a non-negative integer, got {x!r}."
+    return None
+
+def check_auto_order(auto_order):
+    """Error message for an 'auto_order' field that is not one of reorder.STRATEGIES, None when it is fine."""
+    if not auto_order or auto_order in STRATEGIES:
+        return None
+    return f"Unknown 'auto_order' {auto_order!r}, expected one of {list(STRATEGIES)}."
+
+def positive_number(value, name, integer=False):
+    """
+    A request field as a number, numeric strings accepted: seconds > 0, or a positive integer when integer
+    is true. None stays None (no limit). FieldError with the message for anything else.
+    """
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        x = float(value)
+        if not x > 0 or (integer and x != int(x)):
+            raise ValueError
+    except (TypeError, ValueError, OverflowError):
+        kind = "a positive integer" if integer else "a positive number of seconds"
+        raise FieldError(f"'{name}' must be {kind}, got {value!r}.") from None
+    return int(x) if integer else x
+
+def parse_budgets(time_budget, node_budget):
+    """
+    (time_budget, node_budget) of a request as numbers: seconds > 0 and a positive integer number of nodes,
+    None for no limit. FieldError (a ValueError) with the message for anything else, see positive_number.
+    """
+    return positive_number(time_budget, "time_budget"), positive_number(node_budget, "node_budget", True)
+
+def parse_timeout(timeout):
+    """'timeout' of a request in seconds (capped at REQUEST_TIMEOUT by the pool), None for the default. FieldError otherwise."""
+    return positive_number(timeout, "timeout")
+
+def add_built(formula_str, ast, canon, cache_key, data, engine="apply"):
+    """Load a diagram built on the pool into the shared manager, the memory cache and the disk store."""
+    bdd = BDD.load(formula_str, data, ast, canon, cache_key[3] == "robdd", engine)
+    DiskStore.put("robdd", robdd_store_key(cache_key), data)
+    return BDD_Cache.add_to_cache(cache_key, bdd, bdd.size())
+
+def cached_diagram(formula_str, ast, canon, cache_key, engine="apply"):
+    bdd = BDD_Cache.get(cache_key)
+    if bdd is not None:
+        logger.info(f"Cache hit for {cache_key}")
+        return bdd
+    return load_stored(formula_str, ast, canon, cache_key, engine)
+
+def view_order(bdd, canon):
+    """Variable order of a cached diagram under the names of the formula canon belongs to (as BDD.view)."""
+    back = {c: v for v, c in canon.items()}
+    return [back[bdd.canon[v]] for v in bdd.var_name]
+
+def register_diagram(formula_str, var_name):
+    """
+    Id of a built diagram, its formula with its variable order, for the operation endpoints
+    (/apply, /restrict, ...). Kept in memory and in the disk store, the same diagram always gets the same id.
+    """
+    diagram_id = DiskStore.key("diagram", formula_str, list(var_name))[:16]
+    if diagram_ids.get(diagram_id) is None:
+        record = {"formula": formula_str, "var_order": list(var_name)}
+        diagram_ids.put(diagram_id, record)
+        DiskStore.put("diagram", diagram_id, record)
+    return diagram_id
+
+def find_diagram(diagram_id):
+    """{"formula", "var_order"} of a diagram id, None if unknown."""
+    record = diagram_ids.get(diagram_id)
+    if record is None:
+        record = DiskStore.get("diagram", diagram_id)
+        if record is not None:
+            diagram_ids.put(diagram_id, record)
+    return record
+
+def export_graph(bdd, formula_str, ast, canon, isROBDD, eval_path, labels, max_depth, page, page_size, graph_format="json"):
+    bdd = bdd.view(formula_str, ast, canon)
+    root = bdd.robdd_root if isROBDD else bdd.root
+    export = bdd.to_json if graph_format == "json" else bdd.to_columns
+    # cached diagrams are shared, highlight and export one request at a time
+    with bdd.lock:
+        bdd.eval_path(root, eval_path)
+        graph = export(root, 'ROBDD' if isROBDD else 'BDD', True,
+                       max_depth, (page or 0) * (page_size or 0), page_size, labels)
+    return graph, bdd.order_info
+
+async def get_built(formula_str, ast, canon, var_name, cache_key, auto_order=None, time_budget=None, node_budget=None,
+                    seeds=None, engine="apply", timeout=None, is_disconnected=None):
+    """
+    Cached diagram of a cache_config result, built on the process pool when it is not cached.
+    The diagram is acquired for the request: release() it once the response is made, an eviction
+    meanwhile then leaves its nodes alone.
+    """
+    async def get_diagram(is_disconnected):
+        bdd = await run_in_threadpool(cached_diagram, formula_str, ast, canon, cache_key, engine)
+        if bdd is None:
+            # CPU-bound, on the process pool so the event loop and other requests keep going
+            built = await build_serialized(formula_str, ast, var_name, canon, auto_order, time_budget, node_budget,
+                                           seeds, engine, timeout, is_disconnected)
+            bdd = await run_in_threadpool(add_built, formula_str, ast, canon, cache_key, built, engine)
+        return bdd
+
+    while True:
+        # identical concurrent builds run once, the other requests wait for it
+        bdd = await builds.do(cache_key, get_diagram, is_disconnected)
+        # each waiter takes its own reference, a diagram evicted before that is looked up again
+        if bdd.acquire():
+            return bdd
+
+async def generate(formula_str, graph_type="robdd", var_order=None, auto_order=None, seeds=None, time_budget=None,
+                   node_budget=None, eval_path=None, labels=True, engine="apply", max_depth=None, page=None,
+                   page_size=None, timeout=None, is_disconnected=None, parsed=None, graph_format="json",
+                   client_has=None):
+    """
+    Graph json of one /generate request, through the disk store, the memory cache and the process pool.
+    Return {"graph", "order_info", "size", "id", "etag"}, size is the number of ROBDD nodes, id the diagram id
+    of the operation endpoints (see register_diagram).
+    graph_format 'json' exports with to_json, 'columns' and 'msgpack' with to_columns.
+    client_has(etag) tells whether the client holds the response already: then only {"etag", "not_modified"}
+    is returned, without building anything.
+    """
+    isROBDD = graph_type == 'robdd'
+    ast, canon, var_name, cache_key = await run_in_threadpool(cache_config, formula_str, graph_type, var_order,
+                                                              auto_order, parsed, engine,
+                                                              (seeds, time_budget, node_budget))
+    columns = graph_format != "json"
+
+    # whole responses are kept on disk too, a repeated request skips build and export
+    json_key = DiskStore.key("json", cache_key, formula_str, eval_path, labels, max_depth, page, page_size, columns)
+    etag = make_etag(json_key, graph_format)
+    if client_has is not None and client_has(etag):
+        return {"etag": etag, "not_modified": True}
+    stored = await run_in_threadpool(DiskStore.get, "json", json_key)
+    if stored is not None and "id" in stored:
+        logger.info(f"Store hit for {cache_key}")
+        return dict(stored, etag=etag)
+
+    bdd = await get_built(formula_str, ast, canon, var_name, cache_key, auto_order, time_budget, node_budget, seeds,
+                          engine, timeout, is_disconnected)
+    try:
+        graph, order_info = await run_in_threadpool(export_graph, bdd, formula_str, ast, canon, isROBDD,
+                                                    eval_path, labels, max_depth, page, page_size,
+                                                    "columns" if columns else "json")
+        size = bdd.size()
+    finally:
+        bdd.release()
+    diagram_id = await run_in_threadpool(register_diagram, formula_str, view_order(bdd, canon))
+    res = {"graph": graph, "order_info": order_info, "size": size, "id": diagram_id}
+    await run_in_threadpool(DiskStore.put, "json", json_key, res)
+    return dict(res, etag=etag)
 
 @router.post("/generate")
-def generate_bdd(data: dict = Body(...)):
+async def generate_bdd(request: Request, data: dict = Body(...)):
     try:
         #data = request.json()
         formula_str = data.get("formula",None)   # 'a&b|c->~e<->f' - required
         graph_type = data.get("graph_type", "robdd")  # 'robdd' or 'bdd'
         var_order = data.get("var_order",None)   # 'x1 x3 x2'
-        auto_order = data.get("auto_order",None) # 'ls' or 'freq'
+        auto_order = data.get("auto_order",None) # 'freq', 'ls', 'sift', 'win2', 'win3', 'exact' or 'parallel'
+        seeds = data.get("seeds",None)           # restarts of auto_order 'parallel'
+        time_budget = data.get("time_budget",None)   # seconds
+        node_budget = data.get("node_budget",None)
         eval_path = data.get("eval_path",None)   # 'a:0 b:1 c:1'
+        labels = data.get("labels",True)         # true, false or 'sympy'
+        engine = data.get("engine","apply")      # 'apply' or 'truthtable'
+        max_depth = data.get("max_depth",None)   # export nodes up to this level
+        page = data.get("page",None)             # page number of page_size nodes
+        page_size = data.get("page_size",None)
+        timeout = data.get("timeout",None)       # seconds, deadline of the build
+        graph_format = data.get("format","json") # 'json', 'columns' or 'msgpack'
         #action = data.get("action")
         
         if not formula_str:
@@ -24,43 +327,927 @@ def generate_bdd(data: dict = Body(...)):
                 "message": "Missing 'formula' field."
             })
         formula_str = formula_str.replace(" ", "")
-        isROBDD = graph_type == 'robdd'
+        try:
+            check_format(graph_format)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "message": str(e)
+            })
+        message = check_seeds(seeds) or check_auto_order(auto_order) or check_paging(max_depth, page, page_size)
+        if message:
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "message": message
+            })
+        try:
+            time_budget, node_budget = parse_budgets(time_budget, node_budget)
+            timeout = parse_timeout(timeout)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "message": str(e)
+            })
 
+        out = await generate(formula_str, graph_type, var_order, auto_order, seeds, time_budget, node_budget, eval_path,
+                             labels, engine, max_depth, page, page_size, timeout, request.is_disconnected,
+                             graph_format=graph_format, client_has=lambda etag: etag_matches(request, etag))
+        if out.get("not_modified"):
+            return not_modified(out["etag"])
 
-        cache_key = f"{formula_str}"
+        #logger.info(f"Cache: {BDD_Cache.cache}")
+        res = {
+            "status": "success",
+            "graph_type": graph_type,
+            "formula": formula_str,
+            "id": out["id"],
+            "graph": out["graph"]
+        }
+        if auto_order:
+            res["order_info"] = out["order_info"]
+        return await run_in_threadpool(wire_response, request, res, graph_format, out["etag"])
 
-        if cache_key in BDD_Cache.cache:
-            logger.info(f"Cache hit for {cache_key}")
-            bdd = BDD_Cache.cache[cache_key]
-            if var_order:
-                bdd.var_name =get_var_order(bdd.var_name,var_order)
-            else:
-                bdd.var_name = get_var_name(formula_str)
-        else:
-            bdd = BDD(formula_str, var_order)
-            BDD_Cache.add_to_cache(cache_key, bdd)
+    except Exception as e:
+        response = pool_error(e)
+        if response is not None:
+            logger.warning(f"Generate not completed: {response.status_code} {e!r}")
+            return response
+        logger.exception("Error while generating BDD")
+        return JSONResponse(status_code=500, content={
+            "status": "error",
+            "message": str(e)
+        })
 
-        if auto_order:
-            bdd.auto_order(auto_order == 'ls', isROBDD)
-        elif isROBDD:
-            bdd.build_robdd()
-        else:
-            bdd.build_bdd()
+def compiled_diagram(bdd):
+    """
+    CompiledBDD of a diagram, shared by every diagram with the same structure and number of variables
+    (variables can drop out of an ROBDD, the same nodes then stand for functions of more variables).
+    """
+    key = (bdd.structure_hash(), len(bdd.var_name))
+    compiled = compiled_cache.get(key)
+    if compiled is None:
+        compiled = CompiledBDD.from_bdd(bdd)
+        compiled_cache.put(key, compiled)
+    return compiled
 
-        if eval_path:
-            bdd.eval_path(bdd.robdd_root if isROBDD else bdd.root, eval_path)
+def check_columns(variables, formula_vars):
+    """
+    Column names of a request, the formula variables formula_vars by default. ColumnError unless they are
+    distinct names and every formula variable has one, other columns are allowed (ignored or free).
+    """
+    if isinstance(variables, str):
+        variables = variables.split()
+    if not variables:
+        return list(formula_vars)
+    if not isinstance(variables, list) or not all(isinstance(v, str) for v in variables):
+        raise ColumnError(f"'variables' must be a list or a space separated string of names, got {variables!r}")
+    seen, repeated = set(), []
+    for v in variables:
+        if v in seen:
+            repeated.append(v)
+        seen.add(v)
+    if repeated:
+        raise ColumnError(f"Repeated columns {repeated}")
+    missing = [v for v in formula_vars if v not in seen]
+    if missing:
+        raise ColumnError(f"Missing columns for variables {missing}")
+    return variables
 
-        #logger.info(f"Cache: {BDD_Cache.cache}")
+def check_rows(width, assignments, packed, rows):
+    """
+    (packed rows, number of rows) of an /evaluate batch of width columns: 'assignments' are packed here,
+    'packed' is decoded from base64. ColumnError when the rows do not have width bits or rows does not
+    match the packed size.
+    """
+    if assignments is not None:
+        # '0110' per row, one character per column
+        if not isinstance(assignments, list) or not all(isinstance(a, str) for a in assignments):
+            raise ColumnError("'assignments' must be a list of strings of 0/1")
+        wrong = next((i for i, a in enumerate(assignments) if len(a) != width or a.strip("01")), None)
+        if wrong is not None:
+            raise ColumnError(f"Every assignment needs {width} bits of 0/1, row {wrong} is {assignments[wrong]!r}")
+        rows = len(assignments)
+        bits = np.frombuffer("".join(assignments).encode("ascii"), dtype=np.uint8).reshape(rows, width) - ord("0")
+        return np.packbits(bits, axis=1).tobytes(), rows
+    if isinstance(rows, bool) or not isinstance(rows, int) or rows < 0:
+        raise ColumnError(f"'rows' must be a non-negative integer, got {rows!r}")
+    try:
+        packed = base64.b64decode(packed, validate=True)
+    except (TypeError, ValueError):
+        raise ColumnError("'packed' is not base64") from None
+    stride = (width + 7) // 8
+    if len(packed) != rows * stride:
+        raise ColumnError(f"Expected {rows * stride} bytes for {rows} rows of {width} bits, got {len(packed)}")
+    return packed, rows
+
+def column_levels(view, variables):
+    """Level of the variable of each column (-1 when the formula does not use it), every variable needs a column."""
+    level = {v: i for i, v in enumerate(view.var_name)}
+    missing = [v for v in view.var_name if v not in variables]
+    if missing:
+        raise ColumnError(f"Missing columns for variables {missing}")
+    return [level.get(v, -1) for v in variables]
+
+def evaluate_rows(bdd, formula_str, ast, canon, variables, packed, rows):
+    """(packed output bits, number of true rows) of a batch checked by check_rows, see /evaluate."""
+    view = bdd.view(formula_str, ast, canon)
+    return compiled_diagram(view).evaluate_packed(packed, rows, column_levels(view, variables))
+
+@router.post("/evaluate")
+async def evaluate(request: Request, data: dict = Body(...)):
+    """
+    Output of the formula for a batch of assignments, walked on a compiled ROBDD with NumPy,
+    all rows at once. The diagram is built (or taken from the cache) as by /generate.
+    """
+    try:
+        formula_str = data.get("formula",None)   # required
+        var_order = data.get("var_order",None)   # build options, as in /generate
+        auto_order = data.get("auto_order",None)
+        engine = data.get("engine","apply")
+        timeout = parse_timeout(data.get("timeout",None))
+        variables = data.get("variables",None)   # column names, default: formula variables by first occurrence
+        assignments = data.get("assignments",None)   # ['0110', '1011', ...], or
+        packed = data.get("packed",None)         # base64 of rows packed MSB first (np.packbits(..., axis=1))
+        rows = data.get("rows",None)             # number of packed rows
+
+        if not formula_str or (assignments is None and (packed is None or rows is None)):
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "message": "Expected 'formula' and 'assignments', or 'packed' with 'rows'."
+            })
+        formula_str = formula_str.replace(" ", "")
+
+        ast, canon, var_name, cache_key = await run_in_threadpool(cache_config, formula_str, "robdd", var_order,
+                                                                  auto_order, None, engine)
+        # a batch that does not fit the formula is refused before anything is built
+        variables = check_columns(variables, get_var_name(formula_str))
+        packed, rows = await run_in_threadpool(check_rows, len(variables), assignments, packed, rows)
+        bdd = await get_built(formula_str, ast, canon, var_name, cache_key, auto_order, engine=engine, timeout=timeout,
+                              is_disconnected=request.is_disconnected)
+        try:
+            out, ones = await run_in_threadpool(evaluate_rows, bdd, formula_str, ast, canon, variables, packed, rows)
+        finally:
+            bdd.release()
+        res = {
+            "status": "success",
+            "formula": formula_str,
+            "variables": variables,
+            "rows": rows,
+            "ones": ones,
+            "packed": base64.b64encode(out.tobytes()).decode("ascii"),
+        }
+        if assignments is not None:
+            res["results"] = "".join(map(str, np.unpackbits(out, count=res["rows"])))
+        return res
+
+    except Exception as e:
+        response = pool_error(e)
+        if response is not None:
+            return response
+        logger.exception("Error while evaluating")
+        return JSONResponse(status_code=500, content={
+            "status": "error",
+            "message": str(e)
+        })
+
+def analysis_columns(bdd, formula_str, ast, canon, variables):
+    """(CompiledBDD, column levels) of a built diagram for /satcount, /probability, /sample and /cubes."""
+    view = bdd.view(formula_str, ast, canon)
+    return compiled_diagram(view), column_levels(view, variables)
+
+async def analysis_target(request, data):
+    """
+    (formula, variables, CompiledBDD, column levels) of the request, the diagram is built (or taken
+    from the cache) as by /generate. None when the formula is missing.
+    """
+    formula_str = data.get("formula",None)
+    if not formula_str:
+        return None
+    formula_str = formula_str.replace(" ", "")
+    variables = data.get("variables",None)   # output columns, default: formula variables by first occurrence
+    auto_order = data.get("auto_order",None)
+    engine = data.get("engine","apply")
+    ast, canon, var_name, cache_key = await run_in_threadpool(cache_config, formula_str, "robdd",
+                                                              data.get("var_order",None), auto_order, None, engine)
+    variables = check_columns(variables, get_var_name(formula_str))
+    bdd = await get_built(formula_str, ast, canon, var_name, cache_key, auto_order, engine=engine,
+                          timeout=parse_timeout(data.get("timeout",None)), is_disconnected=request.is_disconnected)
+    try:
+        # the compiled arrays are a copy, the diagram is not read after this
+        compiled, columns = await run_in_threadpool(analysis_columns, bdd, formula_str, ast, canon, variables)
+    finally:
+        bdd.release()
+    return formula_str, variables, compiled, columns
+
+def missing_formula():
+    return JSONResponse(status_code=400, content={
+        "status": "error",
+        "message": "Missing 'formula' field."
+    })
+
+def analysis_error(e, what):
+    response = pool_error(e)
+    if response is not None:
+        return response
+    logger.exception(f"Error while {what}")
+    return JSONResponse(status_code=500, content={
+        "status": "error",
+        "message": str(e)
+    })
+
+@router.post("/satcount")
+async def satcount(request: Request, data: dict = Body(...)):
+    """Number of satisfying assignments over the columns, counted on the ROBDD in one pass."""
+    try:
+        target = await analysis_target(request, data)
+        if target is None:
+            return missing_formula()
+        formula_str, variables, compiled, columns = target
+        count = await run_in_threadpool(analysis.satcount, compiled)
+        # columns the formula does not use are free
+        count <<= columns.count(-1)
         return {
             "status": "success",
-            "graph_type": graph_type,
             "formula": formula_str,
-            "graph": bdd.to_json(bdd.robdd_root if isROBDD else bdd.root,'ROBDD' if isROBDD else 'BDD', True)
+            "variables": variables,
+            "count": str(count),
+            # exact ratio then rounded, count and 2^columns can be beyond float range
+            "fraction": float(Fraction(count, 1 << len(variables))),
         }
+    except Exception as e:
+        return analysis_error(e, "counting")
 
+@router.post("/probability")
+async def probability(request: Request, data: dict = Body(...)):
+    """Probability that the formula holds when each variable is true independently with a given probability."""
+    try:
+        weights = data.get("weights",None) or {}    # {var: probability of 1}, default: 0.5
+        if not isinstance(weights, dict):
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "message": f"'weights' must be an object {{variable: probability}}, got {weights!r}."
+            })
+        bad = {v: p for v, p in weights.items() if not isinstance(p, (int, float)) or not 0 <= p <= 1}
+        if bad:
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "message": f"Weights must be probabilities between 0 and 1, got {bad}."
+            })
+        target = await analysis_target(request, data)
+        if target is None:
+            return missing_formula()
+        formula_str, variables, compiled, columns = target
+        p = [0.5] * compiled.n_vars
+        for v, lvl in zip(variables, columns):
+            if lvl >= 0:
+                p[lvl] = float(weights.get(v, 0.5))
+        return {
+            "status": "success",
+            "formula": formula_str,
+            "variables": variables,
+            "probability": await run_in_threadpool(analysis.probability, compiled, p),
+        }
     except Exception as e:
-        logger.exception("Error while generating BDD")
+        return analysis_error(e, "computing a probability")
+
+@router.post("/sample")
+async def sample(request: Request, data: dict = Body(...)):
+    """Satisfying assignments drawn uniformly at random, as bit strings over the columns."""
+    try:
+        k = data.get("k",1)                 # number of samples
+        seed = data.get("seed",None)        # integer or string, for a reproducible draw
+        if isinstance(k, bool) or not isinstance(k, int) or not 0 < k <= SAMPLE_MAX:
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "message": f"'k' must be an integer between 1 and {SAMPLE_MAX}, got {k!r}."
+            })
+        if seed is not None and (isinstance(seed, bool) or not isinstance(seed, (int, str))):
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "message": f"'seed' must be an integer or a string, got {seed!r}."
+            })
+        target = await analysis_target(request, data)
+        if target is None:
+            return missing_formula()
+        formula_str, variables, compiled, columns = target
+        rng = random.Random(seed)
+        try:
+            drawn = await run_in_threadpool(analysis.sample, compiled, k, rng)
+        except ValueError as e:
+            return JSONResponse(status_code=422, content={"status": "error", "message": str(e)})
+        # columns the formula does not use are free, drawn uniformly too
+        samples = ["".join(str(bits[lvl]) if lvl >= 0 else str(rng.getrandbits(1)) for lvl in columns)
+                   for bits in drawn]
+        return {
+            "status": "success",
+            "formula": formula_str,
+            "variables": variables,
+            "samples": samples,
+        }
+    except Exception as e:
+        return analysis_error(e, "sampling")
+
+def cube_lines(compiled, columns, limit=None):
+    """NDJSON lines of the satisfying cubes, '1'/'0' for the tested columns and '-' for free ones."""
+    for i, cube in enumerate(analysis.cubes(compiled)):
+        if limit is not None and i >= limit:
+            break
+        yield json.dumps({"cube": "".join(str(cube[lvl]) if lvl in cube else "-" for lvl in columns)}) + "\n"
+
+@router.post("/cubes")
+async def cubes(request: Request, data: dict = Body(...)):
+    """
+    Every satisfying cube (one per path to True in the ROBDD, disjoint), streamed as NDJSON
+    while the diagram is walked: the first lines arrive at once however many cubes there are.
+    """
+    try:
+        limit = data.get("limit",None)      # stop after this many cubes
+        if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 0):
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "message": f"'limit' must be a non-negative integer, got {limit!r}."
+            })
+        target = await analysis_target(request, data)
+        if target is None:
+            return missing_formula()
+        formula_str, variables, compiled, columns = target
+    except Exception as e:
+        return analysis_error(e, "enumerating cubes")
+    headers = {"X-Variables": " ".join(variables)}
+    return StreamingResponse(iterate_in_threadpool(cube_lines(compiled, columns, limit)),
+                             media_type="application/x-ndjson", headers=headers)
+
+async def load_operand(request, diagram_id, timeout=None):
+    """
+    (ast, var_name, serialize() data) of a diagram id for app.core.ops, from the caches or built again
+    on the pool. None if the id is unknown.
+    """
+    record = await run_in_threadpool(find_diagram, diagram_id)
+    if record is None:
+        return None
+    formula_str = record["formula"]
+    ast, canon, var_name, cache_key = await run_in_threadpool(cache_config, formula_str, "robdd", record["var_order"])
+    bdd = await get_built(formula_str, ast, canon, var_name, cache_key, timeout=timeout,
+                          is_disconnected=request.is_disconnected)
+    try:
+        return ast, var_name, await run_in_threadpool(bdd.serialize)
+    finally:
+        bdd.release()
+
+def add_result(result):
+    """
+    Diagram of an operation result in the caches, as if /generate had built its formula.
+    Return (ROBDD size, parsed).
+    """
+    formula_str = result["formula"]
+    parsed = (result["ast"], result["canon_str"], result["canon"])
+    ast, canon, var_name, cache_key = cache_config(formula_str, "robdd", result["var_name"], None, parsed)
+    while True:
+        bdd = cached_diagram(formula_str, ast, canon, cache_key)
+        if bdd is None:
+            bdd = add_built(formula_str, ast, canon, cache_key, result["data"])
+        # sized under a reference of this request, as in get_built
+        if bdd.acquire():
+            break
+    try:
+        return bdd.size(), parsed
+    finally:
+        bdd.release()
+
+def parse_values(values):
+    """{var: 0/1} of a dict or an eval_path string 'a:0 b:1'."""
+    if isinstance(values, str):
+        values = dict(pair.split(":") for pair in values.split())
+    return {v: int(b) for v, b in values.items()}
+
+def check_variables(variables, var_name):
+    unknown = [v for v in variables if v not in var_name]
+    if unknown:
+        raise ValueError(f"Variables {unknown} are not in the diagram, its variables are {var_name}")
+
+async def operation(request, data, name, ids, make_args):
+    """
+    Answer of an operation endpoint: the operands ids are loaded, make_args(operands) gives the arguments
+    of app.core.ops.OPERATIONS[name] (it raises ValueError for a bad request), the operation runs on the
+    process pool and its result is cached under its formula and answered like /generate, with its own id.
+    """
+    timeout = data.get("timeout",None)
+    include_graph = data.get("include_graph",True)
+    graph_format = data.get("format","json")
+    try:
+        timeout = parse_timeout(timeout)
+        if any(not isinstance(i, str) for i in ids):
+            raise ValueError("Operands are diagram ids (the 'id' of /generate or of an operation).")
+        check_format(graph_format)
+        message = check_paging(data.get("max_depth",None), data.get("page",None), data.get("page_size",None))
+        if message:
+            raise ValueError(message)
+        operands = [await load_operand(request, i, timeout) for i in ids]
+        unknown = [i for i, o in zip(ids, operands) if o is None]
+        if unknown:
+            return JSONResponse(status_code=404, content={
+                "status": "error",
+                "message": f"Unknown diagram id {unknown[0]}, generate it first."
+            })
+        args = make_args(operands)
+    except (ValueError, TypeError) as e:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": str(e)
+        })
+    except Exception as e:
+        return analysis_error(e, f"loading the operands of {name}")
+
+    try:
+        result = await run_in_pool(operation_job, name, *args, timeout=timeout,
+                                   is_disconnected=request.is_disconnected)
+        size, parsed = await run_in_threadpool(add_result, result)
+        formula_str, var_name = result["formula"], result["var_name"]
+        res = {
+            "status": "success",
+            "graph_type": "robdd",
+            "formula": formula_str,
+        }
+        if not include_graph:
+            res["id"] = await run_in_threadpool(register_diagram, formula_str, var_name)
+            res["size"] = size
+            return res
+        out = await generate(formula_str, "robdd", var_name, eval_path=data.get("eval_path",None),
+                             labels=data.get("labels",True), max_depth=data.get("max_depth",None),
+                             page=data.get("page",None), page_size=data.get("page_size",None), timeout=timeout,
+                             is_disconnected=request.is_disconnected, parsed=parsed, graph_format=graph_format)
+        res.update(id=out["id"], size=out["size"], graph=out["graph"])
+        return await run_in_threadpool(wire_response, request, res, graph_format, out["etag"])
+    except Exception as e:
+        return analysis_error(e, f"running {name}")
+
+@router.post("/apply")
+async def apply_diagrams(request: Request, data: dict = Body(...)):
+    """left op right between two diagram ids, with the apply operations of one manager."""
+    op = data.get("op",None)            # 'and', 'or', 'xor', 'implies' or 'equiv'
+    left = data.get("left",None)        # diagram ids
+    right = data.get("right",None)
+    if not isinstance(op, str) or op not in OPERATORS or left is None or right is None:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": f"Expected 'left' and 'right' diagram ids and 'op' in {list(OPERATORS)}."
+        })
+    return await operation(request, data, "apply", [left, right], lambda ops: (op, ops[0], ops[1]))
+
+@router.post("/restrict")
+async def restrict_diagram(request: Request, data: dict = Body(...)):
+    """Cofactor of a diagram id by fixed variable values."""
+    diagram_id = data.get("id",None)
+    values = data.get("values",None)    # {'a': 0, 'b': 1} or 'a:0 b:1'
+    if diagram_id is None or not values or not isinstance(values, (str, dict)):
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": "Expected 'id' and 'values', an object {variable: 0/1} or a string 'a:0 b:1'."
+        })
+
+    def make_args(ops):
+        fixed = parse_values(values)
+        check_variables(fixed, ops[0][1])
+        if any(b not in (0, 1) for b in fixed.values()):
+            raise ValueError("Values are 0 or 1")
+        return ops[0], fixed
+
+    return await operation(request, data, "restrict", [diagram_id], make_args)
+
+@router.post("/quantify")
+async def quantify_diagram(request: Request, data: dict = Body(...)):
+    """Existential or universal quantification of variables of a diagram id."""
+    diagram_id = data.get("id",None)
+    variables = data.get("variables",None)   # 'a b' or ['a', 'b']
+    quantifier = data.get("quantifier","exists")     # 'exists' or 'forall'
+    if isinstance(variables, str):
+        variables = variables.split()
+    if diagram_id is None or not variables or quantifier not in QUANTIFIERS:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": f"Expected 'id', 'variables' and 'quantifier' in {list(QUANTIFIERS)}."
+        })
+
+    def make_args(ops):
+        check_variables(variables, ops[0][1])
+        return ops[0], list(dict.fromkeys(variables)), quantifier
+
+    return await operation(request, data, "quantify", [diagram_id], make_args)
+
+@router.post("/compose")
+async def compose_diagrams(request: Request, data: dict = Body(...)):
+    """A diagram id with one of its variables replaced by the formula of another diagram id."""
+    diagram_id = data.get("id",None)
+    var = data.get("var",None)          # variable to replace
+    by = data.get("by",None)            # diagram id of the replacement
+    if diagram_id is None or not var or by is None:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": "Expected 'id', 'var' and 'by'."
+        })
+
+    def make_args(ops):
+        check_variables([var], ops[0][1])
+        return ops[0], var, ops[1]
+
+    return await operation(request, data, "compose", [diagram_id, by], make_args)
+
+def find_check(key):
+    res = check_cache.get(key)
+    if res is None:
+        res = DiskStore.get("check", key)
+        if res is not None:
+            check_cache.put(key, res)
+    return res
+
+def store_check(key, res):
+    check_cache.put(key, res)
+    DiskStore.put("check", key, res)
+
+def check_diagrams(kind, var_name, diagrams):
+    """
+    check_roots of cached diagrams [(diagram, its variables in the names of its formula)], acquired by the
+    caller, in the shared manager of var_name: a root already there is compared as is, the others are copied
+    in. Reading a diagram needs no lock of its own manager, the nodes under a referenced root do not change.
+    """
+    mgr = BDDManager.shared(var_name)
+    with mgr.lock:
+        roots = []
+        for bdd, names in diagrams:
+            if bdd.manager is mgr and bdd.var_name == names:
+                f = bdd.robdd_id
+            else:
+                f = mgr.transfer(bdd.manager, bdd.robdd_id, dict(zip(bdd.var_name, names)))
+            # referenced for the check, released after it: the manager is dropped if nothing else uses it
+            mgr.incref(f)
+            roots.append(f)
+        try:
+            return check_roots(kind, mgr, *roots)
+        finally:
+            for f in roots:
+                mgr.release(f)
+
+async def run_check(request, kind, data):
+    """
+    Answer of the check endpoints: the diagrams of both formulas are taken from the cache as /generate leaves
+    them (built on the pool only when they are not cached), carried into the shared manager of a common order
+    and compared by root id (app.core.checks). Results are kept in memory and in the disk store, a check
+    already made is a lookup.
+    """
+    binary = kind in BINARY_CHECKS
+    left = data.get("left",None) if binary else data.get("formula",None)   # required
+    right = data.get("right",None) if binary else None
+    var_order = data.get("var_order",None)   # common order 'x1 x3 x2', default: variables of left then right
+    timeout = data.get("timeout",None)
+    if not left or (binary and not right):
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": "Missing 'left' or 'right' field." if binary else "Missing 'formula' field."
+        })
+    if not isinstance(left, str) or (binary and not isinstance(right, str)):
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": "'left' and 'right' must be formula strings." if binary else "'formula' must be a string."
+        })
+    if var_order and not isinstance(var_order, str) and (
+            not isinstance(var_order, list) or not all(isinstance(v, str) for v in var_order)):
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": f"'var_order' must be a string or a list of variable names, got {var_order!r}."
+        })
+    try:
+        timeout = parse_timeout(timeout)
+        left = left.replace(" ", "")
+        right = right.replace(" ", "") if right else None
+        var_name = merge_orders(get_var_name(left), get_var_name(right or ""))
+        if var_order:
+            var_name = get_var_order(var_name, var_order if isinstance(var_order, str) else " ".join(var_order))
+
+        key = DiskStore.key("check", kind, left, right, var_name)
+        res = await run_in_threadpool(find_check, key)
+        if res is None:
+            diagrams = []
+            try:
+                for formula_str in filter(None, (left, right)):
+                    # each formula under the common order restricted to its variables, as /generate would build it
+                    used = set(get_var_name(formula_str))
+                    order = [v for v in var_name if v in used]
+                    try:
+                        ast, canon, order, cache_key = await run_in_threadpool(cache_config, formula_str, "robdd", order)
+                    except FormulaError as e:
+                        return JSONResponse(status_code=400, content={
+                            "status": "error",
+                            "message": f"Invalid formula: {e}"
+                        })
+                    bdd = await get_built(formula_str, ast, canon, order, cache_key, timeout=timeout,
+                                          is_disconnected=request.is_disconnected)
+                    diagrams.append((bdd, view_order(bdd, canon)))
+                res = await run_in_threadpool(check_diagrams, kind, var_name, diagrams)
+            finally:
+                for bdd, _ in diagrams:
+                    bdd.release()
+            await run_in_threadpool(store_check, key, res)
+
+        out = {"status": "success", "check": kind, kind: res["holds"]}
+        if binary:
+            out.update(left=left, right=right)
+        else:
+            out["formula"] = left
+        out["var_order"] = var_name
+        # a model proves satisfiable, for the others the assignment is a counterexample
+        out["model" if kind == "satisfiable" else "counterexample"] = res["assignment"]
+        out["values"] = res["values"]
+        return out
+    except Exception as e:
+        return analysis_error(e, f"checking {kind}")
+
+@router.post("/equivalent")
+async def equivalent(request: Request, data: dict = Body(...)):
+    """Whether left and right are the same function, with an assignment where they differ if not."""
+    return await run_check(request, "equivalent", data)
+
+@router.post("/implies")
+async def implies(request: Request, data: dict = Body(...)):
+    """Whether left -> right always holds, with an assignment where left is true and right false if not."""
+    return await run_check(request, "implies", data)
+
+@router.post("/tautology")
+async def tautology(request: Request, data: dict = Body(...)):
+    """Whether the formula always holds, with an assignment where it is false if not."""
+    return await run_check(request, "tautology", data)
+
+@router.post("/satisfiable")
+async def satisfiable(request: Request, data: dict = Body(...)):
+    """Whether the formula has a model, with one of them."""
+    return await run_check(request, "satisfiable", data)
+
+@router.post("/generate-batch")
+async def generate_batch(request: Request, data: dict = Body(...)):
+    """
+    Many /generate builds in one request, streamed as NDJSON: one line per item as soon as it is done
+    (not in input order), each with its "index". Items run concurrently, one per pool worker at a time.
+    Items that are not cached are built together in one manager when their variable orders fit (see
+    shared_builds), so the subfunctions they have in common are built once.
+    """
+    formulas = data.get("formulas",None)     # ['a&b', 'a|c', ...], or
+    formula_str = data.get("formula",None)   # one formula with
+    var_orders = data.get("var_orders",None) # ['a b c', 'c b a', ...]
+    include_graph = data.get("include_graph",True)
+    # other fields are shared by every item, as in /generate
+    options = {k: data.get(k) for k in ("graph_type", "auto_order", "seeds", "time_budget", "node_budget", "eval_path",
+                                        "labels", "engine", "max_depth", "page", "page_size", "timeout") if k in data}
+
+    if formulas and isinstance(formulas, list):
+        items = [(f, data.get("var_order",None)) for f in formulas]
+    elif formula_str and isinstance(formula_str, str) and var_orders and isinstance(var_orders, list):
+        items = [(formula_str, order) for order in var_orders]
+    else:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": "Expected a list 'formulas', or a string 'formula' with a list 'var_orders'."
+        })
+    message = (check_seeds(options.get("seeds")) or check_auto_order(options.get("auto_order"))
+               or check_paging(options.get("max_depth"), options.get("page"), options.get("page_size")))
+    if message:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": message
+        })
+    try:
+        budgets = parse_budgets(options.get("time_budget"), options.get("node_budget"))
+        options["timeout"] = parse_timeout(options.get("timeout"))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": str(e)
+        })
+    options.update(zip(("time_budget", "node_budget"), budgets))
+    if len(items) > BATCH_MAX_ITEMS:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": f"At most {BATCH_MAX_ITEMS} items per batch, got {len(items)}."
+        })
+
+    parsed = {}         # formula -> parse_canonical, shared by the items of the same formula
+    concurrency = max(POOL_WORKERS, 1)
+    if options.get("auto_order") == "parallel" and POOL_WORKERS > 1:
+        # each item takes one queue slot per seed, run only as many as the queue holds
+        concurrency = max(1, min(concurrency, QUEUE_SIZE // (options.get("seeds") or min(DEFAULT_SEEDS, SEEDS_MAX))))
+    limit = asyncio.Semaphore(concurrency)
+    engine = options.get("engine") or "apply"
+
+    def item_formula(formula):
+        formula = formula.replace(" ", "")
+        if formula not in parsed:
+            parsed[formula] = parse_canonical(formula)
+        return formula
+
+    def shared_builds():
+        """
+        {index: group} of the items to build together: items neither cached nor stored, each cache key once,
+        in groups whose variable orders fit one order (each is that order restricted to its variables).
+        Items that fail here are left to run() to report.
+        """
+        groups = []     # [order, {cache key: (formula, ast, canon, var_name, [indexes])}]
+        if options.get("auto_order") or engine != "apply":
+            return {}   # reordered builds start from a private copy, truth tables share nothing
+        for index, (formula, var_order) in enumerate(items):
+            try:
+                formula = item_formula(formula)
+                ast, canon, var_name, cache_key = cache_config(formula, options.get("graph_type", "robdd"), var_order,
+                                                               None, parsed[formula], engine)
+            except Exception:
+                continue
+            group = next((g for g in groups if cache_key in g[1]), None)
+            if group is None:
+                if cached_diagram(formula, ast, canon, cache_key, engine) is not None:
+                    continue
+                for group in groups:
+                    order = merge_orders(group[0], var_name)
+                    position = [order.index(v) for v in var_name]
+                    if position == sorted(position):
+                        group[0] = order
+                        break
+                else:
+                    group = [list(var_name), {}]
+                    groups.append(group)
+                group[1][cache_key] = (formula, ast, canon, var_name, [])
+            group[1][cache_key][4].append(index)
+        out = {}
+        for group in groups:
+            if len(group[1]) > 1:
+                for entry in group[1].values():
+                    out.update((i, group) for i in entry[4])
+        return out
+
+    async def build_group(group):
+        # one pool job for the group, its diagrams go to the caches as if each had been built alone
+        order, entries = group
+        keys = list(entries)
+        async with limit:
+            built = await run_in_pool(batch_build_job, [entries[k][0] for k in keys], [entries[k][3] for k in keys],
+                                      [entries[k][2] for k in keys], order, timeout=options.get("timeout"))
+        for key, data in zip(keys, built):
+            formula, ast, canon, _, _ = entries[key]
+            await run_in_threadpool(add_built, formula, ast, canon, key, data, engine)
+
+    async def run(index, formula, var_order, group_build=None):
+        line = {"index": index, "formula": formula, "var_order": var_order}
+        start = time.perf_counter()
+        if not isinstance(formula, str) or not formula.strip():
+            # fails alone, as an item that does not parse
+            line.update(status="error", code=400, message=f"Each formula must be a non-empty string, got {formula!r}.",
+                        elapsed=0.0)
+            return line
+        try:
+            if group_build is not None:
+                try:
+                    await asyncio.shield(group_build)
+                except Exception as e:
+                    # the item is built alone below and reports its own error
+                    logger.warning(f"Shared batch build failed: {e}")
+            async with limit:
+                formula = await run_in_threadpool(item_formula, formula)
+                line["formula"] = formula
+                out = await generate(formula, var_order=var_order, parsed=parsed[formula], **options)
+            line.update(status="success", size=out["size"], id=out["id"])
+            if options.get("auto_order"):
+                line["order_info"] = out["order_info"]
+            if include_graph:
+                line["graph"] = out["graph"]
+        except Exception as e:
+            code, message = error_status(e)
+            line.update(status="error", code=code, message=message)
+        line["elapsed"] = round(time.perf_counter() - start, 6)
+        return line
+
+    async def stream():
+        shared = await run_in_threadpool(shared_builds)
+        group_builds = {}   # id(group) -> task
+        for group in shared.values():
+            if id(group) not in group_builds:
+                group_builds[id(group)] = asyncio.ensure_future(build_group(group))
+        tasks = [asyncio.ensure_future(run(i, f, o, group_builds.get(id(shared[i][1])) if i in shared else None))
+                 for i, (f, o) in enumerate(items)]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done) + "\n"
+        finally:
+            # client gone: drop what is left
+            for t in tasks + list(group_builds.values()):
+                t.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def construction_job(formula_str, graph_type="robdd", var_order=None, labels=True, timeout=None):
+    """
+    (arguments of construct_job, timeout) of a construction request: the formula and the variable order
+    are checked as by /generate (FormulaError, OrderError) before the job starts.
+    """
+    formula_str = formula_str.replace(" ", "")
+    ast, canon, var_name, cache_key = cache_config(formula_str, graph_type, var_order)
+    timeout = min(parse_timeout(timeout) or REQUEST_TIMEOUT, REQUEST_TIMEOUT)
+    deadline = time.time() + timeout
+    return (formula_str, var_name, graph_type == 'robdd', bool(labels), deadline), timeout
+
+async def construction_events_of(args, timeout, is_disconnected=None):
+    """
+    Events of construct_job on the process pool, as an async generator whose first event is already
+    there: a full queue (or a worker failure) is raised here, before the response starts.
+    """
+    events = stream_in_pool(construct_job, *args, timeout=timeout, is_disconnected=is_disconnected)
+    try:
+        first = await anext(events)
+    except BaseException:
+        await events.aclose()
+        raise
+
+    async def stream():
+        try:
+            yield first
+            async for event in events:
+                yield event
+        finally:
+            # the client is gone or the job failed: the job is cancelled
+            await events.aclose()
+
+    return stream()
+
+def construction_error(e):
+    logger.warning(f"Construction stream stopped: {e!r}")
+    code, message = error_status(e)
+    return {"event": "error", "code": code, "message": message}
+
+@router.get("/construct")
+async def construct_sse(request: Request, formula: str, graph_type: str = "robdd", var_order: str = None,
+                        labels: bool = True, timeout: float = None):
+    """
+    Step-by-step construction as Server-Sent Events (EventSource), one event per node creation,
+    terminal edge and reduction, sent while the diagram is being built. See construction_events.
+    The construction is a job of the process pool, with its queue slot, deadline and cancellation.
+    """
+    try:
+        args, timeout = await run_in_threadpool(construction_job, formula, graph_type, var_order, labels, timeout)
+    except Exception as e:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": str(e)
+        })
+    try:
+        events = await construction_events_of(args, timeout, request.is_disconnected)
+    except Exception as e:
+        response = pool_error(e)
+        if response is not None:
+            return response
+        logger.exception("Error while starting a construction")
         return JSONResponse(status_code=500, content={
             "status": "error",
             "message": str(e)
-        })
\ No newline at end of file
+        })
+
+    async def stream():
+        try:
+            async for event in events:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps(construction_error(e))}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.websocket("/construct/ws")
+async def construct_ws(websocket: WebSocket):
+    """
+    Same events as /construct over a WebSocket: the client sends one JSON request
+    {"formula", "graph_type", "var_order", "labels", "timeout"} and receives the events as JSON messages.
+    A list var_order must name every variable once, as in /generate.
+    """
+    await websocket.accept()
+    try:
+        data = await websocket.receive_json()
+        events = None
+        try:
+            if not isinstance(data, dict) or not data.get("formula"):
+                raise ValueError("Missing 'formula' field.")
+            args, timeout = await run_in_threadpool(construction_job, data["formula"],
+                                                    data.get("graph_type", "robdd"), data.get("var_order"),
+                                                    data.get("labels", True), data.get("timeout"))
+        except Exception as e:
+            await websocket.send_json({"event": "error", "code": 400, "message": str(e)})
+        else:
+            try:
+                events = await construction_events_of(args, timeout)
+            except Exception as e:
+                await websocket.send_json(construction_error(e))
+        if events is not None:
+            try:
+                async for event in events:
+                    await websocket.send_json(event)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_json(construction_error(e))
+            finally:
+                await events.aclose()
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
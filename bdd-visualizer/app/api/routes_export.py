@@ -1,39 +1,132 @@
-from fastapi import APIRouter, Body
+import os
+from fastapi import APIRouter, Body, Request
+from fastapi.concurrency import run_in_threadpool
 from app.utils import*
 from fastapi.responses import JSONResponse
 from app.core import*
+from app.core.jobs import layout_job, latex_job
 from app.export import*
+from app.export.layout_export import LAYOUT_ENGINE, LAYOUT_ENGINES, highlight_overlay
+from app.export.tikz_export import LATEX_ENGINE, LATEX_ENGINES, layout2tex
+from app.utils.wire import check_format, make_etag, etag_matches, not_modified, wire_response
+from app.api.routes_bdd import cache_config, load_stored, pool_error, check_paging, parse_timeout
 
 router = APIRouter()
 logger = get_logger('BDD API2')
+layouts = SingleFlight("layouts")
+# geometry of recent layouts, shared by every eval_path of a diagram
+layout_cache = LRUCache(int(os.getenv("BDD_LAYOUT_CACHE_SIZE", 256)))
+latexes = SingleFlight("latex")
+
+def find_cached(formula_str, graph_type, var_order=None, auto_order=None):
+    """
+    Cached diagram of /generate seen with the names of formula_str: the exact build when var_order
+    is given, else the latest build of an equivalent formula (same canonical form) and graph_type.
+    Falls back to the disk store, so diagrams built by another worker are found too.
+    Return (cached diagram, view), the cached diagram acquired for the request (release() it once the
+    response is made, see get_built), or (None, None).
+    """
+    ast, canon, var_name, cache_key = cache_config(formula_str, graph_type, var_order, auto_order or None)
+    while True:
+        bdd = BDD_Cache.find(cache_key[0], graph_type, cache_key[1] if var_order else None, auto_order or None)
+        if bdd is None:
+            bdd = load_stored(formula_str, ast, canon, cache_key)
+        if bdd is None:
+            return None, None
+        if bdd.acquire():
+            return bdd, bdd.view(formula_str, ast, canon)
+
+def formula_error(formula_str):
+    """400 response for a missing or non-string 'formula' field, None when it is fine."""
+    if formula_str and isinstance(formula_str, str):
+        return None
+    return JSONResponse(status_code=400, content={
+        "status": "error",
+        "message": "Missing 'formula' field." if not formula_str else "'formula' must be a string."
+    })
+
+def engine_error(engine, engines, what):
+    """400 response for an 'engine' field that is not one of engines, None when it is fine (or not given)."""
+    if engine is None or (isinstance(engine, str) and engine in engines):
+        return None
+    return JSONResponse(status_code=400, content={
+        "status": "error",
+        "message": f"Unknown {what} engine {engine!r}, expected one of {list(engines)}."
+    })
+
+def not_cached(formula_str):
+    return JSONResponse(status_code=404, content={
+        "status": "error",
+        "message": f"Formula not found in cache: '{formula_str}'. Please call /generate first."
+    })
+
+async def cached_layout(bdd, formula_str, graph_type="robdd", max_depth=None, engine=None, timeout=None,
+                        is_disconnected=None):
+    """
+    Layout geometry of a diagram, without highlight: from memory, the disk store, a running identical
+    layout job, or a new one on the process pool.
+    """
+    engine = engine or LAYOUT_ENGINE
+    if engine not in LAYOUT_ENGINES:
+        raise ValueError(f"Unknown layout engine '{engine}', expected one of {LAYOUT_ENGINES}")
+    structure = await run_in_threadpool(bdd.structure_hash)
+    # highlights do not move anything: geometry is keyed by structure only (names only size the nodes)
+    # and the eval_path highlight is drawn over it
+    layout_key = DiskStore.key("layout", structure, [len(v) for v in bdd.var_name], graph_type, max_depth, engine)
+    layout = layout_cache.get(layout_key)
+    if layout is not None:
+        return layout
+
+    async def render(is_disconnected):
+        layout = await run_in_threadpool(DiskStore.get, "layout", layout_key)
+        if layout is None:
+            serialized = await run_in_threadpool(bdd.serialize)
+            layout = await run_in_pool(layout_job, formula_str, serialized, bdd.canon, graph_type, max_depth,
+                                       engine, timeout=timeout, is_disconnected=is_disconnected)
+            await run_in_threadpool(DiskStore.put, "layout", layout_key, layout)
+        layout_cache.put(layout_key, layout)
+        return layout
+
+    return await layouts.do(layout_key, render, is_disconnected)
 
 @router.post("/latex")
-def export_latex(data: dict = Body(...)):
+async def export_latex(request: Request, data: dict = Body(...)):
     #data = request.json()
     formula_str = data.get("formula")
     eval_path = data.get("eval_path", None)
     graph_type = data.get("graph_type", "robdd")
+    var_order = data.get("var_order", None)
+    auto_order = data.get("auto_order", None)
+    timeout = data.get("timeout", None)
+    engine = data.get("engine", None)    # 'dot' or 'native', default BDD_LATEX_ENGINE
     isROBDD = graph_type == 'robdd'
-    if not formula_str:
-        return JSONResponse(status_code=400, content={
-            "status": "error",
-            "message": "Missing 'formula' field."
-        })
+    response = formula_error(formula_str) or engine_error(engine, LATEX_ENGINES, "latex")
+    if response is not None:
+        return response
     formula_str = formula_str.replace(" ", "")
+    held = None
     try:
-        key = f"{formula_str}"
-        
-        if key in BDD_Cache.cache:
-            #logger.info(f"Cache hit for {cache_key}")
-            bdd = BDD_Cache.cache[key]
-        else:
-            return JSONResponse(status_code=404, content={
-                "status": "error",
-                "message": f"Formula not found in cache: '{formula_str}'. Please call /generate first."
-            })
+        timeout = parse_timeout(timeout)
+        held, bdd = await run_in_threadpool(find_cached, formula_str, graph_type, var_order, auto_order)
+        if bdd is None:
+            return not_cached(formula_str)
 
-        tex_code = bdd2tex(bdd.robdd_root if isROBDD else bdd.root, highlight=eval_path)
+        engine = engine or LATEX_ENGINE
+        if engine == 'native':
+            # straight from the (cached) native layout, no Graphviz nor dot2tex
+            layout = await cached_layout(bdd, formula_str, graph_type, None, 'native', timeout, request.is_disconnected)
+            root = bdd.robdd_root if isROBDD else bdd.root
+            overlay = await run_in_threadpool(highlight_overlay, root, eval_path)
+            tex_code = await run_in_threadpool(layout2tex, root, layout, overlay)
+        else:
+            async def render(is_disconnected):
+                serialized = await run_in_threadpool(bdd.serialize)
+                return await run_in_pool(latex_job, formula_str, serialized, bdd.canon, graph_type, eval_path,
+                                         timeout=timeout, is_disconnected=is_disconnected)
 
+            fingerprint = await run_in_threadpool(bdd.fingerprint)
+            latex_key = (fingerprint, tuple(bdd.var_name), graph_type, eval_path)
+            tex_code = await latexes.do(latex_key, render, request.is_disconnected)
 
         return {
             "status": "success",
@@ -42,93 +135,121 @@ def export_latex(data: dict = Body(...)):
             "latex": tex_code
         }
     except Exception as e:
+        response = pool_error(e)
+        if response is not None:
+            return response
         #logger.exception("Error while exporting LaTeX")
         return JSONResponse(status_code=500, content={
             "status": "error",
             "message": str(e)
         })
+    finally:
+        if held is not None:
+            held.release()
 
 @router.post("/json")
-def export_json(data: dict = Body(...)):
+def export_json(request: Request, data: dict = Body(...)):
     formula_str = data.get("formula")
     graph_type = data.get("graph_type", "robdd")
+    var_order = data.get("var_order", None)
+    auto_order = data.get("auto_order", None)
+    labels = data.get("labels", None)
+    max_depth = data.get("max_depth", None)
+    page = data.get("page", None)
+    page_size = data.get("page_size", None)
+    graph_format = data.get("format", "json")    # 'json', 'columns' or 'msgpack'
     isROBDD = graph_type == 'robdd'
     # log after formula_str is retrieved to avoid referencing an undefined variable
     #logger.info(f"Key? {formula_str}")
-    if not formula_str:
+    response = formula_error(formula_str)
+    if response is not None:
+        return response
+    formula_str = formula_str.replace(" ", "")
+    held = None
+    try:
+        try:
+            check_format(graph_format)
+        except ValueError as e:
             return JSONResponse(status_code=400, content={
                 "status": "error",
-                "message": "Missing 'formula' field."
+                "message": str(e)
             })
-    formula_str = formula_str.replace(" ", "")
-    try:
-        key = f"{formula_str}"
-        
-        if key in BDD_Cache.cache:
-            #logger.info(f"Cache hit for {cache_key}")
-            bdd = BDD_Cache.cache[key]
-        else:
-            return JSONResponse(status_code=404, content={
+        message = check_paging(max_depth, page, page_size)
+        if message:
+            return JSONResponse(status_code=400, content={
                 "status": "error",
-                "message": f"Formula not found in cache: '{formula_str}'. Please call /generate first."
+                "message": message
             })
-      
+        held, bdd = find_cached(formula_str, graph_type, var_order, auto_order)
+        if bdd is None:
+            return not_cached(formula_str)
 
-        json_data = bdd.to_json(bdd.robdd_root if isROBDD else bdd.root, 'ROBDD' if isROBDD else 'BDD', True)
+        root = bdd.robdd_root if isROBDD else bdd.root
+        columns = graph_format != "json"
+        json_key = DiskStore.key("json", bdd.fingerprint(), formula_str, bdd.var_name, graph_type, labels, max_depth, page, page_size, columns)
+        etag = make_etag(json_key, graph_format)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        json_data = DiskStore.get("json", json_key)
+        if json_data is None:
+            export = bdd.to_columns if columns else bdd.to_json
+            with bdd.lock:
+                bdd.eval_path(root, None)
+                json_data = export(root, 'ROBDD' if isROBDD else 'BDD', True,
+                                   max_depth, (page or 0) * (page_size or 0), page_size, labels)
+            DiskStore.put("json", json_key, json_data)
 
-        return {
+        return wire_response(request, {
             "status": "success",
             "formula": formula_str,
             "graph_type": graph_type,
             "json": json_data
-        }
+        }, graph_format, etag)
     except Exception as e:
+        response = pool_error(e)
+        if response is not None:
+            return response
         return JSONResponse(status_code=500, content={
             "status": "error",
             "message": str(e)
         })
+    finally:
+        if held is not None:
+            held.release()
 
 
 @router.post("/layout")
-def export_layout(data: dict = Body(...)):
+async def export_layout(request: Request, data: dict = Body(...)):
     formula_str = data.get("formula")
     graph_type = data.get("graph_type", "robdd")
     var_order = data.get("var_order", None)
     auto_order = data.get("auto_order", None)
     eval_path = data.get("eval_path", None)
+    max_depth = data.get("max_depth", None)
+    timeout = data.get("timeout", None)
+    engine = data.get("engine", None)    # 'native' or 'dot', default BDD_LAYOUT_ENGINE
     isROBDD = graph_type == 'robdd'
-    if not formula_str:
+    response = formula_error(formula_str) or engine_error(engine, LAYOUT_ENGINES, "layout")
+    if response is not None:
+        return response
+    message = check_paging(max_depth)
+    if message:
         return JSONResponse(status_code=400, content={
             "status": "error",
-            "message": "Missing 'formula' field."
+            "message": message
         })
     formula_str = formula_str.replace(" ", "")
+    held = None
     try:
-        matched_key = None
-        if var_order is not None or auto_order is not None:
-            key = f"{formula_str}|var_order={var_order or ''}|auto_order={auto_order or ''}"
-            if key in BDD_Cache.cache:
-                matched_key = key
-
-        if matched_key is None:
-            for k in BDD_Cache.cache.keys():
-                if k == formula_str or k.startswith(f"{formula_str}|"):
-                    matched_key = k
-                    break
-
-        if matched_key is None:
-            return JSONResponse(status_code=404, content={
-                "status": "error",
-                "message": f"Formula not found in cache: '{formula_str}'. Please call /generate first."
-            })
-
-        bdd = BDD_Cache.cache[matched_key]
-
-        if eval_path:
-            bdd.eval_path(bdd.robdd_root if isROBDD else bdd.root, eval_path)
+        timeout = parse_timeout(timeout)
+        held, bdd = await run_in_threadpool(find_cached, formula_str, graph_type, var_order, auto_order)
+        if bdd is None:
+            return not_cached(formula_str)
 
+        layout = await cached_layout(bdd, formula_str, graph_type, max_depth, engine, timeout, request.is_disconnected)
         root = bdd.robdd_root if isROBDD else bdd.root
-        layout = bdd2layout(root, highlight=eval_path)
+        overlay = await run_in_threadpool(highlight_overlay, root, eval_path, max_depth)
+        layout = dict(layout, highlight=overlay)
         return {
             "status": "success",
             "formula": formula_str,
@@ -136,7 +257,13 @@ def export_layout(data: dict = Body(...)):
             "layout": layout
         }
     except Exception as e:
+        response = pool_error(e)
+        if response is not None:
+            return response
         return JSONResponse(status_code=500, content={
             "status": "error",
             "message": str(e)
-        })
\ No newline at end of file
+        })
+    finally:
+        if held is not None:
+            held.release()
\ No newline at end of file
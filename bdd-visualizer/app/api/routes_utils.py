@@ -1,4 +1,8 @@
 from fastapi import APIRouter
+from app.utils import BDD_Cache, DiskStore
+from app.core import BDDManager
+from app.api.routes_bdd import builds
+from app.api.routes_export import layouts, latexes, layout_cache
 
 router = APIRouter()
 
@@ -9,3 +13,8 @@ def health_check():
 @router.get("/")
 def root():
     return {"message": "Backend is up and running. Navigate to ./docs for Swagger contents"}
+
+@router.get("/stats")
+def stats():
+    return {"status": "ok", "cache": BDD_Cache.stats(), "managers": BDDManager.stats(), "store": DiskStore.stats(),
+            "layouts": layout_cache.stats(), "in_flight": {f.name: f.stats() for f in (builds, layouts, latexes)}}
@@ -1,4 +1,5 @@
 from .parser import *
+from .manager import BDDManager
 from .bdd import BDD,BDDNode
 from .ordering import *
 
@@ -0,0 +1,96 @@
+import random
+from app.core.manager import FALSE, TRUE
+
+# Counting, probability, sampling and enumeration on a CompiledBDD (see app.core.evaluate).
+# Each is one pass over the nodes, children first: linear in the size of the diagram.
+
+
+def _bottom_up(c):
+    """Decision node ids, deepest level first, so children come before their parents."""
+    level = c.level.tolist()
+    return sorted(range(2, len(level)), key=lambda u: -level[u]), level
+
+
+def path_counts(c):
+    """
+    Per node, the number of satisfying assignments of the variables from its level down
+    (exact Python ints). Memoised on the CompiledBDD.
+    """
+    counts = getattr(c, "_counts", None)
+    if counts is None:
+        order, level = _bottom_up(c)
+        low, high = c.low.tolist(), c.high.tolist()
+        counts = [0] * len(level)
+        counts[TRUE] = 1
+        for u in order:
+            l = level[u]
+            # variables skipped by an edge are free: each doubles the count
+            counts[u] = (counts[low[u]] << (level[low[u]] - l - 1)) + (counts[high[u]] << (level[high[u]] - l - 1))
+        c._counts = counts
+    return counts
+
+
+def satcount(c):
+    """Number of satisfying assignments over all the variables of the diagram."""
+    counts = path_counts(c)
+    return counts[c.root] << int(c.level[c.root])
+
+
+def probability(c, p):
+    """
+    Probability that the formula is true when the variable at level i is true with probability p[i],
+    independently (weighted model counting). Skipped variables do not matter.
+    """
+    order, level = _bottom_up(c)
+    low, high = c.low.tolist(), c.high.tolist()
+    prob = [0.0] * len(level)
+    prob[TRUE] = 1.0
+    for u in order:
+        q = p[level[u]]
+        prob[u] = (1 - q) * prob[low[u]] + q * prob[high[u]]
+    return prob[c.root]
+
+
+def sample(c, k=1, rng=None):
+    """
+    k satisfying assignments drawn uniformly at random (with replacement), as lists of 0/1 by level.
+    Each step follows a branch with probability proportional to its number of models.
+    """
+    rng = rng or random.Random()
+    counts = path_counts(c)
+    if counts[c.root] == 0:
+        raise ValueError("The formula is unsatisfiable, there is nothing to sample")
+    n = c.n_vars
+    level, low, high = c.level.tolist(), c.low.tolist(), c.high.tolist()
+    out = []
+    for _ in range(k):
+        bits = [rng.getrandbits(1) for _ in range(n)]     # free variables keep a random value
+        u = c.root
+        while u != TRUE:
+            l = level[u]
+            w_low = counts[low[u]] << (level[low[u]] - l - 1)
+            w_high = counts[high[u]] << (level[high[u]] - l - 1)
+            b = 1 if rng.randrange(w_low + w_high) >= w_low else 0
+            bits[l] = b
+            u = high[u] if b else low[u]
+        out.append(bits)
+    return out
+
+
+def cubes(c):
+    """
+    Yield the satisfying cubes lazily, one per path to True (low branch first): dicts {level: 0/1}
+    of the tested variables, the others are free. The cubes are disjoint and cover every model.
+    """
+    level, low, high = c.level.tolist(), c.low.tolist(), c.high.tolist()
+    stack = [(c.root, ())]
+    while stack:
+        u, path = stack.pop()
+        if u == TRUE:
+            yield dict(path)
+            continue
+        if u == FALSE:
+            continue
+        l = level[u]
+        stack.append((high[u], path + ((l, 1),)))
+        stack.append((low[u], path + ((l, 0),)))
@@ -1,29 +1,18 @@
+import threading
 from graphviz import Digraph
-from collections import deque, defaultdict
+from collections import deque
 from sympy.parsing.sympy_parser import parse_expr
 from sympy import symbols, simplify_logic
 from app.core import*
 from app.core.ordering import*
+from app.core.manager import BDDManager, FALSE, TRUE
+from app.core.truthtable import build_truthtable, EngineError, TRUTHTABLE_MAX_VARS
+from app.core.nodestore import NodeStore, BDDNode
+from app.core.implicit import ImplicitTree, TreeNode
+from app.core.reorder import Budget, reorder, parallel_search, STRATEGIES, DEFAULT_SEEDS
 from app.utils import*
 
 logger = get_logger("bdd")
-class BDDNode:
-    _id = 0
-    def __init__(self, level, var=None, expr=None, expr_str=None, step=None, highlight = None, low=None, high=None):
-        self.id = BDDNode._id
-        BDDNode._id += 1
-        self.var = var        
-        self.expr = expr    
-        self.expr_str = expr_str
-        self.low = low      
-        self.high = high     
-        self.level = level
-        self.step = step
-        self.highlight = highlight
-        
-    def __repr__(self):
-        return f"Node({self.id}, var={self.var}, expr={self.expr_str}, level={self.level}, step={self.step}, highlight={self.highlight}, low={getattr(self.low,'id',self.low)}, high={getattr(self.high,'id',self.high)})"
-
 class BDD:
     """
     This class provides methods for creating BDD/ROBDD, manual or auto ordering variables before build a BDD/ROBDD and exporting to json.
@@ -34,10 +23,16 @@ class BDD:
             Raw string of input formula, variable name must not contain uppercase letter, allow: [a-z_][a-z0-9_]*
     var_order: list or string or None
             Accept string with whitespace: "x1 x3 x2" or list: ['x3','x1','x2']
-    parsed: sympy_expr
-            For internal used
+    parsed: list
+            For internal used, AST of expr_str from parse_formula
+    labels: bool or string
+            Expression label of each node: True for the cofactored formula, 'sympy' for a simplified sympy expression (slow), False to skip labels
+    engine: string
+            'apply' builds with ITE/apply operations, 'truthtable' evaluates a NumPy truth table first (up to 24 variables)
     """
-    def __init__(self,expr_str,var_order=None,parsed=None):
+    ENGINES = ('apply', 'truthtable')
+
+    def __init__(self,expr_str,var_order=None,parsed=None,labels=True,engine='apply'):
         self.expr_str = expr_str
         self.var_name = get_var_name(expr_str)
         if var_order:
@@ -45,145 +40,259 @@ class BDD:
                 self.var_name = var_order
             else:
                 self.var_name = get_var_order(self.var_name,var_order)
- 
-        if parsed:
-            self.parsed_expr = parsed
-        else:
-            expr = to_str(rewrite(parse_formula(expr_str)))
-            self.parsed_expr = simplify_logic(parse_expr(expr))
-        self.vars = {v: symbols(v) for v in self.var_name}
+
+        self.ast = parsed if parsed is not None else parse_formula(expr_str)
+        self.labels = labels
+        self.engine = engine
+        self._parsed_expr = None
+        self.manager = None
+        self.robdd_id = None
+        # references held on robdd_id: the owner's (e.g. the cache entry) and those of requests, see acquire()
+        self.holders = 0
         self.root = None
         self.robdd_root = None
         self.highlighted = None
+        self.order_info = None
+        # {var: canonical var} of the cache key this diagram is stored under, see view()
+        self.canon = {v: v for v in self.var_name}
+        self._fingerprint = None
+        self._structure_hash = None
+        # serialises highlight + export on a diagram shared through the cache
+        self.lock = threading.RLock()
+
+    @property
+    def parsed_expr(self):
+        """Simplified sympy expression, only built when sympy labels are requested."""
+        if self._parsed_expr is None:
+            self._parsed_expr = simplify_logic(parse_expr(to_str(self.ast)))
+        return self._parsed_expr
+
+    def label(self, values, labels=None):
+        """Return (expr, expr_str) of the formula cofactored by values {var: 0/1}, labels overrides self.labels."""
+        if labels is None:
+            labels = self.labels
+        if not labels:
+            return None, None
+        if labels == 'sympy':
+            expr = self.parsed_expr.subs({symbols(k): v for k, v in values.items()})
+            return expr, str(expr)
+        expr = to_formula(substitute(self.ast, values))
+        return expr, expr
+
+    def compile(self, mgr=None):
+        """
+        Build the formula into mgr. By default this is the shared manager of the current order:
+        the root is then referenced by this diagram until release() or the next compile().
+        """
+        BDD.check_engine(self.engine, len(self.var_name))
+        shared = mgr is None
+        if shared:
+            mgr = BDDManager.shared(self.var_name)
+        with mgr.lock:
+            if self.engine == 'truthtable':
+                f = build_truthtable(mgr, self.ast)
+            else:
+                f = mgr.build(self.ast)
+            if shared:
+                mgr.incref(f)
+        if shared:
+            self._hold(mgr, f)
+        return mgr, f
 
-    def build_bdd(self):
-        true_terminal = BDDNode(len(self.var_name),None,True,'True')
-        false_terminal = BDDNode(len(self.var_name),None,False,'False')
-        root = BDDNode(0,self.var_name[0],self.parsed_expr,str(self.parsed_expr))
-        self.root = root
-        queue = deque([root])    
-        #step = 0
-
-        def make_child(expr, level):
-            if expr in (True, 1):
-                return true_terminal
-            if expr in (False, 0):
-                return false_terminal
-
-            child = BDDNode(level, self.var_name[level], expr, str(expr))
-            queue.appendleft(child)
-            return child
-        
-        while queue:
-            node: BDDNode = queue.popleft()
-            level = node.level
-            var = self.var_name[node.level]
-            #logger.info(var)
+    @staticmethod
+    def check_engine(engine, n_vars):
+        """Raise EngineError unless engine is one of ENGINES and can build a formula of n_vars variables."""
+        if engine not in BDD.ENGINES:
+            raise EngineError(f"Unknown engine {engine!r}, expected one of {list(BDD.ENGINES)}")
+        if engine == 'truthtable' and n_vars > TRUTHTABLE_MAX_VARS:
+            raise EngineError(f"Truth table engine supports at most {TRUTHTABLE_MAX_VARS} variables, got {n_vars}")
+
+    def adopt(self, src, f):
+        """Make f of a private manager (e.g. after reordering) the root of this diagram in the shared manager."""
+        mgr = BDDManager.shared(src.var_order)
+        with mgr.lock:
+            g = mgr.transfer(src, f)
+            mgr.incref(g)
+        self._hold(mgr, g)
+        return mgr, g
+
+    def size(self):
+        """Number of ROBDD nodes of this diagram, used as its cache weight."""
+        if self.manager is None or self.robdd_id is None:
+            return 0
+        return self.manager.size(self.robdd_id)
+
+    def _hold(self, mgr, f):
+        # f, already referenced once, replaces the root of this diagram
+        with self.lock:
+            while self.holders:
+                self.release()
+            self.manager, self.robdd_id, self.holders = mgr, f, 1
+
+    def acquire(self):
+        """
+        One more reference on the root, for a request that reads the diagram while the cache may evict it.
+        Return False when the diagram was released meanwhile: its nodes may be reclaimed, look it up again.
+        """
+        with self.lock:
+            if self.manager is None or self.robdd_id is None:
+                return False
+            self.manager.incref(self.robdd_id)
+            self.holders += 1
+            return True
+
+    def release(self):
+        """Drop one reference on the shared manager, with the last one the nodes can be reclaimed."""
+        with self.lock:
+            if self.manager is None or self.robdd_id is None:
+                return
+            self.manager.release(self.robdd_id)
+            self.holders -= 1
+            if self.holders <= 0:
+                self.manager, self.robdd_id, self.holders = None, None, 0
+
+    def view(self, expr_str, parsed, canon):
+        """
+        This diagram as built for expr_str, a formula with the same canonical form (see canonical_form):
+        the variables are renamed through canon {var of expr_str: canonical var} and labels come from
+        expr_str. The structure is shared, highlights and steps are per view. Return self for the same formula.
+        """
+        if expr_str == self.expr_str:
+            return self
+        back = {c: v for v, c in canon.items()}
+        var_name = [back[self.canon[v]] for v in self.var_name]
+        view = BDD(expr_str, var_name, parsed=parsed, labels=self.labels, engine=self.engine)
+        view.canon = canon
+        view._fingerprint = self._fingerprint
+        view._structure_hash = self._structure_hash
+        if self.order_info is not None:
+            view.order_info = dict(self.order_info, order=list(var_name))
+        if self.robdd_root is not None:
+            store = self.robdd_root.store.renamed(var_name, view.label)
+            view.robdd_root = store.node(self.robdd_root.id)
+        if self.root is not None:
+            tree = self.root.tree
+            view.root = view.tree_from_manager(tree.mgr, tree.f)
+        return view
+
+    def serialize(self):
+        """
+        Plain data of the ROBDD for DiskStore: canonical variable order and the node arrays
+        of its NodeStore (local ids, 0/1 are the terminals). See load().
+        """
+        if self.robdd_root is not None:
+            store = self.robdd_root.store
+        else:
+            tree = self.root.tree
+            store = NodeStore.from_manager(tree.mgr, tree.f, self.var_name)
+        data = {
+            "vars": [self.canon[v] for v in self.var_name],
+            "root": store.root,
+            "level": store.level[2:].tolist(),
+            "low": store.low[2:].tolist(),
+            "high": store.high[2:].tolist(),
+        }
+        if self.order_info is not None:
+            data["order_info"] = {k: v for k, v in self.order_info.items() if k != "order"}
+        return data
 
-            high_expr = eval_with_var(node.expr,self.vars[var],1)
-            low_expr = eval_with_var(node.expr,self.vars[var],0)
+    @classmethod
+    def load(cls, expr_str, data, parsed, canon, robdd=True, engine='apply'):
+        """Diagram of expr_str from serialize() data of an equivalent formula, canon as in view()."""
+        back = {c: v for v, c in canon.items()}
+        bdd = cls(expr_str, [back[c] for c in data["vars"]], parsed=parsed, engine=engine)
+        bdd.canon = canon
+        mgr = BDDManager.shared(bdd.var_name)
+        level, low, high = data["level"], data["low"], data["high"]
+        with mgr.lock:
+            ids = [FALSE, TRUE] + [None] * len(level)
+            # children are on deeper levels, build bottom-up
+            for i in sorted(range(len(level)), key=lambda i: -level[i]):
+                ids[i + 2] = mgr.mk(level[i], ids[low[i]], ids[high[i]])
+            f = ids[data["root"]]
+            mgr.incref(f)
+        bdd._hold(mgr, f)
+        if "order_info" in data:
+            bdd.order_info = dict(data["order_info"], order=list(bdd.var_name))
+        if robdd:
+            bdd.robdd_root = bdd.from_manager(mgr, f)
+        else:
+            bdd.root = bdd.tree_from_manager(mgr, f)
+        return bdd
+
+    def fingerprint(self):
+        """Content hash of the diagram structure under canonical names, shared by its views."""
+        if self._fingerprint is None:
+            data = self.serialize()
+            data.pop("order_info", None)
+            self._fingerprint = DiskStore.key(data)
+        return self._fingerprint
+
+    def structure_hash(self):
+        """
+        Hash of the node structure alone (levels and children by local id), equal for diagrams that only
+        differ by variable names, so node ids, and layouts keyed by it, are shared by all of them.
+        """
+        if self._structure_hash is None:
+            data = self.serialize()
+            self._structure_hash = DiskStore.key(data["root"], data["level"], data["low"], data["high"])
+        return self._structure_hash
 
-            node.high = make_child(high_expr,node.level+1)
-            node.low = make_child(low_expr,node.level+1)
-        
-        return root
+    def build_bdd(self):
+        mgr, f = self.compile()
+        self.root = self.tree_from_manager(mgr, f)
+        return self.root
+
+    def tree_from_manager(self, mgr, f):
+        """
+        Decision tree (BDD) of a manager ROBDD. The tree is implicit: nodes are derived from
+        the ROBDD and their path when accessed, so memory stays proportional to the ROBDD.
+        """
+        store = NodeStore.terminals(self.var_name)
+        terminals = {FALSE: store.node(FALSE), TRUE: store.node(TRUE)}
+        return ImplicitTree(self, mgr, f, terminals).root
 
     def build_robdd(self):
-        true_terminal  = BDDNode(len(self.var_name), None, True,  'True')
-        false_terminal = BDDNode(len(self.var_name), None, False, 'False')
+        mgr, f = self.compile()
+        self.robdd_root = self.from_manager(mgr, f)
+        return self.robdd_root
 
-        expr_level_cache = {}   #(expr_str, level)
-        nodes_by_level = defaultdict(list)  # level -> [nodes]
+    def from_manager(self, mgr, f):
+        """
+        Copy a manager ROBDD into a compact NodeStore with ids local to this diagram, return the root node.
+        Expression labels are the formula cofactored on the first path that reaches each node, computed on use.
+        """
+        store = NodeStore.from_manager(mgr, f, self.var_name, self.label)
+        return store.node(store.root)
 
-        root = BDDNode(0, self.var_name[0], self.parsed_expr, str(self.parsed_expr))
-        expr_level_cache[(root.expr_str, 0)] = root
-        queue = deque([root])
-        
-        def make_child(expr_val, level):
-            if expr_val in (True, 1):
-                return true_terminal
-            if expr_val in (False, 0):
-                return false_terminal
-
-            key = (str(expr_val),level)
-            if key in expr_level_cache:
-                return expr_level_cache[key]
-            
-            child = BDDNode(level, self.var_name[level], expr_val, str(expr_val))
-            expr_level_cache[key] = child
-            queue.append(child)
-            return child
-        
-        while queue:
-            node = queue.popleft()
-            nodes_by_level[node.level].append(node)
-            var = self.var_name[node.level]
-
-            high_expr = eval_with_var(node.expr, self.vars[var], 1)
-            low_expr  = eval_with_var(node.expr, self.vars[var], 0)
-           
-            node.high = make_child(high_expr, node.level + 1)
-            node.low  = make_child(low_expr,  node.level + 1)
-
-        unique_table = {}   #(var, low_id, high_id) 
-        repr_map = {}       #node_id -> reduced_node 
-
-        repr_map[true_terminal.id]  = true_terminal
-        repr_map[false_terminal.id] = false_terminal
-
-        max_level = max(nodes_by_level.keys()) if nodes_by_level else 0
-        #logger.info(f'MLevel: {max_level}, len_var: {len(self.var_name)}')
-        for level in range(max_level, -1, -1):
-            for node in nodes_by_level[level]:
-
-                low_rep  = repr_map[node.low.id]
-                high_rep = repr_map[node.high.id]
-
-                if low_rep is high_rep:
-                    repr_map[node.id] = low_rep
-                    continue
-
-                key = (node.var, low_rep.id, high_rep.id)
-                #key = (low_rep.id,high_rep.id) ->case  'a&b | c&d'; [a c b d]
-                if key in unique_table:
-                    repr_map[node.id] = unique_table[key]
-                else:
-                    reduced = BDDNode(node.level, node.var, node.expr, node.expr_str)
-                    reduced.low  = low_rep
-                    reduced.high = high_rep
-                    unique_table[key] = reduced
-                    repr_map[node.id] = reduced
-
-        self.robdd_root = repr_map[root.id]
-        return self.robdd_root
-    
     @staticmethod
     def assign_step(root):
-        visited = set()
-        queue = deque([root])
-        root.step = 0
-        step = 1
-        while queue:
-            node:BDDNode = queue.popleft()
-            #logger.info(node.var)
-            level = node.level
-            bLow = True
-            if node.low.expr in [True,False,0,1] or node.low is None or node.low.id in visited:
-                bLow = False
-            else:         
-                visited.add(node.low.id) 
-                node.low.step = step
-                step+=1
-            if node.high.expr not in [True,False,0,1] and node.high and node.high.id not in visited:
-                visited.add(node.high.id)
-                node.high.step = step
-                step+=1
-                queue.appendleft(node.high)
-            if bLow:
-                queue.appendleft(node.low)
+        if isinstance(root, TreeNode):
+            return      # implicit trees are numbered while walking
+        root.store.assign_step(root.id)
+
+    @staticmethod
+    def children(node, max_depth=None):
+        """(value, child) pairs of node, decision nodes deeper than max_depth are cut off (terminals are kept)."""
+        if node.var is None:
+            return []
+        return [(v, c) for v, c in ((0, node.low), (1, node.high)) if c.var is None or max_depth is None or c.level <= max_depth]
 
     @staticmethod
-    def to_graphviz(root, filename="bdd_graph", step=True, highlight:str=None, to_latex=False, type='ROBDD'):
+    def walk(root, step=True, max_depth=None):
+        """Yield each node once, low branch first, the order used by to_json."""
+        if isinstance(root, TreeNode):
+            yield from root.tree.walk(step, max_depth)
+            return
+        if step:
+            BDD.assign_step(root)
+        store = root.store
+        for i in store.walk(root.id, max_depth):
+            yield store.node(i)
+
+    @staticmethod
+    def to_graphviz(root, filename="bdd_graph", step=True, highlight:str=None, to_latex=False, type='ROBDD', max_depth=None, render=True):
+        """Graphviz Digraph of a diagram, also rendered to filename_(bdd|robdd).png unless render is False."""
         if root is None:
             raise ValueError("Null root")
         
@@ -239,45 +348,67 @@ class BDD:
                     shape="circle"
                 )
             
-            if node.low:
-                queue.append(node.low)
-                edge_attrs = {"style": "dashed"}
-                if highlight and getattr(node, "highlight", False) and getattr(node.low, "highlight", False) and (node.var not in highlight or highlight[node.var]==0):
-                    edge_attrs["color"] = highlight_fill
-                    edge_attrs["penwidth"] = "3"
-                dot.edge(str(node.id), str(node.low.id), **edge_attrs)
-
-            if node.high:
-                queue.append(node.high)
-                edge_attrs = {"style": "solid"}
-                if highlight and getattr(node, "highlight", False) and getattr(node.high, "highlight", False) and (node.var not in highlight or highlight[node.var]==1):
+            for val, child in BDD.children(node, max_depth):
+                queue.append(child)
+                edge_attrs = {"style": "solid" if val else "dashed"}
+                if highlight and getattr(node, "highlight", False) and getattr(child, "highlight", False) and (node.var not in highlight or highlight[node.var]==val):
                     edge_attrs["color"] = highlight_fill
                     edge_attrs["penwidth"] = "3"
-                dot.edge(str(node.id), str(node.high.id), **edge_attrs)
+                dot.edge(str(node.id), str(child.id), **edge_attrs)
 
-        filename = f'{filename}_' + ('bdd' if is_bdd else 'robdd')
-        dot.render(filename, view=False)
+        if render:
+            filename = f'{filename}_' + ('bdd' if is_bdd else 'robdd')
+            dot.render(filename, view=False)
         return dot
     
 
-    def to_json(self,root, bdd_type="ROBDD",step=True):
-        if step:
-            BDD.assign_step(root)
-        visited = set()
-        queue = deque([root])
+    def export_walk(self, root, step=True, max_depth=None, offset=0, limit=None, labels=None):
+        """
+        Yield (node, expr) for the nodes exported by to_json/to_columns: the page offset/limit of the walk
+        order, decision nodes deeper than max_depth left out, expr under the label mode labels (see BDD.label).
+        """
+        count = 0
+        for node in BDD.walk(root, step, max_depth):
+            if limit is not None and count >= offset + limit:
+                break
+            count += 1
+            if count <= offset:
+                continue
+            if node.var is None or labels is None or labels == self.labels:
+                yield node, node.expr_str
+            else:
+                yield node, self.label(node.path(), labels)[1]
+
+    @staticmethod
+    def export_page(root, max_depth, offset, limit, count):
+        """The "page" entry of an export of count nodes, None when the whole diagram is exported."""
+        if max_depth is None and not offset and limit is None:
+            return None
+        total = BDD.bdd_size(root, max_depth)
+        return {
+            "offset": offset,
+            "limit": limit,
+            "max_depth": max_depth,
+            "count": count,
+            "total": total,
+            "has_more": offset + count < total,
+        }
+
+    def to_json(self,root, bdd_type="ROBDD",step=True,max_depth=None,offset=0,limit=None,labels=None):
+        """
+        Export nodes keyed by json id. With max_depth decision nodes deeper than that level are
+        left out, with offset/limit only a page of the nodes (in walk order) is exported and a
+        "page" entry describes it. Children ids are kept even when the child is not exported.
+        labels overrides the label mode of the diagram (see BDD.label).
+        """
         nodes = {}
-        #edges = []
         n_id = lambda x: f'node_{x.id}' if x.var is not None else f'terminal_{x.expr_str.lower()}'
-        while queue:
-            node = queue.popleft()
-            if node is None or node.id in visited:
-                continue
-            visited.add(node.id)
+        for node, expr in self.export_walk(root, step, max_depth, offset, limit, labels):
             node_id = n_id(node)
             nodes[node_id] = {
                     "id": node_id,
                     "var": node.var,
-                    "expr": node.expr_str,
+                    "expr": expr,
                     "level": node.level,
                     "step": node.step,
                     "highlight": node.highlight,
@@ -285,101 +416,107 @@ class BDD:
                     "high": n_id(node.high) if node.high is not None else None,
             }
 
-            queue.appendleft(node.high)
-            queue.appendleft(node.low)
-            # for branch, child in (("low", node.low), ("high", node.high)):
-            #     if child is not None:
-            #         edges.append({
-            #             "source": node_id
-            #             "target": n_id(child),
-            #             "branch": branch
-            #         })        
-
-        #data = {"nodes": nodes, "edges": edges}
         data = {"nodes": nodes, "root": n_id(root), "variables":[v for v in self.var_name], "type":bdd_type}
+        page = BDD.export_page(root, max_depth, offset, limit, len(nodes))
+        if page is not None:
+            data["page"] = page
         return data
-    
+
+    def to_columns(self,root, bdd_type="ROBDD",step=True,max_depth=None,offset=0,limit=None,labels=None):
+        """
+        Compact columnar form of to_json (same nodes, order, paging and label modes): one array per field,
+        one entry per exported node. "id" holds the node ids (0/1 for the False/True terminals), "low"/"high"
+        the ids of the children (-1 for none), "var" the index in "variables" (-1 for terminals), "step" -1 for none,
+        "expr" an index in the "strings" table (-1 for none) and "highlight" the ids of the highlighted nodes.
+        """
+        var_index = {v: i for i, v in enumerate(self.var_name)}
+        strings, string_index = [], {}
+        cols = {k: [] for k in ("id", "var", "level", "low", "high", "step", "expr")}
+        highlight = []
+        for node, expr in self.export_walk(root, step, max_depth, offset, limit, labels):
+            if expr is not None and expr not in string_index:
+                string_index[expr] = len(strings)
+                strings.append(expr)
+            cols["id"].append(node.id)
+            cols["var"].append(var_index[node.var] if node.var is not None else -1)
+            cols["level"].append(node.level)
+            cols["low"].append(node.low.id if node.low is not None else -1)
+            cols["high"].append(node.high.id if node.high is not None else -1)
+            cols["step"].append(node.step if node.step is not None else -1)
+            cols["expr"].append(string_index[expr] if expr is not None else -1)
+            if node.highlight:
+                highlight.append(node.id)
+
+        data = {"format": "columns", "type": bdd_type, "variables": [v for v in self.var_name], "root": root.id,
+                "count": len(cols["id"]), **cols, "strings": strings, "highlight": highlight}
+        page = BDD.export_page(root, max_depth, offset, limit, len(cols["id"]))
+        if page is not None:
+            data["page"] = page
+        return data
+
     @staticmethod
-    def bdd_size(root):
-        seen = set()
-        queue = deque([root])
-        size = 0
-        while queue:
-            n = queue.popleft()
-            if n.id in seen:
-                continue
-            seen.add(n.id)
-            size += 1
-            if n.low: queue.append(n.low)
-            if n.high: queue.append(n.high)
-        return size
-    
-    def auto_order(self,local_sift=True,robdd=True):
+    def bdd_size(root, max_depth=None):
+        if isinstance(root, TreeNode):
+            return root.tree.count(max_depth)
+        return root.store.size(root.id, max_depth)
+
+    def auto_order(self,strategy='ls',robdd=True,time_budget=None,node_budget=None,seeds=None):
         """
-        Auto find efficient ordering by ordering vars by frequency or use local sifting
-        Build a BDD/ROBDD for that vars order
+        Auto find efficient ordering, starting from the frequency order:
+        'freq' frequency sorting only, 'ls' greedy adjacent swaps, 'sift' Rudell sifting,
+        'win2'/'win3' window permutation, 'exact' dynamic programming (at most 12 variables),
+        'parallel' sifting restarted from several seed orders on the process pool.
+        The search stops at time_budget seconds, moves over node_budget nodes are abandoned.
+        Build a BDD/ROBDD for the best order, the search report is kept in self.order_info
         """
-        if local_sift:
-            self.local_sifting(robdd)
+        if strategy is True or strategy is False:
+            strategy = 'ls' if strategy else 'freq'
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown auto_order '{strategy}', expected one of {STRATEGIES}")
+
+        if strategy == 'parallel':
+            self.order_info = parallel_search(self.ast, self.expr_str, self.var_name, n_seeds=seeds or DEFAULT_SEEDS,
+                                              time_budget=time_budget, node_budget=node_budget)
+            self.var_name = self.order_info["order"]
+            mgr, f = self.compile()
         else:
-            ordered_vars = freq_order_heuristic(self.expr_str, self.var_name)
-            self.var_name = ordered_vars
-            if robdd:
-                self.build_robdd()
-            else:
-                self.build_bdd()
+            # reorder a private copy, swaps would disturb the shared manager of this order
+            budget = Budget(time_budget, node_budget)
+            self.var_name = freq_order_heuristic(self.expr_str, self.var_name)
+            mgr, f = self.compile(BDDManager(self.var_name))
+            mgr.collect([f])
+            self.order_info = reorder(mgr, f, strategy, budget)
+            self.var_name = list(mgr.var_order)
+            mgr, f = self.adopt(mgr, f)
 
-    def local_sifting(self,robdd=True):
-        ordered_vars = freq_order_heuristic(self.expr_str, self.var_name)
-        cache = {}
-        bdd_fin = None
-        def get_bdd_info(var_order):
-            key = tuple(var_order)
-            if key in cache:
-                return cache[key]
-
-            temp = BDD(self.expr_str,var_order,self.parsed_expr)
-            if robdd:
-                root = temp.build_robdd()
-            else:
-                root = temp.build_bdd()
-
-            size = self.bdd_size(root)
-            cache[key] = {"root": root, "size": size}
-            return cache[key]
-
-        improved = True
-        while improved:
-            improved = False
-            for i in range(len(ordered_vars) - 1):
-                test_order = ordered_vars.copy()
-                test_order[i], test_order[i+1] = test_order[i+1], test_order[i]
-
-                info_current = get_bdd_info(ordered_vars)
-                info_test = get_bdd_info(test_order)
-                logger.info(f'Cur: {info_current["size"]}, Test: {info_test["size"]}')
-                if info_test["size"] < info_current["size"]:
-                    ordered_vars = test_order
-                    improved = True
-
-        best_bdd = get_bdd_info(ordered_vars)
-        self.var_name = ordered_vars
         if robdd:
-            self.robdd_root = best_bdd["root"]
+            self.robdd_root = self.from_manager(mgr, f)
         else:
-            self.root = best_bdd["root"]
-        
-        logger.info(f'Best size: {best_bdd["size"]}, Order: {ordered_vars}')
+            self.root = self.tree_from_manager(mgr, f)
+
+        logger.info(f'Best size: {self.order_info["size"]}, Order: {self.var_name}')
 
+    def local_sifting(self,robdd=True):
+        """
+        Greedy adjacent swaps from the frequency order, keep a swap while it shrinks the ROBDD.
+        Swaps are done in place on the manager, its running node count gives the size.
+        """
+        self.auto_order('ls', robdd)
 
     def eval_path(self,root,values):
         """
         Highlight node with variable value string or dict
         Input example: 'a:0 b:1 c:1' or {'a':0, 'b':1, 'c':1}
-        If a variable is not assigned, eval both low and high path.
+        If a variable is not assigned, eval both low and high path. Empty values clear the highlight.
         """
         if not root:
             raise ValueError("Null root")
+
+        if not values:
+            if self.highlighted:
+                self.clear_highlight(root)
+                self.highlighted = None
+            return
         
         if isinstance(values,str):
             ls = [x.split(':') for x in values.split(' ') ]
@@ -417,15 +554,7 @@ class BDD:
 
     @staticmethod
     def clear_highlight(root):
-        visited = set()
-        queue = deque([root])
-        while queue:
-            node = queue.popleft()
-            if node.id in visited:
-                continue
-            visited.add(node.id)
-            node.highlight = None
-            if node.low and node.low.id not in visited:
-                queue.append(node.low)
-            if node.high and node.high.id not in visited:
-                queue.append(node.high)
+        if isinstance(root, TreeNode):
+            root.tree.clear_highlight()
+        else:
+            root.store.clear_highlight()
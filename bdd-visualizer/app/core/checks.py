@@ -0,0 +1,64 @@
+from app.core.manager import BDDManager, FALSE, TRUE
+
+# Decision checks between formulas. Both formulas are in one manager under a common order (for the check
+# endpoints, the shared manager the cached diagrams are carried into, see check_roots): as nodes are unique,
+# equal functions get the same root id, so each check is a comparison of root ids, and a counterexample is
+# any path to True of their difference.
+
+CHECKS = ('equivalent', 'implies', 'tautology', 'satisfiable')
+BINARY_CHECKS = ('equivalent', 'implies')
+
+
+def evaluate(mgr, u, values):
+    """Value (0/1) of node u under values {level: 0/1}, missing levels are 0."""
+    while not mgr.is_terminal(u):
+        u = mgr.high[u] if values.get(mgr.level[u]) else mgr.low[u]
+    return int(u == TRUE)
+
+
+def witness(mgr, u):
+    """Assignment {level: 0/1} along a path from u to True, low branch first. u is not False."""
+    values = {}
+    while not mgr.is_terminal(u):
+        # in an ROBDD every node but False reaches True
+        b = 0 if mgr.low[u] != FALSE else 1
+        values[mgr.level[u]] = b
+        u = mgr.high[u] if b else mgr.low[u]
+    return values
+
+
+def check(kind, var_order, left, right=None):
+    """
+    Check kind ('equivalent', 'implies': left -> right, 'tautology', 'satisfiable' of left) on ASTs.
+    Return {"holds", "assignment", "values"}: assignment {var: 0/1} (every variable of var_order) is a
+    counterexample when the check fails, a model for 'satisfiable'; values {"left", "right"} are the
+    formula values under it. None when there is no such assignment.
+    """
+    mgr = BDDManager(var_order)
+    f = mgr.build(left)
+    g = mgr.build(right) if kind in BINARY_CHECKS else None
+    return check_roots(kind, mgr, f, g)
+
+
+def check_roots(kind, mgr, f, g=None):
+    """check of two nodes f, g (left, right) of mgr, the assignment is over every variable of mgr."""
+    if kind == 'equivalent':
+        holds, diff = f == g, mgr.apply_xor(f, g)
+    elif kind == 'implies':
+        diff = mgr.apply_and(f, mgr.apply_not(g))
+        holds = diff == FALSE
+    elif kind == 'tautology':
+        holds, diff = f == TRUE, mgr.apply_not(f)
+    elif kind == 'satisfiable':
+        holds, diff = f != FALSE, f
+    else:
+        raise ValueError(f"Unknown check '{kind}', expected one of {CHECKS}")
+
+    res = {"holds": holds, "assignment": None, "values": None}
+    if diff != FALSE:
+        values = witness(mgr, diff)
+        res["assignment"] = {v: values.get(i, 0) for i, v in enumerate(mgr.var_order)}
+        res["values"] = {"left": evaluate(mgr, f, values)}
+        if g is not None:
+            res["values"]["right"] = evaluate(mgr, g, values)
+    return res
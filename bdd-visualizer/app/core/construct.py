@@ -0,0 +1,129 @@
+import time
+from app.core.parser import substitute, to_formula
+from app.core.manager import BDDManager, FALSE, TRUE
+
+TERMINAL_IDS = {FALSE: "terminal_false", TRUE: "terminal_true"}
+BUILD_EVENT_OPS = 64        # apply operations between two 'build' progress events
+
+
+class ConstructionTimeout(TimeoutError):
+    """The construction stream ran past its deadline."""
+
+
+def construction_events(ast, var_name, robdd=True, labels=True, deadline=None):
+    """
+    Build the diagram of ast step by step and yield an event dict per step, as it happens.
+    The ROBDD of the formula is built first, with a 'build' progress event every BUILD_EVENT_OPS apply
+    operations, then the decision tree is expanded from it depth first,
+    low branch first, as ImplicitTree derives it for /generate: a branch whose cofactor is constant
+    ends on a terminal. For an ROBDD every node is reduced once both its children are: a node with
+    equal children is removed ('redundant'), a node whose cofactor was already built is merged into
+    it at once without expanding its subtree again ('merge'), any other node is kept ('keep').
+    ----------
+    Parameters
+    ----------
+    ast: list
+            AST of the formula, from parse_formula
+    var_name: list
+            Variable order, the index of a variable is its level
+    robdd: bool
+            Reduce while building (ROBDD) or only expand the decision tree (BDD)
+    labels: bool
+            Add the cofactored formula of each node as "expr"
+    deadline: float or None
+            time.time() after which ConstructionTimeout is raised
+
+    Node ids are those of /generate: tree positions for a BDD, and for an ROBDD the ids of the nodes
+    kept; ROBDD nodes that are removed or merged get "tree_<position>" instead.
+        {"event": "start", "type", "variables"}
+        {"event": "build", "operations", "nodes"}                       ROBDD build progress
+        {"event": "node", "id", "var", "level", "expr", "step", "parent", "branch"}
+        {"event": "terminal", "id", "parent", "branch"}                 edge to a terminal
+        {"event": "redundant", "id", "into"}                            ROBDD only
+        {"event": "merge", "id", "into"}                                ROBDD only
+        {"event": "keep", "id", "low", "high"}                          ROBDD only, final children
+        {"event": "done", "root", "nodes", "size"}
+    """
+    def check():
+        if deadline is not None and time.time() > deadline:
+            raise ConstructionTimeout("Deadline exceeded")
+
+    yield {"event": "start", "type": "ROBDD" if robdd else "BDD", "variables": list(var_name)}
+
+    # private manager holding the ROBDD the tree is expanded from, built while the stream runs
+    mgr = BDDManager(var_name)
+    steps = mgr.build_steps(ast)
+    while True:
+        try:
+            ops = next(steps)
+        except StopIteration as stop:
+            f = stop.value
+            break
+        if ops % BUILD_EVENT_OPS == 0:
+            check()
+            yield {"event": "build", "operations": ops, "nodes": mgr.allocated() - 2}
+    # ids of the ROBDD nodes in /generate: BFS order from the root, as NodeStore.from_manager numbers them
+    robdd_ids = dict(TERMINAL_IDS)
+    for u in mgr.nodes(f):
+        if u not in robdd_ids:
+            robdd_ids[u] = f"node_{len(robdd_ids)}"
+    done = set()                    # ROBDD nodes reduced
+    count = [0]
+    reached = set()                 # terminals of the tree
+
+    def expand(u, g, level, k, parent, branch):
+        # u: ROBDD node of the cofactor at tree position k (heap index, root 1), g: its formula for labels.
+        # Yields events, and the expansions of the children as generators (run in place, see below)
+        # the decision tree always has a root node, as in ImplicitTree, even for a constant formula
+        if mgr.is_terminal(u) and (robdd or level > 0):
+            reached.add(u)
+            yield {"event": "terminal", "id": TERMINAL_IDS[u], "parent": parent, "branch": branch}
+            return
+
+        check()
+        count[0] += 1
+        # an ROBDD tree node stays only at the level of its node, the first time that node is reached
+        kept = robdd and mgr.level[u] == level and u not in done
+        node_id = robdd_ids[u] if kept else f"{'tree' if robdd else 'node'}_{k + 1}"
+        yield {
+            "event": "node",
+            "id": node_id,
+            "var": var_name[level],
+            "level": level,
+            "expr": to_formula(g) if labels else None,
+            "step": count[0] - 1,
+            "parent": parent,
+            "branch": branch,
+        }
+        if robdd and u in done:
+            yield {"event": "merge", "id": node_id, "into": robdd_ids[u]}
+            return
+
+        var = var_name[level]
+        for b, c in enumerate(mgr.cofactors(u, level)):
+            yield expand(c, substitute(g, {var: b}) if labels else None, level + 1, 2 * k + b, node_id, b)
+        if not robdd:
+            return
+
+        if kept:
+            yield {"event": "keep", "id": node_id, "low": robdd_ids[mgr.low[u]], "high": robdd_ids[mgr.high[u]]}
+            done.add(u)
+        else:
+            # above the level of u both cofactors are u
+            yield {"event": "redundant", "id": node_id, "into": robdd_ids[u]}
+
+    stack = [expand(f, ast, 0, 1, None, None)]
+    while stack:
+        try:
+            item = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            continue
+        if isinstance(item, dict):
+            yield item
+        else:
+            stack.append(item)
+    if robdd:
+        yield {"event": "done", "root": robdd_ids[f], "nodes": count[0], "size": mgr.size(f)}
+    else:
+        yield {"event": "done", "root": "node_2", "nodes": count[0], "size": count[0] + len(reached)}
@@ -0,0 +1,82 @@
+import numpy as np
+from app.core.manager import FALSE, TRUE
+
+EVAL_CHUNK_ROWS = 1 << 20     # rows unpacked at once, bounds the memory of a batch
+
+
+class ColumnError(ValueError):
+    """Input columns or rows that do not fit the formula: missing or repeated columns, rows of the wrong size."""
+
+
+class CompiledBDD:
+    """
+    ROBDD as flat NumPy arrays for batch evaluation. Index 0/1 are the terminals False/True,
+    they point to themselves so a walk can run a fixed number of steps.
+    ----------
+    Parameters
+    ----------
+    level, low, high: sequences
+            Node arrays of BDD.serialize() (decision nodes only, local ids from 2)
+    root: int
+            Root id
+    n_vars: int
+            Number of variables, the level of the terminals
+    """
+    def __init__(self, level, low, high, root, n_vars):
+        self.n_vars = n_vars
+        self.level = np.concatenate([[n_vars, n_vars], np.asarray(level, dtype=np.int32)]).astype(np.int32)
+        self.low = np.concatenate([[FALSE, TRUE], np.asarray(low, dtype=np.int32)]).astype(np.int32)
+        self.high = np.concatenate([[FALSE, TRUE], np.asarray(high, dtype=np.int32)]).astype(np.int32)
+        self.root = root
+        # longest root-terminal path, the number of walk steps
+        self.depth = min(n_vars, len(self.level) - 2)
+
+    @classmethod
+    def from_bdd(cls, bdd):
+        data = bdd.serialize()
+        return cls(data["level"], data["low"], data["high"], data["root"], len(data["vars"]))
+
+    def evaluate(self, bits):
+        """
+        Output bit of every row of bits (uint8 0/1 matrix, one column per level), as a uint8 vector.
+        All rows walk down together, one level per step.
+        """
+        rows = bits.shape[0]
+        cur = np.full(rows, self.root, dtype=np.int32)
+        if self.n_vars == 0:
+            return cur.astype(np.uint8)
+        index = np.arange(rows)
+        for _ in range(self.depth):
+            lvl = self.level[cur]
+            if (lvl >= self.n_vars).all():
+                break
+            # terminals read any column, both their children are themselves
+            b = bits[index, np.minimum(lvl, self.n_vars - 1)]
+            cur = np.where(b != 0, self.high[cur], self.low[cur])
+        return cur.astype(np.uint8)
+
+    def evaluate_packed(self, packed, rows, columns):
+        """
+        Evaluate a packed bit matrix: rows of ceil(len(columns) / 8) bytes, MSB first (np.packbits),
+        column j is the variable at level columns[j] (-1 for columns the diagram does not use).
+        Return the packed output bits (np.packbits) and the number of true rows.
+        """
+        width = len(columns)
+        stride = (width + 7) // 8
+        matrix = np.frombuffer(packed, dtype=np.uint8)
+        if matrix.size != rows * stride:
+            raise ColumnError(f"Expected {rows * stride} bytes for {rows} rows of {width} bits, got {matrix.size}")
+        matrix = matrix.reshape(rows, stride)
+        # column of the input holding each level
+        by_level = np.full(self.n_vars, -1, dtype=np.int64)
+        for j, lvl in enumerate(columns):
+            if lvl >= 0:
+                by_level[lvl] = j
+        if (by_level < 0).any():
+            raise ColumnError("Every variable of the formula needs a column")
+
+        out = np.empty(rows, dtype=np.uint8)
+        for start in range(0, rows, EVAL_CHUNK_ROWS):
+            chunk = np.unpackbits(matrix[start:start + EVAL_CHUNK_ROWS], axis=1, count=width)
+            out[start:start + len(chunk)] = self.evaluate(chunk[:, by_level] if self.n_vars else chunk)
+        return np.packbits(out), int(out.sum())
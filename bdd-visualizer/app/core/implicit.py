@@ -0,0 +1,162 @@
+from app.core.manager import FALSE, TRUE
+
+class TreeNode:
+    """
+    Node of the implicit decision tree (unreduced BDD). Only the ROBDD node and the path are stored,
+    children and labels are derived on access, so nothing is kept beyond what is being exported.
+    The path is a heap index k: root is 1, low child 2k, high child 2k+1.
+    """
+    __slots__ = ('tree', 'k', 'level', 'u', 'step')
+
+    def __init__(self, tree, k, level, u):
+        self.tree = tree
+        self.k = k
+        self.level = level
+        self.u = u
+        self.step = None
+
+    @property
+    def id(self):
+        return self.k + 1     # 0 and 1 are the terminals
+
+    @property
+    def var(self):
+        return self.tree.var_name[self.level]
+
+    @property
+    def expr(self):
+        return self.tree.label(self)[0]
+
+    @property
+    def expr_str(self):
+        return self.tree.label(self)[1]
+
+    @property
+    def low(self):
+        return self.tree.child(self, 0)
+
+    @property
+    def high(self):
+        return self.tree.child(self, 1)
+
+    @property
+    def highlight(self):
+        return True if self.k in self.tree.highlighted else None
+
+    @highlight.setter
+    def highlight(self, value):
+        if value:
+            self.tree.highlighted.add(self.k)
+        else:
+            self.tree.highlighted.discard(self.k)
+
+    def path(self):
+        """Assignment {var: 0/1} from the root to this node."""
+        bits = bin(self.k)[3:]
+        return {self.tree.var_name[i]: int(b) for i, b in enumerate(bits)}
+
+    def __repr__(self):
+        return f"TreeNode({self.id}, var={self.var}, level={self.level}, robdd={self.u})"
+
+
+class ImplicitTree:
+    """
+    Decision tree of a formula derived on demand from its manager ROBDD.
+    ----------
+    Parameters
+    ----------
+    bdd: BDD
+            Owner, gives the variable order and node labels
+    mgr: BDDManager
+            Manager holding the ROBDD
+    f: int
+            ROBDD root id
+    terminals: dict
+            {FALSE: node, TRUE: node}, shared terminal BDDNodes
+    """
+    def __init__(self, bdd, mgr, f, terminals):
+        self.bdd = bdd
+        self.mgr = mgr
+        self.f = f
+        self.var_name = list(bdd.var_name)
+        self.terminals = terminals
+        self.highlighted = set()
+        self.root = TreeNode(self, 1, 0, f)
+
+    def child(self, node, val):
+        c = self.mgr.cofactors(node.u, node.level)[val]
+        if c == FALSE or c == TRUE:
+            return self.terminals[c]
+        return TreeNode(self, 2 * node.k + val, node.level + 1, c)
+
+    def label(self, node):
+        return self.bdd.label(node.path())
+
+    def clear_highlight(self):
+        self.highlighted.clear()
+        for t in self.terminals.values():
+            t.highlight = None
+
+    def walk(self, step=True, max_depth=None):
+        """
+        Yield nodes in the order of BDD.to_json (low branch first), terminals once.
+        Steps are numbered like BDD.assign_step while walking, so no state is kept per node.
+        Internal nodes deeper than max_depth are cut off.
+        """
+        root = self.root
+        if step:
+            root.step = 0
+        n_step = 1
+        seen_terminals = set()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.var is None:
+                if node.id not in seen_terminals:
+                    seen_terminals.add(node.id)
+                    yield node
+                continue
+            yield node
+            children = [c for c in (node.low, node.high) if c.var is None or max_depth is None or c.level <= max_depth]
+            if step:
+                for c in children:
+                    if c.var is not None:
+                        c.step = n_step
+                        n_step += 1
+            stack.extend(reversed(children))
+
+    def count(self, max_depth=None):
+        """Number of tree nodes (internal nodes up to max_depth plus reached terminals), without walking the tree."""
+        n = len(self.var_name)
+        limit = n - 1 if max_depth is None else min(max_depth, n - 1)
+        memo = {}       # (u, level) -> (internal nodes, set of terminals reached)
+
+        def parts(key):
+            u, level = key
+            return [c if c == FALSE or c == TRUE else (c, level + 1)
+                    for c in self.mgr.cofactors(u, level) if c == FALSE or c == TRUE or level + 1 <= limit]
+
+        stack = [(self.f, 0)]
+        while stack:
+            key = stack[-1]
+            if key in memo:
+                stack.pop()
+                continue
+            below = parts(key)
+            pending = [k for k in below if isinstance(k, tuple) and k not in memo]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            total, terms = 1, set()
+            for k in below:
+                if isinstance(k, tuple):
+                    t, s = memo[k]
+                    total += t
+                    terms |= s
+                else:
+                    terms.add(k)
+            memo[key] = (total, frozenset(terms))
+
+        total, terms = memo[(self.f, 0)]
+        return total + len(terms)
@@ -0,0 +1,105 @@
+from app.core.bdd import BDD
+from app.core.manager import BDDManager
+from app.core.nodestore import NodeStore
+from app.core.parser import parse_formula
+from app.core.ops import OPERATIONS
+from app.core.construct import construction_events
+from app.export import bdd2layout, bdd2tex
+from app.utils import in_worker
+
+# Stages of the API run on the process pool (app.utils.pool_map). Only plain data crosses the
+# process boundary: diagrams travel as BDD.serialize() data. Worker processes keep no diagram
+# between jobs, a job interrupted by its deadline cannot leave a shared manager half updated.
+# With BDD_POOL_WORKERS=0 the jobs run on threads of the app: the shared managers are the app's
+# ones, so a job only drops its own references and never resets them.
+
+
+def _finish(bdd=None):
+    # the job-side diagram is done once its plain data is made
+    if bdd is not None:
+        bdd.release()
+    if in_worker():
+        BDDManager.reset_shared()
+
+
+def build_job(formula_str, var_name, canon, auto_order=None, time_budget=None, node_budget=None, seeds=None,
+              engine='apply', order_info=None):
+    """Build (and order) a formula, return its BDD.serialize() data."""
+    bdd = None
+    try:
+        bdd = BDD(formula_str, var_name, labels=False, engine=engine)
+        bdd.canon = canon
+        if auto_order:
+            bdd.auto_order(auto_order, True, time_budget, node_budget, seeds)
+        else:
+            bdd.build_robdd()
+            bdd.order_info = order_info
+        return bdd.serialize()
+    finally:
+        _finish(bdd)
+
+
+def batch_build_job(formulas, var_names, canons, var_order):
+    """
+    Build formulas in one manager of var_order, so the subfunctions they have in common are built once.
+    The variable order of each formula (var_names) is var_order restricted to its variables: its ROBDD is
+    the same in the larger manager, only the levels are renumbered. Return the BDD.serialize() data of each.
+    """
+    try:
+        mgr = BDDManager(var_order)
+        out = []
+        for formula_str, var_name, canon in zip(formulas, var_names, canons):
+            f = mgr.build(parse_formula(formula_str))
+            store = NodeStore.from_manager(mgr, f, var_order)
+            level = {i: var_name.index(v) for i, v in enumerate(var_order) if v in var_name}
+            out.append({
+                "vars": [canon[v] for v in var_name],
+                "root": store.root,
+                "level": [level[i] for i in store.level[2:]],
+                "low": store.low[2:].tolist(),
+                "high": store.high[2:].tolist(),
+            })
+        return out
+    finally:
+        _finish()
+
+
+def _load(formula_str, data, canon, graph_type):
+    return BDD.load(formula_str, data, parse_formula(formula_str), canon, graph_type == 'robdd')
+
+
+def layout_job(formula_str, data, canon, graph_type='robdd', max_depth=None, engine=None):
+    """bdd2layout of serialized data seen with the names of formula_str, without highlight."""
+    bdd = None
+    try:
+        bdd = _load(formula_str, data, canon, graph_type)
+        root = bdd.robdd_root if graph_type == 'robdd' else bdd.root
+        return bdd2layout(root, max_depth=max_depth, engine=engine)
+    finally:
+        _finish(bdd)
+
+
+def latex_job(formula_str, data, canon, graph_type='robdd', eval_path=None):
+    """bdd2tex of serialized data seen with the names of formula_str."""
+    bdd = None
+    try:
+        bdd = _load(formula_str, data, canon, graph_type)
+        root = bdd.robdd_root if graph_type == 'robdd' else bdd.root
+        bdd.eval_path(root, eval_path)
+        return bdd2tex(root, highlight=eval_path)
+    finally:
+        _finish(bdd)
+
+
+def operation_job(operation, *args):
+    """One of app.core.ops.OPERATIONS on serialized operands, return its result (plain data)."""
+    try:
+        return OPERATIONS[operation](*args)
+    finally:
+        _finish()
+
+
+def construct_job(formula_str, var_name, robdd=True, labels=True, deadline=None, emit=None):
+    """construction_events of a formula, each event passed to emit as it happens (see app.utils.stream_in_pool)."""
+    for event in construction_events(parse_formula(formula_str), var_name, robdd, labels, deadline):
+        emit(event)
@@ -0,0 +1,471 @@
+import os
+import threading
+from app.utils import get_logger
+
+logger = get_logger("bdd manager")
+
+FALSE = 0
+TRUE = 1
+GC_MIN_NODES = int(os.getenv("BDD_GC_MIN_NODES", 10000))
+
+class BDDManager:
+    """
+    Hash-consed ROBDD manager. Nodes are integer ids, 0 and 1 are the terminals.
+    Every node is unique by (level, low, high), so two equal functions always get the same id.
+    ----------
+    Parameters
+    ----------
+    var_order: list
+            Variable names, the index of a variable is its level (0 is the root level)
+
+    Managers returned by BDDManager.shared(order) are process-wide and shared by every diagram
+    with that order. Diagrams keep their root alive with incref() and drop it with release(),
+    unreferenced nodes are swept once the table has grown enough.
+    """
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, var_order):
+        self.var_order = list(var_order)
+        self.var_level = {v: i for i, v in enumerate(self.var_order)}
+        n = len(self.var_order)
+        # parallel arrays indexed by node id
+        self.level = [n, n]
+        self.low = [-1, -1]
+        self.high = [-1, -1]
+        self.unique = [dict() for _ in range(n)]    # level -> {(low, high): id}
+        self.computed = {}                          # (f, g, h) -> ite result
+        # reference counts, only maintained after collect() (needed by swap)
+        self.ref = None
+        self.free = []
+        self.live = 0
+        # external references of shared managers: root id -> count
+        self.roots = {}
+        self.lock = threading.RLock()
+        self.gc_threshold = GC_MIN_NODES
+
+    @classmethod
+    def shared(cls, var_order):
+        """Process-wide manager of this variable order, created on first use."""
+        key = tuple(var_order)
+        with cls._registry_lock:
+            mgr = cls._registry.get(key)
+            if mgr is None:
+                mgr = cls(var_order)
+                cls._registry[key] = mgr
+            return mgr
+
+    @classmethod
+    def reset_shared(cls):
+        """Forget every shared manager, e.g. in a pool worker after a job that may have been interrupted."""
+        with cls._registry_lock:
+            cls._registry.clear()
+
+    @classmethod
+    def stats(cls):
+        with cls._registry_lock:
+            managers = list(cls._registry.values())
+        return {
+            "managers": len(managers),
+            "nodes": sum(m.allocated() for m in managers),
+            "roots": sum(len(m.roots) for m in managers),
+        }
+
+    def allocated(self):
+        return len(self.level) - len(self.free)
+
+    def incref(self, f):
+        with self.lock:
+            self.roots[f] = self.roots.get(f, 0) + 1
+
+    def release(self, f):
+        """Drop one external reference of f, sweep the table when it has outgrown the live nodes."""
+        with self.lock:
+            count = self.roots.get(f, 0) - 1
+            if count > 0:
+                self.roots[f] = count
+            else:
+                self.roots.pop(f, None)
+            if not self.roots:
+                self._unregister()
+            elif self.allocated() > self.gc_threshold:
+                self.gc()
+
+    def gc(self):
+        """Mark-and-sweep from the referenced roots."""
+        with self.lock:
+            before = self.allocated()
+            self.collect(list(self.roots))
+            self.gc_threshold = max(GC_MIN_NODES, 2 * self.allocated())
+            logger.info(f'GC {self.var_order}: {before} -> {self.allocated()} nodes')
+
+    def _unregister(self):
+        key = tuple(self.var_order)
+        with BDDManager._registry_lock:
+            if BDDManager._registry.get(key) is self:
+                del BDDManager._registry[key]
+
+    @property
+    def n_vars(self):
+        return len(self.var_order)
+
+    def is_terminal(self, u):
+        return u == FALSE or u == TRUE
+
+    def mk(self, level, low, high):
+        if low == high:
+            return low
+        table = self.unique[level]
+        key = (low, high)
+        u = table.get(key)
+        if u is None:
+            if self.free:
+                u = self.free.pop()
+                self.level[u], self.low[u], self.high[u] = level, low, high
+            else:
+                u = len(self.level)
+                self.level.append(level)
+                self.low.append(low)
+                self.high.append(high)
+                if self.ref is not None:
+                    self.ref.append(0)
+            table[key] = u
+            if self.ref is not None:
+                self.ref[u] = 0
+                self.ref[low] += 1
+                self.ref[high] += 1
+                self.live += 1
+        return u
+
+    def var(self, name):
+        return self.mk(self.var_level[name], FALSE, TRUE)
+
+    def cofactors(self, u, level):
+        if self.level[u] == level:
+            return self.low[u], self.high[u]
+        return u, u
+
+    def ite(self, f, g, h):
+        """If-then-else: (f & g) | (~f & h), memoised in the computed table."""
+        computed = self.computed
+        out = []                    # results of the finished calls
+        stack = [(f, g, h)]         # calls (f, g, h), and (key, top) to make a node from the last two results
+        while stack:
+            frame = stack.pop()
+            if len(frame) == 2:
+                key, top = frame
+                hi = out.pop()
+                r = self.mk(top, out.pop(), hi)
+                computed[key] = r
+                out.append(r)
+                continue
+            f, g, h = frame
+            if f == TRUE:
+                out.append(g)
+            elif f == FALSE:
+                out.append(h)
+            elif g == h:
+                out.append(g)
+            elif g == TRUE and h == FALSE:
+                out.append(f)
+            else:
+                r = computed.get(frame)
+                if r is not None:
+                    out.append(r)
+                    continue
+                top = min(self.level[f], self.level[g], self.level[h])
+                f0, f1 = self.cofactors(f, top)
+                g0, g1 = self.cofactors(g, top)
+                h0, h1 = self.cofactors(h, top)
+                # low branch first, the node is made once both are done
+                stack.append((frame, top))
+                stack.append((f1, g1, h1))
+                stack.append((f0, g0, h0))
+        return out[0]
+
+    def apply_not(self, f):
+        return self.ite(f, FALSE, TRUE)
+
+    def apply_and(self, f, g):
+        return self.ite(f, g, FALSE)
+
+    def apply_or(self, f, g):
+        return self.ite(f, TRUE, g)
+
+    def apply_xor(self, f, g):
+        return self.ite(f, self.apply_not(g), g)
+
+    def apply_implies(self, f, g):
+        return self.ite(f, g, TRUE)
+
+    def apply_equiv(self, f, g):
+        return self.ite(f, g, self.apply_not(g))
+
+    def apply(self, op, f, g):
+        return BINARY_OPS[op](self, f, g)
+
+    def build(self, ast):
+        """
+        Build the ROBDD of an AST (output of parse_formula) bottom-up with apply operations, ^ and <-> included.
+        Subterms shared in the AST are built once, and the walk is iterative. Return the root id.
+        """
+        steps = self.build_steps(ast)
+        while True:
+            try:
+                next(steps)
+            except StopIteration as stop:
+                return stop.value
+
+    def build_steps(self, ast):
+        """
+        build() as a generator: yields the number of apply operations done after each of them, and
+        returns the root id (the value of StopIteration), so a caller can report progress while building.
+        """
+        if not isinstance(ast, list):
+            return self.var(ast)
+        built = {}      # id(subterm) -> node id
+        ops = 0
+
+        def value(x):
+            return built[id(x)] if isinstance(x, list) else self.var(x)
+
+        stack = [(ast, False)]
+        while stack:
+            x, ready = stack.pop()
+            if id(x) in built:
+                continue
+            negation = len(x) == 2 and x[0] == "~"
+            operands = x[1:] if negation else x[::2]
+            if not ready:
+                # operands first
+                stack.append((x, True))
+                stack.extend((c, False) for c in operands if isinstance(c, list) and id(c) not in built)
+                continue
+            if negation:
+                res = self.apply_not(value(x[1]))
+                ops += 1
+                yield ops
+            else:
+                # chains like [a, '&', b, '&', c] are folded from the left
+                res = value(x[0])
+                for i in range(1, len(x), 2):
+                    res = self.apply(x[i], res, value(x[i + 1]))
+                    ops += 1
+                    yield ops
+            built[id(x)] = res
+        return built[id(ast)]
+
+    def _bottom_up(self, f, known, children, combine):
+        """
+        Bottom-up value of node f on an explicit stack, so the depth of the diagram costs no recursion.
+        known(u) is the value of u when it needs no children (terminals, computed table), else None;
+        combine(u, values) makes it from the values of children(u). Shared nodes are valued once.
+        """
+        done = {}
+        stack = [f]
+        while stack:
+            u = stack[-1]
+            if u in done:
+                stack.pop()
+                continue
+            r = known(u)
+            if r is None:
+                nodes = children(u)
+                pending = [c for c in nodes if c not in done]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                r = combine(u, [done[c] for c in nodes])
+            stack.pop()
+            done[u] = r
+        return done[f]
+
+    def restrict(self, f, values):
+        """Cofactor of f by values {level: 0/1}, in one pass memoised in the computed table."""
+        values = tuple(sorted(values.items()))
+        setting = dict(values)
+        bottom = values[-1][0] if values else -1
+
+        def known(u):
+            # nothing to set below the deepest level, terminals included
+            if self.level[u] > bottom:
+                return u
+            return self.computed.get(("restrict", u, values))
+
+        def children(u):
+            l = self.level[u]
+            if l in setting:
+                return (self.high[u] if setting[l] else self.low[u],)
+            return self.low[u], self.high[u]
+
+        def combine(u, res):
+            l = self.level[u]
+            r = res[0] if l in setting else self.mk(l, res[0], res[1])
+            self.computed[("restrict", u, values)] = r
+            return r
+
+        return self._bottom_up(f, known, children, combine)
+
+    def quantify(self, f, levels, forall=False):
+        """
+        Existential (universal with forall) quantification of the variables at levels: each of them is
+        replaced by the or (and) of its two cofactors, in one pass memoised in the computed table.
+        """
+        levels = frozenset(levels)
+        bottom = max(levels, default=-1)
+        join = self.apply_and if forall else self.apply_or
+        tag = "forall" if forall else "exists"
+
+        def known(u):
+            if self.level[u] > bottom:
+                return u
+            return self.computed.get((tag, u, levels))
+
+        def combine(u, res):
+            l = self.level[u]
+            lo, hi = res
+            r = join(lo, hi) if l in levels else self.mk(l, lo, hi)
+            self.computed[(tag, u, levels)] = r
+            return r
+
+        return self._bottom_up(f, known, lambda u: (self.low[u], self.high[u]), combine)
+
+    def compose(self, f, level, g):
+        """f with the variable at level replaced by the function g: ite(g, f|1, f|0)."""
+        return self.ite(g, self.restrict(f, {level: 1}), self.restrict(f, {level: 0}))
+
+    def load(self, var_name, level, low, high, root):
+        """
+        Id here of a diagram given as BDD.serialize() node arrays (local ids, 0/1 are the terminals)
+        whose level i is the variable var_name[i]. Its order may differ from this manager's.
+        """
+        ids = [FALSE, TRUE] + [None] * len(level)
+        # children are on deeper levels, build bottom-up
+        for i in sorted(range(len(level)), key=lambda i: -level[i]):
+            ids[i + 2] = self.ite(self.var(var_name[level[i]]), ids[high[i]], ids[low[i]])
+        return ids[root]
+
+    def transfer(self, src, f, names=None):
+        """
+        Copy node f of another manager (any variable order) into this one, return its id here.
+        names {variable of src: variable here} renames the variables on the way, default: same names.
+        """
+        names = names or {}
+
+        def combine(u, res):
+            v = src.var_order[src.level[u]]
+            return self.ite(self.var(names.get(v, v)), res[1], res[0])
+
+        return self._bottom_up(f, lambda u: u if src.is_terminal(u) else None,
+                          lambda u: (src.low[u], src.high[u]), combine)
+
+    def nodes(self, root):
+        """Return node ids reachable from root in BFS order, terminals included."""
+        seen = {root}
+        order = [root]
+        i = 0
+        while i < len(order):
+            u = order[i]
+            i += 1
+            if self.is_terminal(u):
+                continue
+            for c in (self.low[u], self.high[u]):
+                if c not in seen:
+                    seen.add(c)
+                    order.append(c)
+        return order
+
+    def size(self, root):
+        return len(self.nodes(root))
+
+    def collect(self, roots):
+        """
+        Drop every node not reachable from roots and start reference counting.
+        After this the node count of the roots is kept in self.live (terminals excluded).
+        """
+        keep = set()
+        for r in roots:
+            keep.update(self.nodes(r))
+        self.ref = [0] * len(self.level)
+        self.free = [u for u in range(2, len(self.level)) if u not in keep]
+        for table in self.unique:
+            for key, u in list(table.items()):
+                if u not in keep:
+                    del table[key]
+        for u in keep:
+            if not self.is_terminal(u):
+                self.ref[self.low[u]] += 1
+                self.ref[self.high[u]] += 1
+        for r in roots:
+            self.ref[r] += 1
+        self.live = sum(1 for u in keep if not self.is_terminal(u))
+        self.computed.clear()
+
+    def _deref(self, u):
+        stack = [u]
+        while stack:
+            u = stack.pop()
+            if self.is_terminal(u):
+                continue
+            self.ref[u] -= 1
+            if self.ref[u] == 0:
+                del self.unique[self.level[u]][(self.low[u], self.high[u])]
+                self.free.append(u)
+                self.live -= 1
+                stack.append(self.low[u])
+                stack.append(self.high[u])
+
+    def swap(self, i):
+        """
+        Exchange the variables at level i and i+1 in place, only nodes on these two levels are rewritten.
+        Node ids keep their function, so roots stay valid. Requires collect() first.
+        """
+        if self.ref is None:
+            raise RuntimeError("swap requires reference counts, call collect() first")
+        j = i + 1
+        upper = list(self.unique[i].values())
+        lower = self.unique[j]
+
+        movers, rewrites = [], []
+        for u in upper:
+            f0, f1 = self.low[u], self.high[u]
+            if self.level[f0] != j and self.level[f1] != j:
+                movers.append(u)    # does not depend on the lower variable
+                continue
+            f00, f01 = self.cofactors(f0, j)
+            f10, f11 = self.cofactors(f1, j)
+            rewrites.append((u, f0, f1, f00, f01, f10, f11))
+
+        # lower variable nodes move up unchanged, independent upper nodes move down unchanged
+        for u in lower.values():
+            self.level[u] = i
+        self.unique[i] = lower
+        self.unique[j] = {}
+        for u in movers:
+            self.level[u] = j
+            self.unique[j][(self.low[u], self.high[u])] = u
+
+        x, y = self.var_order[i], self.var_order[j]
+        self.var_order[i], self.var_order[j] = y, x
+        self.var_level[x], self.var_level[y] = j, i
+
+        for u, f0, f1, f00, f01, f10, f11 in rewrites:
+            n0 = self.mk(j, f00, f10)
+            n1 = self.mk(j, f01, f11)
+            self.ref[n0] += 1
+            self.ref[n1] += 1
+            self.low[u], self.high[u] = n0, n1
+            self.unique[i][(n0, n1)] = u
+        for u, f0, f1, *_ in rewrites:
+            self._deref(f0)
+            self._deref(f1)
+        self.computed.clear()
+
+
+BINARY_OPS = {
+    "&": BDDManager.apply_and,
+    "|": BDDManager.apply_or,
+    "^": BDDManager.apply_xor,
+    "->": BDDManager.apply_implies,
+    "<->": BDDManager.apply_equiv,
+}
@@ -0,0 +1,227 @@
+from array import array
+from collections import deque
+from app.core.manager import FALSE, TRUE
+
+
+class BDDNode:
+    """
+    View of one node of a NodeStore. Only (store, id) is kept, every field is read from the store arrays.
+    Ids are local to the diagram: 0 and 1 are the terminals False/True.
+    """
+    __slots__ = ('store', 'id')
+
+    def __init__(self, store, id):
+        self.store = store
+        self.id = id
+
+    @property
+    def var(self):
+        if self.id <= TRUE:
+            return None
+        return self.store.var_name[self.store.level[self.id]]
+
+    @property
+    def level(self):
+        return self.store.level[self.id]
+
+    @property
+    def expr(self):
+        if self.id <= TRUE:
+            return self.id == TRUE
+        return self.store.label(self.id)[0]
+
+    @property
+    def expr_str(self):
+        if self.id <= TRUE:
+            return str(self.id == TRUE)
+        return self.store.label(self.id)[1]
+
+    @property
+    def low(self):
+        c = self.store.low[self.id]
+        return None if c < 0 else BDDNode(self.store, c)
+
+    @property
+    def high(self):
+        c = self.store.high[self.id]
+        return None if c < 0 else BDDNode(self.store, c)
+
+    @property
+    def step(self):
+        s = self.store.step[self.id]
+        return None if s < 0 else s
+
+    @step.setter
+    def step(self, value):
+        self.store.step[self.id] = -1 if value is None else value
+
+    @property
+    def highlight(self):
+        return True if self.store.highlight[self.id] else None
+
+    @highlight.setter
+    def highlight(self, value):
+        self.store.highlight[self.id] = 1 if value else 0
+
+    def path(self):
+        """Assignment {var: 0/1} of the first path from the root to this node."""
+        return self.store.path(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, BDDNode) and other.store is self.store and other.id == self.id
+
+    def __hash__(self):
+        return hash((id(self.store), self.id))
+
+    def __repr__(self):
+        return f"Node({self.id}, var={self.var}, level={self.level}, step={self.step}, highlight={self.highlight}, low={self.store.low[self.id]}, high={self.store.high[self.id]})"
+
+
+class NodeStore:
+    """
+    Compact ROBDD of one diagram: parallel int arrays indexed by local node id.
+    Decision nodes follow the terminals in BFS order from the root. Expression labels
+    are computed on first use from the path that first reached the node.
+    ----------
+    Parameters
+    ----------
+    var_name: list
+            Variable order of the diagram
+    labeler: callable or None
+            labeler({var: 0/1}) -> (expr, expr_str), BDD.label
+    """
+    def __init__(self, var_name, labeler=None):
+        n = len(var_name)
+        self.var_name = list(var_name)
+        self.labeler = labeler
+        self.level = array('i', [n, n])
+        self.low = array('i', [-1, -1])
+        self.high = array('i', [-1, -1])
+        self.step = array('i', [-1, -1])
+        self.highlight = bytearray(2)
+        # first parent and branch value, to rebuild the path of a node for its label
+        self.parent = array('i', [-1, -1])
+        self.branch = bytearray(2)
+        self.labels = {}
+        self.root = None
+
+    @classmethod
+    def from_manager(cls, mgr, f, var_name, labeler=None):
+        store = cls(var_name, labeler)
+        local = {FALSE: FALSE, TRUE: TRUE}
+        if f not in local:
+            local[f] = store._add(mgr.level[f], -1, 0)
+        store.root = local[f]
+        queue = deque([f])
+        while queue:
+            u = queue.popleft()
+            if mgr.is_terminal(u):
+                continue
+            i = local[u]
+            for val, c in ((0, mgr.low[u]), (1, mgr.high[u])):
+                if c not in local:
+                    local[c] = store._add(mgr.level[c], i, val)
+                    queue.append(c)
+            store.low[i] = local[mgr.low[u]]
+            store.high[i] = local[mgr.high[u]]
+        return store
+
+    def renamed(self, var_name, labeler=None):
+        """Same diagram under other variable names: structure is shared, steps, highlights and labels are not."""
+        store = NodeStore.__new__(NodeStore)
+        store.var_name = list(var_name)
+        store.labeler = labeler
+        store.level, store.low, store.high = self.level, self.low, self.high
+        store.parent, store.branch = self.parent, self.branch
+        store.step = array('i', self.step)
+        store.highlight = bytearray(len(self.highlight))
+        store.labels = {}
+        store.root = self.root
+        return store
+
+    def _add(self, level, parent, branch):
+        self.level.append(level)
+        self.low.append(-1)
+        self.high.append(-1)
+        self.step.append(-1)
+        self.highlight.append(0)
+        self.parent.append(parent)
+        self.branch.append(branch)
+        return len(self.level) - 1
+
+    def __len__(self):
+        return len(self.level)
+
+    def node(self, i):
+        return BDDNode(self, i)
+
+    def path(self, i):
+        values = {}
+        while self.parent[i] >= 0:
+            p = self.parent[i]
+            values[self.var_name[self.level[p]]] = self.branch[i]
+            i = p
+        return values
+
+    def label(self, i):
+        if i not in self.labels:
+            self.labels[i] = self.labeler(self.path(i)) if self.labeler else (None, None)
+        return self.labels[i]
+
+    def children(self, i, max_depth=None):
+        if i <= TRUE:
+            return ()
+        return tuple(c for c in (self.low[i], self.high[i]) if c <= TRUE or max_depth is None or self.level[c] <= max_depth)
+
+    def walk(self, root, max_depth=None):
+        """Node ids reachable from root, each once, low branch first (to_json order)."""
+        visited = bytearray(len(self.level))
+        stack = [root]
+        while stack:
+            i = stack.pop()
+            if visited[i]:
+                continue
+            visited[i] = 1
+            yield i
+            stack.extend(reversed(self.children(i, max_depth)))
+
+    def assign_step(self, root):
+        """Same numbering as BDD.assign_step, on the arrays."""
+        for i in range(len(self.step)):
+            self.step[i] = -1
+        self.step[root] = 0
+        visited = bytearray(len(self.level))
+        step = 1
+        queue = deque([root])
+        while queue:
+            i = queue.popleft()
+            if i <= TRUE:
+                continue
+            lo, hi = self.low[i], self.high[i]
+            b_low = lo > TRUE and not visited[lo]
+            if b_low:
+                visited[lo] = 1
+                self.step[lo] = step
+                step += 1
+            if hi > TRUE and not visited[hi]:
+                visited[hi] = 1
+                self.step[hi] = step
+                step += 1
+                queue.appendleft(hi)
+            if b_low:
+                queue.appendleft(lo)
+
+    def size(self, root, max_depth=None):
+        if max_depth is None and root == self.root:
+            # every stored node is reachable, both terminals are unless the root is one
+            return len(self.level) - 1 if root <= TRUE else len(self.level)
+        return sum(1 for _ in self.walk(root, max_depth))
+
+    def clear_highlight(self):
+        for i in range(len(self.highlight)):
+            self.highlight[i] = 0
+
+    @classmethod
+    def terminals(cls, var_name):
+        """Store holding only the two terminals, used by implicit trees."""
+        return cls(var_name)
@@ -0,0 +1,143 @@
+from app.core.manager import BDDManager, FALSE, TRUE
+from app.core.nodestore import NodeStore
+from app.core.ordering import get_var_name
+from app.core.parser import substitute, eliminate, rename_vars, to_formula, canonical_form, ast_size
+from app.utils import BDD_Cache
+
+# Operations between built diagrams, run by operation_job (app.core.jobs) on the process pool.
+# Operands are (ast, var_name, data): the formula AST, the variables of the diagram level by level and its
+# BDD.serialize() data. They are loaded into one manager and combined with its apply operations (memoised
+# in the computed table). The formula of the result is the shorter of the one derived from the operand ASTs
+# and the one read off the result diagram (see _diagram_formula), sizes are compared before any is printed:
+# quantifying or composing an AST can multiply its size, the diagram cannot grow that way.
+
+OPERATORS = {"and": "&", "or": "|", "xor": "^", "implies": "->", "equiv": "<->"}
+QUANTIFIERS = ('exists', 'forall')
+
+
+def merge_orders(*orders):
+    """Variables of several orders: the first order, then the new variables of the next ones."""
+    return list(dict.fromkeys(v for order in orders for v in order))
+
+
+def _load(mgr, operand):
+    _, var_name, data = operand
+    return mgr.load(var_name, data["level"], data["low"], data["high"], data["root"])
+
+
+def _chain(x, op, ast):
+    # x op ast, flat when ast is a chain of op
+    if isinstance(ast, list) and len(ast) > 2 and ast[1] == op:
+        return [x, op] + ast
+    return [x, op, ast]
+
+
+def _diagram_formula(mgr, f):
+    """
+    Formula of diagram f read off its nodes, as (AST, ast_size). The node of x with children L, H is
+    x or ~x over the terminals, x | L, x & H, ~x | H or ~x & L when a child is constant, x ^ L when the children are complements,
+    otherwise (x & H) | (~x & L). Shared nodes are shared subterms of the AST.
+    """
+    made = {FALSE: (False, 0), TRUE: (True, 0)}
+    # children first: the deepest levels first
+    for u in sorted(mgr.nodes(f), key=lambda u: -mgr.level[u]):
+        if u in made:
+            continue
+        x = mgr.var_order[mgr.level[u]]
+        lo, hi = mgr.low[u], mgr.high[u]
+        (L, n_lo), (H, n_hi) = made[lo], made[hi]
+        if (lo, hi) == (FALSE, TRUE):
+            made[u] = x, 1
+        elif (lo, hi) == (TRUE, FALSE):
+            made[u] = ["~", x], 1
+        elif hi == TRUE:
+            made[u] = _chain(x, "|", L), 1 + n_lo
+        elif lo == FALSE:
+            made[u] = _chain(x, "&", H), 1 + n_hi
+        elif lo == TRUE:
+            made[u] = _chain(["~", x], "|", H), 1 + n_hi
+        elif hi == FALSE:
+            made[u] = _chain(["~", x], "&", L), 1 + n_lo
+        elif mgr.apply_not(lo) == hi:
+            made[u] = _chain(x, "^", L), 1 + n_lo
+        else:
+            made[u] = [_chain(x, "&", H), "|", _chain(["~", x], "&", L)], 2 + n_lo + n_hi
+    return made[f]
+
+
+def _result(mgr, f, ast=None, size=None):
+    """
+    Diagram f of mgr as the diagram of a formula: {"formula", "ast", "canon_str", "canon", "var_name", "data"},
+    data is BDD.serialize() data under the canonical names, the variables the formula lost are dropped.
+    ast is a formula of f derived from the operands, size its ast_size (known before ast is made when ast is
+    a callable building it). The formula read off f replaces it when that one is shorter.
+    """
+    own, own_size = _diagram_formula(mgr, f)
+    if ast is None or size > own_size:
+        ast = own
+    elif callable(ast):
+        ast = ast()
+    if isinstance(ast, bool):
+        # constant: the grammar has no literals, say it with the first variable
+        v = mgr.var_order[0]
+        ast = [v, "|" if ast else "&", ["~", v]]
+    formula_str = to_formula(ast).replace(" ", "")
+    used = set(get_var_name(formula_str))
+    var_name = [v for v in mgr.var_order if v in used]
+    canon_str, _, canon = canonical_form(ast, BDD_Cache.RENAME)
+
+    store = NodeStore.from_manager(mgr, f, mgr.var_order)
+    pos = {v: i for i, v in enumerate(var_name)}
+    level = [pos[mgr.var_order[l]] for l in store.level[2:]]
+    data = {
+        "vars": [canon[v] for v in var_name],
+        "root": store.root,
+        "level": level,
+        "low": store.low[2:].tolist(),
+        "high": store.high[2:].tolist(),
+    }
+    return {"formula": formula_str, "ast": ast, "canon_str": canon_str, "canon": canon,
+            "var_name": var_name, "data": data}
+
+
+def apply_diagrams(op, left, right):
+    """left op right, op one of OPERATORS."""
+    mgr = BDDManager(merge_orders(left[1], right[1]))
+    f, g = _load(mgr, left), _load(mgr, right)
+    symbol = OPERATORS[op]
+    size = ast_size(left[0]) + ast_size(right[0])
+    return _result(mgr, mgr.apply(symbol, f, g), [left[0], symbol, right[0]], size)
+
+
+def restrict_diagram(operand, values):
+    """Cofactor by values {var: 0/1}."""
+    mgr = BDDManager(operand[1])
+    f = mgr.restrict(_load(mgr, operand), {mgr.var_level[v]: int(b) for v, b in values.items()})
+    ast = substitute(operand[0], values)
+    return _result(mgr, f, ast, ast_size(ast))
+
+
+def quantify_diagram(operand, variables, quantifier="exists"):
+    """exists / forall variables."""
+    mgr = BDDManager(operand[1])
+    forall = quantifier == "forall"
+    f = mgr.quantify(_load(mgr, operand), [mgr.var_level[v] for v in variables], forall)
+    # each variable eliminated from the AST doubles it at most (before constants fold)
+    size = ast_size(operand[0]) << len(variables)
+    return _result(mgr, f, lambda: eliminate(operand[0], variables, forall), size)
+
+
+def compose_diagrams(operand, var, by):
+    """operand with the variable var replaced by the formula of the diagram by."""
+    mgr = BDDManager(merge_orders(operand[1], by[1]))
+    f = mgr.compose(_load(mgr, operand), mgr.var_level[var], _load(mgr, by))
+    size = ast_size(operand[0], {var: ast_size(by[0])})
+    return _result(mgr, f, lambda: rename_vars(operand[0], {var: by[0]}), size)
+
+
+OPERATIONS = {
+    "apply": apply_diagrams,
+    "restrict": restrict_diagram,
+    "quantify": quantify_diagram,
+    "compose": compose_diagrams,
+}
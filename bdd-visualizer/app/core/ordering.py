@@ -9,6 +9,24 @@ def get_var_order(var_name, input_order:str):
     order = [x for x in input_order if x in var_name] + [x for x in var_name if x not in input_order]
     return order
 
+class OrderError(ValueError):
+    """A variable order given as a list that is not a permutation of the variables of the formula."""
+
+def check_var_order(var_name, order):
+    """Raise OrderError unless the list order holds every variable of var_name exactly once."""
+    if not isinstance(order, list) or not all(isinstance(v, str) for v in order):
+        raise OrderError(f"'var_order' must be a string or a list of variable names, got {order!r}")
+    counts = Counter(order)
+    problems = {
+        "unknown": [v for v in counts if v not in var_name],
+        "missing": [v for v in var_name if v not in counts],
+        "repeated": [v for v, c in counts.items() if c > 1 and v in var_name],
+    }
+    problems = {k: v for k, v in problems.items() if v}
+    if problems:
+        details = ", ".join(f"{k} {v}" for k, v in problems.items())
+        raise OrderError(f"'var_order' must list each variable of the formula once: {details}")
+
 def freq_order_heuristic(expr_str,var_name):
     tokens = re.findall(r"[a-z_][a-z0-9_]*", expr_str)
     freq = Counter(t for t in tokens)
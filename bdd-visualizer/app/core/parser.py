@@ -1,72 +1,351 @@
-from pyparsing import Word, oneOf, infixNotation, opAssoc, ParserElement
 import re
-ParserElement.enablePackrat()
 
+# Formula grammar, operators from the tightest binding: ~, &, |, ^, ->, <->.
+# &, |, ^ and <-> are left associative and give flat chains [a, '&', b, '&', c], -> is right associative.
+BINARY = {"&": (4, "left"), "|": (3, "left"), "^": (2, "left"), "->": (1, "right"), "<->": (0, "left")}
+NOT_PRECEDENCE = 5
+TOKEN = re.compile(r"([a-z_][a-z0-9_]*)|<->|->|[~&|^()]")
+SPACE = re.compile(r"\s*")
 
-variable = Word("abcdefghijklmnopqrstuvwxyz_", "abcdefghijklmnopqrstuvwxyz0123456789_")
 
-not_op = oneOf("~")
-and_op = oneOf("&")
-or_op = oneOf("|")
-xor_op = oneOf("^")
-implies_op = oneOf("->")
-equiv_op = oneOf("<->")
+class FormulaError(ValueError):
+    """Syntax error in a formula, with the position where it was found."""
+    def __init__(self, message, formula, pos):
+        super().__init__(f"{message} (at char {pos}): {formula!r}")
+        self.pos = pos
 
-expr_parser = infixNotation(variable, [
-    (not_op, 1, opAssoc.RIGHT),
-    (and_op, 2, opAssoc.LEFT),
-    (or_op, 2, opAssoc.LEFT),
-    (xor_op, 2, opAssoc.LEFT),
-    (implies_op, 2, opAssoc.RIGHT),  
-    (equiv_op, 2, opAssoc.LEFT),      
-])
 
-def rewrite(ast):
-    if not isinstance(ast, list):
-        return ast 
+def tokenize(formula_str):
+    """Tokens of a formula as (kind, text, position), kind is 'var' or 'op'."""
+    pos = SPACE.match(formula_str).end()
+    while pos < len(formula_str):
+        m = TOKEN.match(formula_str, pos)
+        if m is None:
+            raise FormulaError(f"Unexpected character '{formula_str[pos]}'", formula_str, pos)
+        yield ("var" if m.group(1) else "op"), m.group(0), pos
+        pos = SPACE.match(formula_str, m.end()).end()
 
-    if len(ast) == 2 and ast[0] == "~":
-        return ["~", rewrite(ast[1])]
 
-    if len(ast) == 3:
-        left, op, right = ast
-        left = rewrite(left)
-        right = rewrite(right)
+def parse_formula(formula_str: str):
+    """
+    AST of a formula: a variable name, ['~', x], or a chain [x, op, y, op, z, ...] of one binary operator.
+    The parser is iterative (shunting-yard), so long chains and deep nesting cost no recursion.
+    The AST is hash-consed: equal subterms are the same list object, a DAG where each distinct subterm is stored once.
+    ASTs are shared, never modify them in place.
+    """
+    interned = {}       # (op, child keys...) -> node, children keys are names or id() of interned nodes
 
-        if op == "->":  # a -> b ≡ ~a | b
-            return [["~", left],"|", right]
+    def key_of(x):
+        return x if isinstance(x, str) else id(x)
 
-        if op == "<->":  # a <-> b ≡ (a & b) | (~a & ~b)
-            return [[ left,"&", right],"|", [["~", left],"&", ["~", right]]]
-            
-        if op == "^":  # a ^ b ≡ (a & ~b) | (~a & b)
-            return [[ left,"&", ["~", right]],"|", [["~", left],"&", right]]
+    def make(node, key):
+        return interned.setdefault(key, node)
 
-        return [left, op, right]
+    operands = []       # parsed subterms
+    ops = []            # pending: '(' , '~' or [binary op, number of operands]
 
-    res = rewrite(ast[0])
-    i = 1
-    while i < len(ast):
-        op = ast[i]
-        right = rewrite(ast[i + 1])
-        res = rewrite([res, op, right])
-        i += 2
-    return res
+    def reduce():
+        top = ops.pop()
+        if top == "~":
+            x = operands.pop()
+            operands.append(make(["~", x], ("~", key_of(x))))
+            return
+        op, count = top
+        items = operands[-count:]
+        del operands[-count:]
+        node = [items[0]]
+        for x in items[1:]:
+            node += [op, x]
+        operands.append(make(node, (op,) + tuple(key_of(x) for x in items)))
 
+    expect_operand = True
+    pos = 0
+    for kind, text, pos in tokenize(formula_str):
+        if expect_operand:
+            if kind == "var":
+                operands.append(text)
+                expect_operand = False
+            elif text in ("~", "("):
+                ops.append(text)
+            else:
+                raise FormulaError(f"Expected a variable, '~' or '(', found '{text}'", formula_str, pos)
+        elif text == ")":
+            while ops and ops[-1] != "(":
+                reduce()
+            if not ops:
+                raise FormulaError("Unbalanced ')'", formula_str, pos)
+            ops.pop()
+        elif text in BINARY:
+            prec, assoc = BINARY[text]
+            # operators on the stack that bind tighter are complete
+            while ops and ops[-1] != "(" and (ops[-1] == "~" or BINARY[ops[-1][0]][0] > prec):
+                reduce()
+            if ops and ops[-1] != "(" and ops[-1][0] == text and assoc == "left":
+                ops[-1][1] += 1     # one more operand of the same chain
+            else:
+                ops.append([text, 2])
+            expect_operand = True
+        else:
+            raise FormulaError(f"Expected an operator or ')', found '{text}'", formula_str, pos)
 
-def to_str(ast):
+    if expect_operand:
+        raise FormulaError("Unexpected end of formula", formula_str, len(formula_str))
+    while ops:
+        if ops[-1] == "(":
+            raise FormulaError("Unbalanced '('", formula_str, len(formula_str))
+        reduce()
+    return operands[0]
+
+
+# sympy functions of the operators that sympy does not parse
+SYMPY_FUNCTIONS = {"^": "Xor", "->": "Implies", "<->": "Equivalent"}
+
+
+def _operands(ast):
+    return ast[1:] if len(ast) == 2 and ast[0] == "~" else ast[::2]
+
+
+def _evaluate(ast, leaf, combine, memo=None):
+    """
+    Bottom-up value of an AST: leaf(name) for a variable, combine(subterm, values of its operands)
+    for a compound subterm. The walk is iterative and memoised by id(), so deep nesting costs no
+    recursion and subterms shared in the AST are evaluated once (as in BDDManager.build).
+    """
     if not isinstance(ast, list):
-        return ast
-    if len(ast) == 2 and ast[0] == "~":
-        return f"~({to_str(ast[1])})"
-    if len(ast) == 3:
-        return f"({to_str(ast[0])} {ast[1]} {to_str(ast[2])})"
-    return " ".join(to_str(x) for x in ast)
+        return leaf(ast)
+    done = {} if memo is None else memo     # id(subterm) -> value
 
+    def value(x):
+        return done[id(x)] if isinstance(x, list) else leaf(x)
 
-def parse_formula(formula_str: str):
-    ast = expr_parser.parseString(formula_str, parseAll=True).asList()[0]
+    stack = [(ast, False)]
+    while stack:
+        x, ready = stack.pop()
+        if id(x) in done:
+            continue
+        if not ready:
+            # operands first
+            stack.append((x, True))
+            stack.extend((c, False) for c in _operands(x) if isinstance(c, list) and id(c) not in done)
+            continue
+        done[id(x)] = combine(x, [value(c) for c in _operands(x)])
+    return done[id(ast)]
+
+
+def to_str(ast):
+    """sympy string of an AST: ~, & and | as operators, ^, -> and <-> as sympy functions, nothing expanded."""
+    def combine(x, values):
+        if len(x) == 2 and x[0] == "~":
+            return f"~({values[0]})"
+        op = x[1]
+        if op in SYMPY_FUNCTIONS:
+            # chains fold from the left, as the parser groups them
+            res = values[0]
+            for v in values[1:]:
+                res = f"{SYMPY_FUNCTIONS[op]}({res}, {v})"
+            return res
+        return "(" + f" {op} ".join(values) + ")"
+
+    return _evaluate(ast, lambda v: v, combine)
+
+
+def ast_size(ast, weights=None):
+    """
+    Number of variable occurrences in the formula printed from an AST, subterms shared in the AST counted
+    each time they are printed. weights {var: n} counts a variable as n occurrences (e.g. a substituted formula).
+    """
+    if isinstance(ast, bool):
+        return 0
+    weights = weights or {}
+    return _evaluate(ast, lambda v: weights.get(v, 1), lambda x, sizes: sum(sizes))
+
+
+def substitute(ast, values):
+    """
+    Cofactor an AST by a dict {var: 0/1} and fold the constants away.
+    Return True/False when the result is constant, otherwise a (smaller) AST.
+    Subterms shared in the AST are substituted once.
+    """
+    def leaf(v):
+        return bool(values[v]) if v in values else v
+
+    def combine(x, operands):
+        if len(x) == 2 and x[0] == "~":
+            return _negate(operands[0])
+        res = operands[0]
+        for op, y in zip(x[1::2], operands[1:]):
+            res = _fold(op, res, y)
+        return res
+
+    return _evaluate(ast, leaf, combine)
+
+
+def eliminate(ast, variables, forall=False):
+    """
+    Quantify variables out of an AST: each is replaced by the or (and with forall) of the two
+    cofactors of the formula, constants folded. Return True/False when the result is constant.
+    """
+    op = "&" if forall else "|"
+    for v in variables:
+        if isinstance(ast, bool):
+            break
+        ast = _fold(op, substitute(ast, {v: 0}), substitute(ast, {v: 1}))
     return ast
 
-def eval_with_var(expr,var,val):
-    return expr.subs({var: val})
+
+def _negate(ast):
+    if isinstance(ast, bool):
+        return not ast
+    if isinstance(ast, list) and len(ast) == 2 and ast[0] == "~":
+        return ast[1]
+    return ["~", ast]
+
+
+def _fold(op, left, right):
+    if op == "&":
+        if left is False or right is False:
+            return False
+        if left is True:
+            return right
+        if right is True:
+            return left
+    elif op == "|":
+        if left is True or right is True:
+            return True
+        if left is False:
+            return right
+        if right is False:
+            return left
+    elif op == "->":
+        if left is False or right is True:
+            return True
+        if left is True:
+            return right
+        if right is False:
+            return _negate(left)
+    elif op in ("^", "<->"):
+        flip = op == "^"
+        if isinstance(left, bool):
+            return right if left != flip else _negate(right)
+        if isinstance(right, bool):
+            return left if right != flip else _negate(left)
+
+    # keep associative chains flat: [a, '&', b, '&', c]
+    if op != "->" and isinstance(left, list) and len(left) > 2 and left[1] == op:
+        return left + [op, right]
+    return [left, op, right]
+
+
+def to_formula(ast, memo=None):
+    """
+    Readable infix string of an AST, parentheses only around compound operands.
+    memo {id(subterm): string} is reused across calls on subterms that stay alive.
+    """
+    if isinstance(ast, bool):
+        return str(ast)
+
+    def combine(x, texts):
+        wrapped = [f"({t})" if isinstance(c, list) and len(c) > 2 else t for c, t in zip(_operands(x), texts)]
+        if len(x) == 2 and x[0] == "~":
+            return f"~{wrapped[0]}"
+        out = [wrapped[0]]
+        for op, t in zip(x[1::2], wrapped[1:]):
+            out += [op, t]
+        return " ".join(out)
+
+    return _evaluate(ast, lambda v: v, combine, memo)
+
+
+ASSOCIATIVE = ("&", "|", "^", "<->")    # all of them are commutative too
+
+
+def normalize(ast):
+    """
+    Normal form of an AST up to associativity and commutativity: chains of the same operator
+    are flattened, their operands sorted and double negations dropped. '->' keeps its operands.
+    """
+    texts = {}      # sort keys of the normalized subterms, see to_formula
+    made = []       # normalized subterms stay alive while their ids are keys of texts
+
+    def make(node):
+        made.append(node)
+        return node
+
+    def combine(x, operands):
+        if len(x) == 2 and x[0] == "~":
+            inner = operands[0]
+            if isinstance(inner, list) and len(inner) == 2 and inner[0] == "~":
+                return inner[1]
+            return make(["~", inner])
+
+        op = x[1]
+        if op not in ASSOCIATIVE:
+            # a -> b -> c is nested to the right by the parser, fold any flat chain the same way
+            res = operands[-1]
+            for y in reversed(operands[:-1]):
+                res = make([y, op, res])
+            return res
+
+        flat = []
+        for y in operands:
+            if isinstance(y, list) and len(y) > 2 and y[1] == op:
+                flat.extend(y[::2])
+            else:
+                flat.append(y)
+        flat.sort(key=lambda y: to_formula(y, texts))
+        res = [flat[0]]
+        for y in flat[1:]:
+            res += [op, y]
+        return make(res)
+
+    return _evaluate(ast, lambda v: v, combine)
+
+
+def rename_vars(ast, mapping):
+    """Rename the variables of an AST with mapping {old: new}."""
+    def combine(x, operands):
+        if len(x) == 2 and x[0] == "~":
+            return ["~", operands[0]]
+        res = [operands[0]]
+        for op, y in zip(x[1::2], operands[1:]):
+            res += [op, y]
+        return res
+
+    return _evaluate(ast, lambda v: mapping.get(v, v), combine)
+
+
+def _variables(ast):
+    # variables in order of first occurrence (left to right), subterms shared in the AST are visited once
+    out, seen = {}, set()
+    stack = [ast]
+    while stack:
+        x = stack.pop()
+        if not isinstance(x, list):
+            out.setdefault(x)
+        elif id(x) not in seen:
+            seen.add(id(x))
+            stack.extend(reversed(_operands(x)))
+    return list(out)
+
+
+def canonical_form(ast, rename=True):
+    """
+    Canonical string of a formula, equal for inputs that only differ by associativity,
+    operand order, parentheses or double negation. With rename the variables are also renamed
+    v0, v1, ... in order of appearance, so formulas equal up to variable names usually share
+    it too (sorting depends on the names, so this is repeated until it is stable; it is a
+    best effort, not a complete isomorphism test).
+    Return (canonical string, canonical AST, mapping {input var: canonical var}).
+    """
+    form = normalize(ast)
+    mapping = {v: v for v in _variables(ast)}
+    if rename:
+        seen = set()
+        key = to_formula(form)
+        while key not in seen:
+            seen.add(key)
+            step = {v: f"v{i}" for i, v in enumerate(_variables(form))}
+            mapping = {v: step[c] for v, c in mapping.items()}
+            form = normalize(rename_vars(form, step))
+            key = to_formula(form)
+    return to_formula(form), form, mapping
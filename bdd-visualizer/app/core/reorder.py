@@ -0,0 +1,364 @@
+import time
+import random
+import numpy as np
+from app.core.manager import BDDManager
+from app.core.ordering import freq_order_heuristic
+from app.utils import get_logger, get_process_pool, in_worker, POOL_WORKERS
+
+logger = get_logger("reorder")
+
+EXACT_MAX_VARS = 12
+STRATEGIES = ('freq', 'ls', 'sift', 'win2', 'win3', 'exact', 'parallel')
+DEFAULT_SEEDS = 8
+
+
+class Budget:
+    """
+    Wall-clock and node limits of a reordering run.
+    ----------
+    Parameters
+    ----------
+    time_budget: float or None
+            Seconds allowed for the search, None for no limit
+    node_budget: int or None
+            Largest intermediate diagram (nodes) a move may create, None for no limit
+    deadline: float or None
+            Wall-clock time (time.time()) the search must end by whatever time_budget allows, e.g. the end
+            of the budget shared by the seeds of a parallel search. None for no such limit
+
+    timed_out and over_budget tell whether the time or the node budget stopped the search.
+    """
+    def __init__(self, time_budget=None, node_budget=None, deadline=None):
+        self.start = time.perf_counter()
+        self.deadline = self.start + time_budget if time_budget else None
+        if deadline is not None:
+            shared = self.start + (deadline - time.time())
+            self.deadline = shared if self.deadline is None else min(self.deadline, shared)
+        self.node_budget = node_budget
+        self.timed_out = False
+        self.over_budget = False
+
+    def expired(self):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.timed_out = True
+        return self.timed_out
+
+    def too_big(self, size):
+        over = self.node_budget is not None and size > self.node_budget
+        self.over_budget |= over
+        return over
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+def local_sift(mgr, budget):
+    """
+    Greedy adjacent swaps, a swap is kept while it shrinks the diagram. A swap over the node budget
+    is undone and ends the search: the current order is always the best one seen.
+    """
+    improved = True
+    while improved and not budget.expired():
+        improved = False
+        for i in range(mgr.n_vars - 1):
+            size = mgr.live
+            mgr.swap(i)
+            if mgr.live < size:
+                improved = True
+            else:
+                over = budget.too_big(mgr.live)
+                mgr.swap(i)
+                if over:
+                    return
+            if budget.expired():
+                break
+
+
+def _move(mgr, pos, target):
+    while pos < target:
+        mgr.swap(pos)
+        pos += 1
+    while pos > target:
+        mgr.swap(pos - 1)
+        pos -= 1
+    return pos
+
+
+def sift(mgr, budget, max_growth=1.2):
+    """
+    Rudell sifting: each variable, largest level first, is moved through every position
+    and left where the diagram was smallest. A direction is abandoned once the size grows
+    over max_growth times the best size or over the node budget.
+    """
+    n = mgr.n_vars
+    by_size = sorted(mgr.var_order, key=lambda v: -len(mgr.unique[mgr.var_level[v]]))
+    for var in by_size:
+        if budget.expired():
+            break
+        pos = mgr.var_level[var]
+        best_size, best_pos = mgr.live, pos
+        ends = [0, n - 1] if pos < n / 2 else [n - 1, 0]
+        for end in ends:
+            step = 1 if end > pos else -1
+            while pos != end:
+                mgr.swap(pos if step == 1 else pos - 1)
+                pos += step
+                if mgr.live < best_size:
+                    best_size, best_pos = mgr.live, pos
+                if budget.too_big(mgr.live) or mgr.live > max_growth * best_size or budget.expired():
+                    break
+        _move(mgr, pos, best_pos)
+
+
+def _sjt_swaps(k):
+    """Adjacent swap positions that walk through all k! permutations and back (Steinhaus-Johnson-Trotter)."""
+    perm = list(range(k))
+    direction = [-1] * k
+    swaps = []
+    while True:
+        mobile = -1
+        for i in range(k):
+            j = i + direction[i]
+            if 0 <= j < k and perm[j] < perm[i] and (mobile < 0 or perm[i] > perm[mobile]):
+                mobile = i
+        if mobile < 0:
+            break
+        j = mobile + direction[mobile]
+        swaps.append(min(mobile, j))
+        perm[mobile], perm[j] = perm[j], perm[mobile]
+        direction[mobile], direction[j] = direction[j], direction[mobile]
+        for i in range(k):
+            if perm[i] > perm[j]:
+                direction[i] = -direction[i]
+    return swaps + [0]
+
+
+def window_permute(mgr, budget, k=3):
+    """
+    Try every permutation of each window of k adjacent levels, repeat while the size shrinks.
+    A permutation over the node budget ends the search, back at the best permutation of the window.
+    """
+    k = min(k, mgr.n_vars)
+    if k < 2:
+        return
+    swaps = _sjt_swaps(k)
+    improved = True
+    while improved and not budget.expired():
+        improved = False
+        for i in range(mgr.n_vars - k + 1):
+            start_size = best_size = mgr.live
+            best = 0
+            for step, s in enumerate(swaps):
+                mgr.swap(i + s)
+                if budget.too_big(mgr.live):
+                    # adjacent swaps undo themselves: retrace the permutations back to the best one
+                    for t in reversed(swaps[best:step + 1]):
+                        mgr.swap(i + t)
+                    return
+                if mgr.live < best_size:
+                    best_size, best = mgr.live, step + 1
+            for s in swaps[:best % len(swaps)]:
+                mgr.swap(i + s)
+            if best_size < start_size:
+                improved = True
+            if budget.expired():
+                break
+
+
+def _truth_table(mgr, f):
+    """Boolean truth table of f as an n-dimensional array, axis i is level i."""
+    n = mgr.n_vars
+    memo = {}       # (node, level) -> table of the node over the levels from level on
+    stack = [(f, 0)]
+    while stack:
+        key = stack[-1]
+        if key in memo:
+            stack.pop()
+            continue
+        u, level = key
+        if level == n:
+            memo[key] = np.array([u == 1])
+            stack.pop()
+            continue
+        if mgr.level[u] > level:
+            parts = ((u, level + 1),)
+        else:
+            parts = ((mgr.low[u], level + 1), (mgr.high[u], level + 1))
+        pending = [k for k in parts if k not in memo]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        t = [memo[k] for k in parts]
+        memo[key] = np.concatenate(t * 2 if len(t) == 1 else t)
+
+    return memo[(f, 0)].reshape((2,) * n)
+
+
+def exact_order(mgr, f, budget):
+    """
+    Exact minimum-size order by dynamic programming over the set of variables placed on top
+    (Friedman-Supowit). The number of nodes of a variable only depends on which variables are
+    above it: the distinct cofactors over those variables that still depend on it.
+    Return False when the budget ran out, the order is then left unchanged: the time budget
+    during the search, or the node budget on the way to the order found.
+    """
+    n = mgr.n_vars
+    table = _truth_table(mgr, f)
+    full = (1 << n) - 1
+    best = {0: (0, [])}
+
+    # supersets are numerically larger, so best[mask] is final when mask is reached
+    for mask in range(full):
+        if budget.expired():
+            return False
+        cost, order = best[mask]
+        for x, width in _level_widths(table, mask, n):
+            nxt = mask | (1 << x)
+            if nxt not in best or cost + width < best[nxt][0]:
+                best[nxt] = (cost + width, order + [x])
+
+    names = list(mgr.var_order)
+    swaps = _order_swaps(names, [names[i] for i in best[full][1]])
+    for step, i in enumerate(swaps):
+        mgr.swap(i)
+        if budget.too_big(mgr.live):
+            for j in reversed(swaps[:step + 1]):
+                mgr.swap(j)
+            return False
+    return True
+
+
+def _level_widths(table, above, n):
+    """Yield (x, number of nodes of x) for each variable x placed right below the set above."""
+    above_axes = [i for i in range(n) if above >> i & 1]
+    rest = [i for i in range(n) if not above >> i & 1]
+    rows = table.transpose(above_axes + rest).reshape(1 << len(above_axes), -1)
+    rows = np.unique(np.packbits(rows, axis=1), axis=0)
+    rows = np.unpackbits(rows, axis=1, count=1 << len(rest))
+    for p, x in enumerate(rest):
+        r = rows.reshape(len(rows), 1 << p, 2, -1)
+        yield x, int((r[:, :, 0, :] != r[:, :, 1, :]).any(axis=(1, 2)).sum())
+
+
+def _order_swaps(current, order):
+    """Adjacent swap positions that bring the variable order current to order, as reorder_to makes them."""
+    current = list(current)
+    swaps = []
+    for target, var in enumerate(order):
+        pos = current.index(var)
+        while pos > target:
+            current[pos - 1], current[pos] = current[pos], current[pos - 1]
+            swaps.append(pos - 1)
+            pos -= 1
+    return swaps
+
+
+def reorder_to(mgr, order):
+    """Bring mgr to the given variable order with adjacent swaps."""
+    for target, var in enumerate(order):
+        _move(mgr, mgr.var_level[var], target)
+
+
+def reorder(mgr, f, strategy, budget):
+    """
+    Run an ordering strategy in place on a collected manager with root f.
+    Return a report with the strategy used, the order and size found and the time spent.
+    """
+    if strategy == 'exact' and mgr.n_vars > EXACT_MAX_VARS:
+        logger.warning(f'Exact ordering supports at most {EXACT_MAX_VARS} variables, using sifting')
+        strategy = 'sift'
+
+    if strategy == 'ls':
+        local_sift(mgr, budget)
+    elif strategy == 'sift':
+        sift(mgr, budget)
+    elif strategy == 'win2':
+        window_permute(mgr, budget, 2)
+    elif strategy == 'win3':
+        window_permute(mgr, budget, 3)
+    elif strategy == 'exact':
+        exact_order(mgr, f, budget)
+
+    return {
+        "strategy": strategy,
+        "order": list(mgr.var_order),
+        "size": mgr.size(f),
+        "elapsed": round(budget.elapsed(), 6),
+        "timed_out": budget.timed_out,
+        "over_budget": budget.over_budget,
+    }
+
+
+def search_seed(job):
+    """Search from one seed order, runs in a worker process: only plain data goes in and out."""
+    ast, order, strategy, time_budget, node_budget, deadline = job
+    mgr = BDDManager(order)
+    f = mgr.build(ast)
+    mgr.collect([f])
+    info = reorder(mgr, f, strategy, Budget(time_budget, node_budget, deadline))
+    return info["size"], info["order"], info["timed_out"], info["over_budget"]
+
+
+def seed_orders(expr_str, var_name, n_seeds, seed=0):
+    """Frequency, input and reversed orders followed by seeded random shuffles, without duplicates."""
+    orders = []
+    for order in (freq_order_heuristic(expr_str, var_name), list(var_name), list(reversed(var_name))):
+        if order not in orders:
+            orders.append(order)
+    rng = random.Random(seed)
+    for _ in range(n_seeds * 4):
+        if len(orders) >= n_seeds:
+            break
+        order = list(var_name)
+        rng.shuffle(order)
+        if order not in orders:
+            orders.append(order)
+    return orders[:max(n_seeds, 1)]
+
+
+def seed_jobs(ast, expr_str, var_name, strategy='sift', n_seeds=DEFAULT_SEEDS, time_budget=None, node_budget=None):
+    """
+    Arguments of search_seed for each seed order of a parallel search. time_budget is the budget of the
+    whole search, not of each seed: every seed ends by the same deadline, whether the seeds run at once on
+    several workers or one after the other.
+    """
+    deadline = time.time() + time_budget if time_budget else None
+    return [(ast, order, strategy, time_budget, node_budget, deadline)
+            for order in seed_orders(expr_str, var_name, n_seeds)]
+
+
+def merge_seeds(results, strategy, start):
+    """
+    Report of a parallel search from the search_seed results, in seed order.
+    Results are merged deterministically: smallest size first, then the earliest seed.
+    """
+    best = min(range(len(results)), key=lambda i: (results[i][0], i))
+    size, order = results[best][:2]
+    logger.info(f'Parallel search: {len(results)} seeds, sizes {[r[0] for r in results]}')
+    return {
+        "strategy": "parallel",
+        "base": strategy,
+        "seeds": len(results),
+        "order": order,
+        "size": size,
+        "elapsed": round(time.perf_counter() - start, 6),
+        "timed_out": any(r[2] for r in results),
+        "over_budget": any(r[3] for r in results),
+    }
+
+
+def parallel_search(ast, expr_str, var_name, strategy='sift', n_seeds=DEFAULT_SEEDS, time_budget=None, node_budget=None):
+    """Restart an ordering strategy from several seed orders on the process pool (serially inside a pool worker)."""
+    start = time.perf_counter()
+    jobs = seed_jobs(ast, expr_str, var_name, strategy, n_seeds, time_budget, node_budget)
+    if POOL_WORKERS > 1 and len(jobs) > 1 and not in_worker():
+        results = list(get_process_pool().map(search_seed, jobs))
+    else:
+        results = []
+        for job in jobs:
+            # seeds left when the shared deadline has passed would only rebuild their seed order
+            if results and job[5] is not None and time.time() > job[5]:
+                break
+            results.append(search_seed(job))
+    return merge_seeds(results, strategy, start)
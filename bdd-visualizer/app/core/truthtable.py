@@ -0,0 +1,128 @@
+import numpy as np
+from app.core.manager import FALSE, TRUE
+from app.core.parser import _evaluate
+
+TRUTHTABLE_MAX_VARS = 24
+
+
+class EngineError(ValueError):
+    """A build engine that cannot build the formula: unknown, or the truth table over too many variables."""
+
+# byte patterns of a variable whose 0/1 blocks are shorter than a byte (block of 1, 2, 4 bits)
+_SUB_BYTE = {1: 0x55, 2: 0x33, 4: 0x0F}
+
+
+def var_table(level, n):
+    """
+    Packed truth table (np.uint8, MSB first) of the variable at level over all 2^n assignments.
+    Assignment index bits are ordered like the levels: level 0 is the most significant bit.
+    """
+    block = 1 << (n - 1 - level)    # run length of 0s then 1s
+    n_bytes = max(1, (1 << n) // 8)
+    if block >= 8:
+        pattern = np.concatenate([
+            np.zeros(block // 8, dtype=np.uint8),
+            np.full(block // 8, 0xFF, dtype=np.uint8),
+        ])
+        return np.tile(pattern, n_bytes // len(pattern))
+    return np.full(n_bytes, _SUB_BYTE[block], dtype=np.uint8)
+
+
+def eval_table(ast, var_level, n, tables=None):
+    """
+    Evaluate an AST (parse_formula) into a packed truth table with vectorised bitwise ops.
+    The walk is parser._evaluate: iterative, subterms shared in the AST are evaluated once.
+    tables {var: table} holds the variable tables.
+    """
+    if tables is None:
+        tables = {}
+
+    def leaf(v):
+        if v not in tables:
+            tables[v] = var_table(var_level[v], n)
+        return tables[v]
+
+    def combine(x, operands):
+        if len(x) == 2 and x[0] == "~":
+            return np.invert(operands[0])
+        res = operands[0]
+        for op, right in zip(x[1::2], operands[1:]):
+            if op == "&":
+                res = res & right
+            elif op == "|":
+                res = res | right
+            elif op == "^":
+                res = res ^ right
+            elif op == "->":
+                res = np.invert(res) | right
+            elif op == "<->":
+                res = np.invert(res ^ right)
+            else:
+                raise ValueError(f"Unknown operator: {op}")
+        return res
+
+    return _evaluate(ast, leaf, combine)
+
+
+def _mask(nbits):
+    # valid (leading) bits of a table shorter than one byte
+    return (0xFF << (8 - nbits)) & 0xFF
+
+
+def _constant(table, nbits):
+    if nbits < 8:
+        b = int(table[0])
+        if b == 0:
+            return FALSE
+        if b == _mask(nbits):
+            return TRUE
+        return None
+    if not table.any():
+        return FALSE
+    if (table == 0xFF).all():
+        return TRUE
+    return None
+
+
+def _halves(table, nbits):
+    if nbits >= 16:
+        mid = len(table) // 2
+        return table[:mid], table[mid:]
+    half = nbits // 2
+    b = int(table[0])
+    m = _mask(half)
+    low = np.array([b & m], dtype=np.uint8)
+    high = np.array([(b << half) & m], dtype=np.uint8)
+    return low, high
+
+
+def build_truthtable(mgr, ast):
+    """
+    Build the ROBDD of ast into mgr from its truth table.
+    Each level halves the table slices, equal slices are found by hashing their bytes.
+    Return the root id.
+    """
+    n = mgr.n_vars
+    if n > TRUTHTABLE_MAX_VARS:
+        raise EngineError(f"Truth table engine supports at most {TRUTHTABLE_MAX_VARS} variables, got {n}")
+
+    table = eval_table(ast, mgr.var_level, n)
+    nbits = 1 << n
+    if nbits < 8:
+        table = table & _mask(nbits)
+
+    memo = {}   # (level, slice bytes) -> node id
+
+    def node(t, nbits, level):
+        c = _constant(t, nbits)
+        if c is not None:
+            return c
+        key = (level, t.tobytes())
+        u = memo.get(key)
+        if u is None:
+            low, high = _halves(t, nbits)
+            u = mgr.mk(level, node(low, nbits // 2, level + 1), node(high, nbits // 2, level + 1))
+            memo[key] = u
+        return u
+
+    return node(table, nbits, 0)
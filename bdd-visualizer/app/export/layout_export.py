@@ -1,32 +1,39 @@
-from collections import deque
+import os
 from typing import Dict, Any, List, Tuple
+from collections import deque
 
 from graphviz import Digraph
 
 from app.core.bdd import BDD, BDDNode
+from app.export.sugiyama import sugiyama_layout
 from app.utils import*
 
 logger = get_logger('BDD Layout Exporter')
+# 'native' lays diagrams out in process (sugiyama_layout), 'dot' runs Graphviz
+LAYOUT_ENGINE = os.getenv("BDD_LAYOUT_ENGINE", "native")
+LAYOUT_ENGINES = ('native', 'dot')
 
-def _collect_edge_styles(root: BDDNode) -> Dict[Tuple[str, str], str]:
+def _collect_edge_styles(root: BDDNode, max_depth: int = None) -> Dict[Tuple[str, str], str]:
     styles: Dict[Tuple[str, str], str] = {}
-    seen = set()
-    dq = deque([root])
-    while dq:
-        n = dq.popleft()
-        if n.id in seen:
-            continue
-        seen.add(n.id)
-        if n.low is not None:
-            styles[(str(n.id), str(n.low.id))] = "dashed"
-            dq.append(n.low)
-        if n.high is not None:
-            styles[(str(n.id), str(n.high.id))] = "solid"
-            dq.append(n.high)
+    for n in BDD.walk(root, False, max_depth):
+        for val, c in BDD.children(n, max_depth):
+            styles[(str(n.id), str(c.id))] = "solid" if val else "dashed"
     return styles
 
 
-def _build_id_maps(root: BDDNode) -> Tuple[Dict[str, str], Dict[str, str]]:
+def json_id(n: BDDNode) -> str:
+    """Id of a node in to_json: 'node_{id}' for decision nodes, 'terminal_true/false' for terminals."""
+    if n.var is None:
+        return f"terminal_{str(n.expr).lower()}"
+    return f"node_{n.id}"
+
+
+def edge_id(tail: str, style: str) -> str:
+    """Id of the low (dashed) or high (solid) edge leaving the node with json id tail."""
+    return f"{tail}_{'high' if style == 'solid' else 'low'}"
+
+
+def _build_id_maps(root: BDDNode, max_depth: int = None) -> Tuple[Dict[str, str], Dict[str, str]]:
     """
     Build mapping between Graphviz node names (numeric string ids) and JSON ids
     used by to_json: 'node_{id}' for decision nodes, and 'terminal_true/false' for terminals.
@@ -34,40 +41,65 @@ def _build_id_maps(root: BDDNode) -> Tuple[Dict[str, str], Dict[str, str]]:
     """
     gv_to_json: Dict[str, str] = {}
     json_to_gv: Dict[str, str] = {}
-    seen = set()
-    dq = deque([root])
-
-    def json_id(n: BDDNode) -> str:
-        if n.var is None:
-            return f"terminal_{str(n.expr).lower()}"
-        return f"node_{n.id}"
 
-    while dq:
-        n = dq.popleft()
-        if n.id in seen:
-            continue
-        seen.add(n.id)
+    for n in BDD.walk(root, False, max_depth):
         j = json_id(n)
         gv = str(n.id)
         gv_to_json[gv] = j
         json_to_gv[j] = gv
-        if n.low is not None:
-            dq.append(n.low)
-        if n.high is not None:
-            dq.append(n.high)
 
     return gv_to_json, json_to_gv
 
 
-def bdd2layout(r: BDDNode | Digraph, highlight: str = None) -> Dict[str, Any]:
+def highlight_overlay(root: BDDNode, values, max_depth: int = None) -> Dict[str, List[str]]:
+    """
+    Nodes and edges lit by BDD.eval_path(root, values), as {"nodes": json ids, "edges": edge ids of edges_json},
+    to draw over a layout computed without highlight. The diagram is not modified and only the
+    highlighted part is visited: one path per fully assigned formula.
+    """
+    if not values:
+        return {"nodes": [], "edges": []}
+    if isinstance(values, str):
+        ls = [x.split(':') for x in values.split(' ')]
+        values = {k: int(v) for [k, v] in ls}
+
+    nodes: List[str] = []
+    edges: List[str] = []
+    visited = set()
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        j = json_id(node)
+        if j in visited:
+            continue
+        visited.add(j)
+        nodes.append(j)
+        for val, c in BDD.children(node, max_depth):
+            if node.var in values and values[node.var] != val:
+                continue
+            edges.append(edge_id(j, "solid" if val else "dashed"))
+            queue.append(c)
+    return {"nodes": nodes, "edges": edges}
+
+
+def bdd2layout(r: BDDNode | Digraph, highlight: str = None, max_depth: int = None, engine: str = None) -> Dict[str, Any]:
     """
     Build Graphviz layout and return JSON with nodes, edge splines and bbox.
     Coordinates are returned in pixels, using 72 px per inch (Graphviz plain units).
     Also includes a mapping keyed by the JSON node ids used in export-json
     so the frontend can render with consistent identities.
-    """ 
-    if isinstance(r, BDDNode):
-        dot = BDD.to_graphviz(r, to_latex=False, highlight=highlight)
+    max_depth cuts off decision nodes below that level (for large unreduced BDDs).
+    engine: 'native' (default, BDD_LAYOUT_ENGINE) for the built-in layered layout with polyline edges,
+    'dot' for Graphviz splines. A Digraph is always laid out by dot.
+    """
+    engine = engine or LAYOUT_ENGINE
+    if engine not in LAYOUT_ENGINES:
+        raise ValueError(f"Unknown layout engine '{engine}', expected one of {LAYOUT_ENGINES}")
+    if engine == 'native' and not isinstance(r, Digraph):
+        return sugiyama_layout(r, max_depth)
+
+    if not isinstance(r, Digraph):
+        dot = BDD.to_graphviz(r, to_latex=False, highlight=highlight, max_depth=max_depth, render=False)
         root_node = r
     else:
         dot = r
@@ -79,8 +111,8 @@ def bdd2layout(r: BDDNode | Digraph, highlight: str = None) -> Dict[str, Any]:
     gv_to_json: Dict[str, str] = {}
     json_to_gv: Dict[str, str] = {}
     if root_node is not None:
-        edge_styles = _collect_edge_styles(root_node)
-        gv_to_json, json_to_gv = _build_id_maps(root_node)
+        edge_styles = _collect_edge_styles(root_node, max_depth)
+        gv_to_json, json_to_gv = _build_id_maps(root_node, max_depth)
 
     DPI = 72.0
 
@@ -136,6 +168,7 @@ def bdd2layout(r: BDDNode | Digraph, highlight: str = None) -> Dict[str, Any]:
             head_json = gv_to_json.get(e["head"])  # type: ignore
             if tail_json and head_json:
                 edges_json.append({
+                    "id": edge_id(tail_json, e.get("style", "solid")),
                     "tail": tail_json,
                     "head": head_json,
                     "points": e["points"],
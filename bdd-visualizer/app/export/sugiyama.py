@@ -0,0 +1,253 @@
+import math
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+
+from app.core.bdd import BDD, BDDNode
+
+# Geometry in points (72 per inch), sizes follow the Graphviz defaults used by BDD.to_graphviz
+DPI = 72.0
+NODE_SEP = 18.0         # nodesep 0.25in, between neighbours of a rank
+RANK_SEP = 36.0         # ranksep 0.5in, between ranks
+PAD = 4.0               # around the drawing, as Graphviz pad
+MIN_WIDTH = 54.0        # 0.75in
+MIN_HEIGHT = 36.0       # 0.5in
+CHAR_WIDTH = 7.0        # 14pt Times, average glyph
+LABEL_MARGIN = 16.0     # 0.11in on each side
+SWEEPS = 8              # barycentric sweeps (down + up) of crossing reduction
+TRANSPOSE_PASSES = 4    # passes of adjacent swaps after each sweep
+TRANSPOSE_MAX_VERTICES = 5000   # nodes and bend points, above this only sweeps are done
+COORD_PASSES = 4        # coordinate assignment passes
+
+
+def _node_size(node: BDDNode) -> Tuple[float, float, str]:
+    """(width, height, shape) of a node as drawn by BDD.to_graphviz: circles and terminal boxes."""
+    if node.var is None:
+        return max(MIN_WIDTH, CHAR_WIDTH * len(str(node.expr)) + LABEL_MARGIN), MIN_HEIGHT, "box"
+    d = max(MIN_WIDTH, CHAR_WIDTH * len(str(node.var)) + LABEL_MARGIN)
+    return d, d, "circle"
+
+
+def _crossings(edges: List[Tuple[int, int]]) -> int:
+    """Crossings between two adjacent ranks: inversions of the lower ends, edges sorted by upper then lower end."""
+    lower = [b for _, b in sorted(edges)]
+    size = max(lower, default=-1) + 1
+    tree = [0] * (size + 1)
+    count = 0
+    for seen, b in enumerate(lower):
+        # edges already placed whose lower end is right of b
+        i, le = b + 1, 0
+        while i > 0:
+            le += tree[i]
+            i -= i & -i
+        count += seen - le
+        i = b + 1
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+    return count
+
+
+def _place(desired: List[float], widths: List[float]) -> List[float]:
+    """
+    x of the nodes of a rank, in this order, closest to desired (least squares) while keeping
+    NODE_SEP between neighbours: isotonic regression (pool adjacent violators) on the shifted targets.
+    """
+    offsets, acc = [], 0.0
+    for i, w in enumerate(widths):
+        if i:
+            acc += (widths[i - 1] + w) / 2 + NODE_SEP
+        offsets.append(acc)
+    blocks: List[List[float]] = []      # [mean, weight]
+    for d, o in zip(desired, offsets):
+        blocks.append([d - o, 1.0])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            m2, w2 = blocks.pop()
+            m1, w1 = blocks.pop()
+            blocks.append([(m1 * w1 + m2 * w2) / (w1 + w2), w1 + w2])
+    out: List[float] = []
+    for m, w in blocks:
+        out.extend([m] * int(w))
+    return [x + o for x, o in zip(out, offsets)]
+
+
+def _clip(cx: float, cy: float, w: float, h: float, shape: str, tx: float, ty: float) -> Tuple[float, float]:
+    """Point where the segment from the node centre towards (tx, ty) leaves the node border."""
+    dx, dy = tx - cx, ty - cy
+    if dx == 0 and dy == 0:
+        return cx, cy
+    if shape == "circle":
+        r = w / 2 / math.hypot(dx, dy)
+    else:
+        r = min(w / 2 / abs(dx) if dx else math.inf, h / 2 / abs(dy) if dy else math.inf)
+    return cx + dx * r, cy + dy * r
+
+
+def sugiyama_layout(root: BDDNode, max_depth: int = None) -> Dict[str, Any]:
+    """
+    Layered layout of a BDD/ROBDD without Graphviz, in the schema of bdd2layout.
+    Ranks are the variable levels (terminals below the deepest decision node, empty levels skipped),
+    edges spanning several ranks get a bend point per rank crossed. Node order in each rank comes from
+    barycentric sweeps and adjacent swaps (the order with the fewest crossings is kept), x coordinates from repeated
+    least-squares placement towards the neighbours. Edges are polylines clipped at the node borders.
+    Node names are the Graphviz names of BDD.to_graphviz (str(node.id)), y grows upwards as in Graphviz.
+    """
+    if root is None:
+        raise ValueError("Null root")
+
+    names: List[str] = []
+    size: Dict[str, Tuple[float, float, str]] = {}
+    json_id: Dict[str, str] = {}
+    level: Dict[str, int] = {}
+    edges: List[Tuple[str, str, str]] = []      # (tail, head, style)
+    for n in BDD.walk(root, False, max_depth):
+        name = str(n.id)
+        names.append(name)
+        size[name] = _node_size(n)
+        json_id[name] = f"node_{n.id}" if n.var is not None else f"terminal_{str(n.expr).lower()}"
+        level[name] = n.level if n.var is not None else None
+        for val, c in BDD.children(n, max_depth):
+            edges.append((name, str(c.id), "solid" if val else "dashed"))
+
+    used = sorted({l for l in level.values() if l is not None})
+    rank_of_level = {l: i for i, l in enumerate(used)}
+    rank = {v: rank_of_level[l] if l is not None else len(used) for v, l in level.items()}
+    n_ranks = max(rank.values()) + 1
+
+    # long edges are cut in unit segments through one dummy vertex per rank crossed
+    layers: List[List[str]] = [[] for _ in range(n_ranks)]
+    for v in names:
+        layers[rank[v]].append(v)
+    up: Dict[str, List[str]] = {v: [] for v in names}
+    down: Dict[str, List[str]] = {v: [] for v in names}
+    chains: List[Tuple[str, str, str, List[str]]] = []
+    for k, (t, h, style) in enumerate(edges):
+        chain = [t]
+        for r in range(rank[t] + 1, rank[h]):
+            d = f"d{k}_{r}"
+            rank[d] = r
+            size[d] = (0.0, 0.0, "dummy")
+            layers[r].append(d)
+            up[d], down[d] = [], []
+            chain.append(d)
+        chain.append(h)
+        for a, b in zip(chain, chain[1:]):
+            down[a].append(b)
+            up[b].append(a)
+        chains.append((t, h, style, chain[1:-1]))
+
+    # crossing reduction: barycentric sweeps from the walk order
+    def total_crossings(order):
+        pos = {v: i for layer in order for i, v in enumerate(layer)}
+        return sum(_crossings([(pos[a], pos[b]) for a in order[r] for b in down[a]])
+                   for r in range(n_ranks - 1))
+
+    def sweep(layer, neighbours, pos):
+        def bary(iv):
+            i, v = iv
+            ps = [pos[u] for u in neighbours[v]]
+            # nodes without neighbours on that side keep their place
+            return (sum(ps) / len(ps) if ps else i, i)
+        return [v for _, v in sorted(enumerate(layer), key=bary)]
+
+    def pair_crossings(u, v, pos):
+        # crossings between the edges of u and v when u is left of v
+        return sum(1 for side in (up, down) for a in side[u] for b in side[v] if pos[a] > pos[b])
+
+    def transpose(order):
+        # swap neighbours of a rank while that removes crossings (as dot does)
+        pos = {v: i for layer in order for i, v in enumerate(layer)}
+        for _ in range(TRANSPOSE_PASSES):
+            improved = False
+            for layer in order:
+                for i in range(len(layer) - 1):
+                    u, v = layer[i], layer[i + 1]
+                    if pair_crossings(u, v, pos) > pair_crossings(v, u, pos):
+                        layer[i], layer[i + 1] = v, u
+                        pos[u], pos[v] = i + 1, i
+                        improved = True
+            if not improved:
+                break
+
+    order = [list(layer) for layer in layers]
+    best, best_crossings = [list(l) for l in order], total_crossings(order)
+    for it in range(SWEEPS):
+        if best_crossings == 0:
+            break
+        if it % 2 == 0:
+            ranks, neighbours = range(1, n_ranks), up
+        else:
+            ranks, neighbours = range(n_ranks - 2, -1, -1), down
+        for r in ranks:
+            pos = {v: i for i, v in enumerate(order[r - 1 if neighbours is up else r + 1])}
+            order[r] = sweep(order[r], neighbours, pos)
+        if len(rank) <= TRANSPOSE_MAX_VERTICES:
+            transpose(order)
+        c = total_crossings(order)
+        if c < best_crossings:
+            best, best_crossings = [list(l) for l in order], c
+    order = best
+
+    # coordinate assignment: pack each rank, then pull nodes towards their neighbours
+    x: Dict[str, float] = {}
+    for layer in order:
+        widths = [size[v][0] for v in layer]
+        for v, px in zip(layer, _place([0.0] * len(layer), widths)):
+            x[v] = px
+    for p in range(COORD_PASSES + 1):
+        if p == COORD_PASSES:
+            ranks, sides = range(n_ranks), (up, down)
+        elif p % 2 == 0:
+            ranks, sides = range(1, n_ranks), (up,)
+        else:
+            ranks, sides = range(n_ranks - 2, -1, -1), (down,)
+        for r in ranks:
+            layer = order[r]
+            desired = []
+            for v in layer:
+                ps = [x[u] for side in sides for u in side[v]]
+                desired.append(sum(ps) / len(ps) if ps else x[v])
+            for v, px in zip(layer, _place(desired, [size[v][0] for v in layer])):
+                x[v] = px
+
+    # y grows upwards, rank 0 on top
+    rank_h = [max((size[v][1] for v in layer), default=0.0) for layer in order]
+    height = 2 * PAD + sum(rank_h) + RANK_SEP * (n_ranks - 1)
+    y: Dict[str, float] = {}
+    top = height - PAD
+    for r, layer in enumerate(order):
+        for v in layer:
+            y[v] = top - rank_h[r] / 2
+        top -= rank_h[r] + RANK_SEP
+    left = min(x[v] - size[v][0] / 2 for v in x)
+    for v in x:
+        x[v] += PAD - left
+    width = max(x[v] + size[v][0] / 2 for v in x) + PAD
+
+    nodes: Dict[str, Dict[str, float]] = {}
+    for v in names:
+        w, h, _ = size[v]
+        nodes[v] = {"x": x[v], "y": y[v], "w": w, "h": h}
+
+    out_edges: List[Dict[str, Any]] = []
+    multiplicity = Counter((t, h) for t, h, _ in edges)
+    for t, h, style, bends in chains:
+        pts = [(x[d], y[d]) for d in bends]
+        if not pts and multiplicity[(t, h)] > 1:
+            # both branches to the same child (unreduced BDD): bend them apart
+            pts = [((x[t] + x[h]) / 2 + (-1 if style == "dashed" else 1) * NODE_SEP / 2, (y[t] + y[h]) / 2)]
+        first = pts[0] if pts else (x[h], y[h])
+        last = pts[-1] if pts else (x[t], y[t])
+        start = _clip(x[t], y[t], size[t][0], size[t][1], size[t][2], *first)
+        end = _clip(x[h], y[h], size[h][0], size[h][1], size[h][2], *last)
+        out_edges.append({"tail": t, "head": h, "points": [start] + pts + [end], "style": style})
+
+    return {
+        "bbox": {"width": width, "height": height},
+        "nodes": nodes,
+        "edges": out_edges,
+        "nodes_json": {json_id[v]: g for v, g in nodes.items()},
+        "edges_json": [dict(e, id=f"{json_id[e['tail']]}_{'high' if e['style'] == 'solid' else 'low'}",
+                            tail=json_id[e["tail"]], head=json_id[e["head"]]) for e in out_edges],
+        "dpi": DPI,
+        "crossings": best_crossings,
+    }
@@ -1,43 +1,87 @@
+import os
 import dot2tex
+from graphviz import Digraph
 from app.core.bdd import BDD, BDDNode
+from app.export.layout_export import bdd2layout, highlight_overlay, json_id
 
-def bdd2tex(r, file_name='tex', highlight=None):
+# 'dot' renders with Graphviz and converts with dot2tex, 'native' writes TikZ from the bdd2layout coordinates
+LATEX_ENGINE = os.getenv("BDD_LATEX_ENGINE", "dot")
+LATEX_ENGINES = ('dot', 'native')
 
-    if isinstance(r, BDDNode):
-        dot = BDD.to_graphviz(r, to_latex=True, highlight=highlight)
+def bdd2tex(r, file_name=None, highlight=None, engine=None, layout=None):
+    """
+    TikZ code of a diagram, built in memory (safe with concurrent exports).
+    file_name: also write the code to this file. Default: None, nothing is written.
+    engine: 'dot' (default, BDD_LATEX_ENGINE) Graphviz + dot2tex, 'native' TikZ written directly from
+    the native layout (layout, when given, is a bdd2layout result of r to reuse). A Digraph is always rendered by dot.
+    """
+    engine = engine or LATEX_ENGINE
+    if engine not in LATEX_ENGINES:
+        raise ValueError(f"Unknown latex engine '{engine}', expected one of {LATEX_ENGINES}")
+
+    if engine == 'native' and not isinstance(r, Digraph):
+        tikz_content = layout2tex(r, layout or bdd2layout(r, engine='native'), highlight_overlay(r, highlight))
     else:
-        dot = r
-    xdot_file = f'xdot.xdot'
-    try:
-        dot.render('xdot', format='xdot', cleanup=True, view=False)
-        #xdot_content = dot.pipe(format='xdot').decode('utf-8')
-    except Exception as e:
-        print(f"Graphviz render failed: {e}")
-        raise
-    
-    try:
-        with open(xdot_file, 'r') as f:
-            xdot_content = f.read()
-        
-        tikz_content = dot2tex.dot2tex(
-            xdot_content,
-            format='tikz',          
-            texmode='math',        
-            duplicate=True,        
-            crop=False,             
-            #straightedges=False,    
-            #codeonly = True,
-            nodeoptions='draw, minimum width=1.1cm, minimum height=1cm',
-            edgeoptions='line width=1pt',
-            figonly=True, 
-            graphstyle='scale=1,>=stealth,thick'
-        )
-        
+        if not isinstance(r, Digraph):
+            dot = BDD.to_graphviz(r, to_latex=True, highlight=highlight, render=False)
+        else:
+            dot = r
+        try:
+            xdot_content = dot.pipe(format='xdot').decode('utf-8')
+        except Exception as e:
+            print(f"Graphviz render failed: {e}")
+            raise
+
+        try:
+            tikz_content = dot2tex.dot2tex(
+                xdot_content,
+                format='tikz',
+                texmode='math',
+                duplicate=True,
+                crop=False,
+                #straightedges=False,
+                #codeonly = True,
+                nodeoptions='draw, minimum width=1.1cm, minimum height=1cm',
+                edgeoptions='line width=1pt',
+                figonly=True,
+                graphstyle='scale=1,>=stealth,thick'
+            )
+        except Exception as e:
+            print(f"Error with dot2tex: {e}")
+            raise
+
+    if file_name:
         with open(file_name, 'w') as f:
             f.write(tikz_content)
-        
-        return tikz_content
-        
-    except Exception as e:
-        print(f"Error with dot2tex: {e}")
-        raise
+    return tikz_content
+
+
+def _bp(x):
+    return f"{x:.2f}bp"
+
+
+def layout2tex(root: BDDNode, layout, highlight=None):
+    """
+    TikZ picture of a diagram from its bdd2layout result (points, y upwards, as TikZ), in the style of
+    the dot2tex output: white circles for variables, boxes for terminals, dashed low / solid high edges.
+    highlight: highlight_overlay result, drawn in orange.
+    """
+    lit_nodes = set(highlight["nodes"]) if highlight else set()
+    lit_edges = set(highlight["edges"]) if highlight else set()
+    labels = {json_id(n): (n.var if n.var is not None else str(n.expr)) for n in BDD.walk(root, False)}
+
+    lines = ["\\begin{tikzpicture}[scale=1,>=stealth,thick]"]
+    for j, g in layout["nodes_json"].items():
+        shape = "rectangle" if j.startswith("terminal") else "circle"
+        fill = "orange" if j in lit_nodes else "white"
+        lines.append(
+            f"  \\node ({j}) at ({_bp(g['x'])},{_bp(g['y'])}) [draw,fill={fill},{shape},"
+            f"minimum width={_bp(g['w'])},minimum height={_bp(g['h'])},inner sep=0pt] {{${labels.get(j, '')}$}};"
+        )
+    for e in layout["edges_json"]:
+        style = "dashed" if e["style"] == "dashed" else "solid"
+        extra = ",draw=orange,line width=3pt" if e.get("id") in lit_edges else ",line width=1pt"
+        path = " -- ".join(f"({_bp(x)},{_bp(y)})" for x, y in e["points"])
+        lines.append(f"  \\draw [->,{style}{extra}] {path};")
+    lines.append("\\end{tikzpicture}")
+    return "\n".join(lines) + "\n"
@@ -5,7 +5,7 @@ import uvicorn
 import os
 from fastapi.middleware.cors import CORSMiddleware
 app = create_app()
-#IMPORTANT: variables name must not contain uppercase letter. Suppor ~ % | -> <->, not support XOR.
+#IMPORTANT: variables name must not contain uppercase letter. Suppor ~ & | ^ -> <->.
 #odering exmaple: '(a & b & c) | (~a & b & ~d) | (c & ~d) | (~b & d)' '((s1 & a) | (~s1 & b)) & ((s2 & c) | (~s2 & d))' (4-bit MUX) '(a & (b | c) & (~d | e)) | (~a & (c | ~e) & (d | f))' 
 #TODO: ...
 
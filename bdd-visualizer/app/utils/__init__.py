@@ -1,4 +1,8 @@
 from .logger import get_logger
-from .cache import BDD_Cache
+from .cache import BDD_Cache, LRUCache
+from .store import DiskStore
+from .singleflight import SingleFlight
+from .pool import get_process_pool, shutdown_process_pool, pool_map, run_in_pool, stream_in_pool, in_worker, QueueFull, JobCancelled, POOL_WORKERS, QUEUE_SIZE, REQUEST_TIMEOUT
 
-__all__ = ["get_logger","BDD_Cache"]
+__all__ = ["get_logger","BDD_Cache","LRUCache","DiskStore","SingleFlight","get_process_pool","shutdown_process_pool","pool_map","run_in_pool","stream_in_pool","in_worker",
+           "QueueFull","JobCancelled","POOL_WORKERS","QUEUE_SIZE","REQUEST_TIMEOUT"]
@@ -1,10 +1,145 @@
+import os
+import threading
+from collections import OrderedDict
+
 class BDD_Cache:
-    MAX_SIZE = 100
-    cache = {}
+    """
+    Thread-safe LRU cache of built diagrams keyed by the full build configuration:
+    (canonical formula, canonical variable order, auto_order, graph_type, engine, search). search holds the
+    (seeds, time_budget, node_budget) of an auto_order search, None without any: a search cut short by a
+    budget may settle on another order. Entries are not modified after insertion.
+    With RENAME the canonical formula also abstracts variable names, so 'x&y' is served from 'b&a'.
+    Eviction starts when there are more than MAX_SIZE entries or more than MAX_NODES nodes in total.
+    An entry holds one reference on its diagram and drops it when evicted or replaced: requests that still
+    read it acquire() their own (see get_built), so its nodes are only reclaimed after the last of them.
+    """
+    MAX_SIZE = int(os.getenv("BDD_CACHE_MAX_SIZE", 100))
+    MAX_NODES = int(os.getenv("BDD_CACHE_MAX_NODES", 1000000))
+    RENAME = os.getenv("BDD_CACHE_RENAME", "1") != "0"
+    cache = OrderedDict()   # key -> value
+    weights = {}            # key -> node count
+    total_nodes = 0
+    hits = 0
+    misses = 0
+    evictions = 0
+    lock = threading.RLock()
+
+    @staticmethod
+    def make_key(formula, var_order, auto_order=None, graph_type="robdd", engine="apply", search=None):
+        # the search parameters only matter to an auto_order build
+        search = tuple(search) if auto_order and search and any(x is not None for x in search) else None
+        return (formula, tuple(var_order), auto_order or None, graph_type, engine, search)
+
+    @classmethod
+    def get(cls, key):
+        with cls.lock:
+            value = cls.cache.get(key)
+            if value is None:
+                cls.misses += 1
+                return None
+            cls.cache.move_to_end(key)
+            cls.hits += 1
+            return value
+
+    @classmethod
+    def find(cls, formula, graph_type, var_order=None, auto_order=None):
+        """
+        Lookup for the export endpoints: the exact configuration when var_order is given,
+        otherwise the most recently used entry of this formula and graph type.
+        """
+        with cls.lock:
+            for key in reversed(cls.cache):
+                f, order, auto, gtype = key[:4]
+                if f != formula or gtype != graph_type:
+                    continue
+                if var_order is not None and tuple(var_order) != order:
+                    continue
+                if auto_order is not None and auto != auto_order:
+                    continue
+                return cls.get(key)
+            cls.misses += 1
+            return None
+
+    @classmethod
+    def add_to_cache(cls, key, value, weight=1):
+        """Insert value and return the entry kept for key: an entry added meanwhile by another request wins."""
+        with cls.lock:
+            if key in cls.cache:
+                if hasattr(value, "release") and cls.cache[key] is not value:
+                    value.release()
+                cls.cache.move_to_end(key)
+                return cls.cache[key]
+            cls.cache[key] = value
+            cls.weights[key] = weight
+            cls.total_nodes += weight
+            while len(cls.cache) > 1 and (len(cls.cache) > cls.MAX_SIZE or cls.total_nodes > cls.MAX_NODES):
+                cls._pop(next(iter(cls.cache)))
+                cls.evictions += 1
+            return value
 
     @classmethod
-    def add_to_cache(cls, key, value):
-        if len(cls.cache) >= cls.MAX_SIZE:
-            oldest_key = next(iter(cls.cache))
-            cls.cache.pop(oldest_key)
-        cls.cache[key] = value
+    def _pop(cls, key):
+        evicted = cls.cache.pop(key)
+        cls.total_nodes -= cls.weights.pop(key)
+        # diagrams on a shared node manager free their nodes
+        if hasattr(evicted, "release"):
+            evicted.release()
+
+    @classmethod
+    def stats(cls):
+        with cls.lock:
+            return {
+                "entries": len(cls.cache),
+                "nodes": cls.total_nodes,
+                "max_entries": cls.MAX_SIZE,
+                "max_nodes": cls.MAX_NODES,
+                "hits": cls.hits,
+                "misses": cls.misses,
+                "evictions": cls.evictions,
+            }
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU of plain values (e.g. layouts), with the counters of BDD_Cache.stats.
+    ----------
+    Parameters
+    ----------
+    max_size: int
+            Entries kept, the least recently used is dropped beyond
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.cache),
+                "max_entries": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,258 @@
+import os
+import time
+import queue
+import signal
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+POOL_WORKERS = int(os.getenv("BDD_POOL_WORKERS", os.cpu_count() or 1))
+# jobs queued or running on the pool at once, further requests are refused
+QUEUE_SIZE = int(os.getenv("BDD_QUEUE_SIZE", 4 * max(POOL_WORKERS, 1)))
+# default and largest per-request deadline, seconds
+REQUEST_TIMEOUT = float(os.getenv("BDD_REQUEST_TIMEOUT", 60))
+CHECK_INTERVAL = 0.05   # seconds between cancellation checks, in the workers and in the app
+
+STREAM_QUEUE_SIZE = 1024  # items a streaming job may send ahead of the reader, it waits beyond (see stream_in_pool)
+
+_pool = None
+_streams = None         # multiprocessing manager serving the item queues of streaming jobs
+_cancel_flags = None    # shared byte per job slot, set to 1 to cancel the job in that slot
+_free_slots = []
+_slots_lock = threading.Lock()
+_in_worker = False
+
+
+class QueueFull(Exception):
+    """Every job slot of the pool is taken."""
+
+
+class JobCancelled(Exception):
+    """Raised in a worker when its job was cancelled (client gone or deadline passed)."""
+
+
+def _init_worker(flags):
+    global _cancel_flags, _in_worker
+    _cancel_flags = flags
+    _in_worker = True
+    # the app handles Ctrl-C, workers are shut down with the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def in_worker():
+    """True in a pool worker process, where nested pools must not be started."""
+    return _in_worker
+
+
+def get_process_pool():
+    """Process pool shared by the app, created on first use. Size is set by BDD_POOL_WORKERS."""
+    global _pool, _cancel_flags, _free_slots
+    if _pool is None:
+        ctx = multiprocessing.get_context("spawn")
+        if _cancel_flags is None:
+            # kept when a broken pool is replaced, jobs of the old pool still give their slots back
+            _cancel_flags = ctx.Array('b', QUEUE_SIZE, lock=False)
+            _free_slots = list(range(QUEUE_SIZE))
+        _pool = ProcessPoolExecutor(max_workers=max(POOL_WORKERS, 1), mp_context=ctx,
+                                    initializer=_init_worker, initargs=(_cancel_flags,))
+    return _pool
+
+
+def shutdown_process_pool():
+    global _pool, _streams
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+    if _streams is not None:
+        _streams.shutdown()
+        _streams = None
+
+
+def _run_job(slot, deadline, fn, args):
+    # runs in the worker: a timer checks the cancel flag and the deadline while fn runs.
+    # It is disarmed before it raises, so it raises at most once and the cleanup of fn
+    # (finally blocks, releasing a large diagram) is never interrupted in turn.
+    def check(signum, frame):
+        if _cancel_flags[slot]:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            raise JobCancelled("Job cancelled")
+        if time.time() > deadline:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            raise TimeoutError("Deadline exceeded")
+
+    previous = signal.signal(signal.SIGALRM, check)
+    signal.setitimer(signal.ITIMER_REAL, CHECK_INTERVAL, CHECK_INTERVAL)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+        # whatever fn got to clean up, the next job of this worker starts from empty shared managers
+        from app.core.manager import BDDManager
+        BDDManager.reset_shared()
+
+
+def _acquire_slots(n):
+    with _slots_lock:
+        if len(_free_slots) < n:
+            raise QueueFull(f"Server busy: {QUEUE_SIZE - len(_free_slots)} jobs queued, try again later")
+        slots = [_free_slots.pop() for _ in range(n)]
+    for s in slots:
+        _cancel_flags[s] = 0
+    return slots
+
+
+def _release_slot(slot):
+    with _slots_lock:
+        _free_slots.append(slot)
+
+
+async def pool_map(fn, jobs, timeout=None, is_disconnected=None):
+    """
+    Run fn(*args) for each args of jobs on the process pool, return the results in order.
+    Every job takes a queue slot (QueueFull when there are not enough), a slot is free again
+    once its job is over. The jobs are cancelled, in the workers too, when timeout seconds
+    (at most REQUEST_TIMEOUT) pass (TimeoutError) or when is_disconnected() becomes true (JobCancelled).
+    With BDD_POOL_WORKERS=0 the jobs run on threads, without cancellation.
+    """
+    timeout = min(timeout or REQUEST_TIMEOUT, REQUEST_TIMEOUT)
+    if POOL_WORKERS < 1:
+        return await asyncio.wait_for(
+            asyncio.gather(*(asyncio.to_thread(fn, *args) for args in jobs)), timeout)
+
+    pool = get_process_pool()
+    slots = _acquire_slots(len(jobs))
+    deadline = time.time() + timeout
+    futures = []
+    try:
+        for slot, args in zip(slots, jobs):
+            f = pool.submit(_run_job, slot, deadline, fn, args)
+            f.add_done_callback(lambda _, slot=slot: _release_slot(slot))
+            futures.append(f)
+    except BaseException as e:
+        for slot in slots[len(futures):]:
+            _release_slot(slot)
+        for f in futures:
+            f.cancel()
+        if isinstance(e, BrokenProcessPool):
+            # a worker died (e.g. out of memory), the next request gets a new pool
+            shutdown_process_pool()
+        raise
+
+    waiting = [asyncio.wrap_future(f) for f in futures]
+    try:
+        while True:
+            done, pending = await asyncio.wait(waiting, timeout=CHECK_INTERVAL, return_when=asyncio.FIRST_EXCEPTION)
+            for w in done:
+                if w.exception() is not None:
+                    raise w.exception()
+            if not pending:
+                return [w.result() for w in waiting]
+            if time.time() > deadline:
+                raise TimeoutError("Deadline exceeded")
+            if is_disconnected is not None and await is_disconnected():
+                raise JobCancelled("Client disconnected")
+    except BaseException as e:
+        # also covers the request task being cancelled
+        if isinstance(e, BrokenProcessPool):
+            shutdown_process_pool()
+        for slot, f in zip(slots, futures):
+            # a slot is only reused after its job is done, so the flag cannot hit another job
+            if not f.done():
+                _cancel_flags[slot] = 1
+                f.cancel()
+        for w in waiting:
+            # the outcome of abandoned jobs is not needed, do not log it as never retrieved
+            w.add_done_callback(lambda w: w.cancelled() or w.exception())
+        raise
+
+
+async def run_in_pool(fn, *args, timeout=None, is_disconnected=None):
+    """Single job version of pool_map."""
+    return (await pool_map(fn, [args], timeout, is_disconnected))[0]
+
+
+class _ThreadItems(queue.Queue):
+    # items of a job on a thread: a thread is not cancelled by pool_map, so a put waiting for room
+    # checks the queue every CHECK_INTERVAL and the job stops there once the reader closed it
+    closed = False
+
+    def put(self, item, block=True, timeout=None):
+        while True:
+            if self.closed:
+                raise JobCancelled("Stream closed")
+            try:
+                return super().put(item, True, CHECK_INTERVAL)
+            except queue.Full:
+                pass
+
+
+def _item_queue():
+    # a queue the job can send items on: in the app for threads, served by a manager process for the pool
+    global _streams
+    if POOL_WORKERS < 1:
+        return _ThreadItems(STREAM_QUEUE_SIZE)
+    with _slots_lock:
+        if _streams is None:
+            _streams = multiprocessing.get_context("spawn").Manager()
+        return _streams.Queue(STREAM_QUEUE_SIZE)
+
+
+_END = "__end__"
+STREAM_BATCH = 256      # items the reader takes at once
+
+
+def _take(items):
+    # next items of a queue: waits up to CHECK_INTERVAL for the first one, then takes what is there
+    batch = [items.get(True, CHECK_INTERVAL)]
+    while len(batch) < STREAM_BATCH:
+        try:
+            batch.append(items.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _send_items(items, fn, args):
+    # runs in the worker: fn(*args, emit), the reader learns the job is over from _END
+    try:
+        return fn(*args, items.put)
+    finally:
+        items.put(_END)
+
+
+async def stream_in_pool(fn, *args, timeout=None, is_disconnected=None):
+    """
+    Run fn(*args, emit) as run_in_pool does (queue slot, timeout, cancellation) and yield each item
+    the job passes to emit as soon as it is sent; its return value is dropped. An error of the job is
+    raised once it is known, items still queued are dropped. Closing the generator (e.g. the client is
+    gone) cancels the job. A job more than STREAM_QUEUE_SIZE items ahead of the reader waits for it.
+    """
+    items = await asyncio.to_thread(_item_queue)
+    job = asyncio.ensure_future(run_in_pool(_send_items, items, fn, args, timeout=timeout,
+                                            is_disconnected=is_disconnected))
+    try:
+        ended = False
+        while not ended:
+            try:
+                batch = await asyncio.to_thread(_take, items)
+            except queue.Empty:
+                # the job may have failed before it could send _END (worker lost, deadline in the app)
+                ended = job.done()
+                continue
+            if job.done() and not job.cancelled() and job.exception() is not None:
+                break       # timed out or cancelled, the items still queued are dropped
+            for item in batch:
+                if isinstance(item, str) and item == _END:
+                    ended = True
+                    break
+                yield item
+        await job
+    finally:
+        if isinstance(items, _ThreadItems):
+            items.closed = True
+        if not job.done():
+            job.cancel()
+            await asyncio.gather(job, return_exceptions=True)
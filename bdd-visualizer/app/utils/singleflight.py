@@ -0,0 +1,55 @@
+import asyncio
+
+
+class _Call:
+    def __init__(self):
+        self.task = None
+        self.waiters = []       # is_disconnected callables (or None) of the requests awaiting the call
+
+    async def all_disconnected(self):
+        # the shared work is only worth cancelling when nobody is left to receive it
+        if not self.waiters:
+            return True
+        for is_disconnected in list(self.waiters):
+            if is_disconnected is None or not await is_disconnected():
+                return False
+        return True
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical work: the first do() for a key starts fn, later calls with the
+    same key await the same task until it is done. The task is not cancelled when one of the
+    requests goes away, fn receives an is_disconnected callable that is only true once every
+    waiting request has disconnected. Must be used from one event loop.
+    """
+    def __init__(self, name=""):
+        self.name = name
+        self.calls = {}     # key -> _Call
+        self.coalesced = 0
+
+    async def do(self, key, fn, is_disconnected=None):
+        """Return the result of fn(is_disconnected) for key, shared with concurrent calls."""
+        call = self.calls.get(key)
+        if call is None:
+            call = _Call()
+            self.calls[key] = call
+            call.task = asyncio.ensure_future(fn(call.all_disconnected))
+            call.task.add_done_callback(lambda _: self._done(key, call))
+        else:
+            self.coalesced += 1
+        call.waiters.append(is_disconnected)
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters.remove(is_disconnected)
+
+    def _done(self, key, call):
+        if self.calls.get(key) is call:
+            del self.calls[key]
+        if not call.task.cancelled():
+            # retrieved by the waiters, if any are left
+            call.task.exception()
+
+    def stats(self):
+        return {"in_flight": len(self.calls), "coalesced": self.coalesced}
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from .logger import get_logger
+
+logger = get_logger("store")
+# directory of the files the app keeps, the backend folder by default (next to app/)
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.getenv("BDD_DATA_DIR", os.path.join(_BACKEND_DIR, "data"))
+_STORE_FILE = os.getenv("BDD_STORE_PATH", "bdd_store.sqlite3")
+
+
+class DiskStore:
+    """
+    Content-addressed SQLite store of serialised diagrams, to_json payloads and layouts.
+    Shared by all uvicorn workers of a host (WAL mode, readers do not block) and kept across restarts.
+    Values are JSON, zlib compressed. Oldest entries are pruned above MAX_MB.
+    Failures are logged and treated as misses, the store is only an accelerator.
+    BDD_STORE_PATH is the file, relative to BDD_DATA_DIR; set it to an empty string to disable the store.
+    Keys include FORMAT_VERSION: bump it when a stored payload changes shape, entries of older code are
+    then never read again and are the first pruned.
+    """
+    FORMAT_VERSION = 1
+    PATH = os.path.join(DATA_DIR, _STORE_FILE) if _STORE_FILE else ""
+    MAX_MB = float(os.getenv("BDD_STORE_MAX_MB", 512))
+    PRUNE_EVERY = 200       # puts between two size checks
+    _local = threading.local()
+    _puts = 0
+
+    @classmethod
+    def key(cls, *parts):
+        """Content address of parts (any JSON-serialisable values) under the current FORMAT_VERSION."""
+        raw = json.dumps((cls.FORMAT_VERSION,) + parts, sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def enabled(cls):
+        return bool(cls.PATH)
+
+    @classmethod
+    def _conn(cls):
+        # one connection per thread and path, sqlite3 connections are not shared across threads
+        conn = getattr(cls._local, "conn", None)
+        if conn is None or cls._local.path != cls.PATH:
+            os.makedirs(os.path.dirname(cls.PATH) or ".", exist_ok=True)
+            conn = sqlite3.connect(cls.PATH, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, kind TEXT NOT NULL, data BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            cls._local.conn, cls._local.path = conn, cls.PATH
+        return conn
+
+    @classmethod
+    def get(cls, kind, key):
+        if not cls.enabled():
+            return None
+        try:
+            row = cls._conn().execute("SELECT data FROM entries WHERE key = ? AND kind = ?", (key, kind)).fetchone()
+            if row is None:
+                return None
+            return json.loads(zlib.decompress(row[0]))
+        except (sqlite3.Error, OSError, zlib.error, ValueError) as e:
+            logger.warning(f"Store read failed ({kind}): {e}")
+            return None
+
+    @classmethod
+    def put(cls, kind, key, value):
+        if not cls.enabled():
+            return
+        try:
+            data = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+            cls._conn().execute(
+                "INSERT OR REPLACE INTO entries (key, kind, data, created) VALUES (?, ?, ?, ?)",
+                (key, kind, data, time.time()),
+            )
+            cls._puts += 1
+            if cls._puts % cls.PRUNE_EVERY == 0:
+                cls.prune()
+        except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+            logger.warning(f"Store write failed ({kind}): {e}")
+
+    @classmethod
+    def prune(cls):
+        """Delete the oldest entries until the stored data fits in MAX_MB."""
+        conn = cls._conn()
+        limit = cls.MAX_MB * 1024 * 1024
+        total = conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM entries").fetchone()[0]
+        while total > limit:
+            rows = conn.execute("SELECT key, LENGTH(data) FROM entries ORDER BY created LIMIT 100").fetchall()
+            if not rows:
+                break
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in rows])
+            total -= sum(n for _, n in rows)
+
+    @classmethod
+    def stats(cls):
+        if not cls.enabled():
+            return {"enabled": False}
+        try:
+            rows = cls._conn().execute("SELECT kind, COUNT(*), SUM(LENGTH(data)) FROM entries GROUP BY kind").fetchall()
+        except (sqlite3.Error, OSError) as e:
+            return {"enabled": True, "error": str(e)}
+        return {"enabled": True, "path": cls.PATH, "entries": {k: {"count": n, "bytes": b} for k, n, b in rows}}
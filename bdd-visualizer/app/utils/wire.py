@@ -0,0 +1,90 @@
+import os
+import gzip
+import json
+import hashlib
+from fastapi import Response
+
+# encoders of requirements.txt, a bare install falls back on the stdlib json and gzip (and has no 'msgpack')
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 'json' keeps the to_json graph, 'columns' is BDD.to_columns as JSON, 'msgpack' the same as MessagePack
+GRAPH_FORMATS = ('json', 'columns', 'msgpack')
+COMPRESS_MIN_BYTES = int(os.getenv("BDD_COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def check_format(graph_format):
+    if graph_format not in GRAPH_FORMATS:
+        raise ValueError(f"Unknown format '{graph_format}', expected one of {GRAPH_FORMATS}")
+    if graph_format == 'msgpack' and msgpack is None:
+        raise ValueError("Format 'msgpack' needs the msgpack package")
+
+
+def make_etag(key, graph_format):
+    """
+    Weak validator of a response identified by a content key (e.g. a DiskStore key) in a graph format.
+    The ETag is checked before anything is built or encoded, so the key must cover every other input
+    that changes the body: formula, order, labels, eval_path, max_depth and paging.
+    """
+    digest = hashlib.sha256(f"{key}/{graph_format}".encode("utf-8")).hexdigest()
+    return f'W/"{digest[:40]}"'
+
+
+def etag_matches(request, etag):
+    """True when the If-None-Match header of request lists etag (or is *)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip() for t in header.split(",")}
+    # weak comparison: W/ prefixes are ignored
+    strip = lambda t: t[2:] if t.startswith("W/") else t
+    return "*" in tags or strip(etag) in {strip(t) for t in tags}
+
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+
+def encode(payload, graph_format='json'):
+    """(body bytes, media type) of a response payload."""
+    if graph_format == 'msgpack':
+        return msgpack.packb(payload, use_bin_type=True), "application/msgpack"
+    if orjson is not None:
+        return orjson.dumps(payload), "application/json"
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8"), "application/json"
+
+
+def compress(body, accept_encoding):
+    """(body, content-encoding or None): brotli when accepted and available, else gzip, small bodies as they are."""
+    if len(body) < COMPRESS_MIN_BYTES or not accept_encoding:
+        return body, None
+    accepted = {e.split(";")[0].strip() for e in accept_encoding.lower().split(",")}
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def wire_response(request, payload, graph_format='json', etag=None):
+    """Encoded, compressed (per Accept-Encoding) response of payload, with its ETag."""
+    body, media_type = encode(payload, graph_format)
+    body, encoding = compress(body, request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if etag:
+        headers["ETag"] = etag
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,84 @@
+import os
+import sys
+import random
+import itertools
+
+# jobs on threads of the app and no disk store: each test sees only what it builds
+os.environ.setdefault("BDD_POOL_WORKERS", "0")
+os.environ["BDD_STORE_PATH"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+OPERATORS = ("&", "|", "^", "->", "<->")
+
+
+def random_formula(rng, variables, depth=3):
+    """Random fully parenthesised formula over variables."""
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(variables)
+    if rng.random() < 0.15:
+        return f"~({random_formula(rng, variables, depth - 1)})"
+    op = rng.choice(OPERATORS)
+    return f"({random_formula(rng, variables, depth - 1)}{op}{random_formula(rng, variables, depth - 1)})"
+
+
+def value(ast, values):
+    """Value (bool) of an AST under values {var: 0/1}, straight from the grammar of app.core.parser."""
+    if isinstance(ast, str):
+        return bool(values[ast])
+    if len(ast) == 2 and ast[0] == "~":
+        return not value(ast[1], values)
+    operands = [value(x, values) for x in ast[::2]]
+    op = ast[1]
+    if op == "->":
+        # right associative
+        res = operands[-1]
+        for x in reversed(operands[:-1]):
+            res = (not x) or res
+        return res
+    res = operands[0]
+    for x in operands[1:]:
+        res = {"&": res and x, "|": res or x, "^": res != x, "<->": res == x}[op]
+    return res
+
+
+def truth_table(fn, variables):
+    """[fn({var: 0/1})] over every assignment of variables, the first variable most significant."""
+    return [bool(fn(dict(zip(variables, bits)))) for bits in itertools.product((0, 1), repeat=len(variables))]
+
+
+def node_value(mgr, u, values):
+    """Value of node u of a BDDManager under values {var: 0/1}."""
+    while not mgr.is_terminal(u):
+        u = mgr.high[u] if values[mgr.var_order[mgr.level[u]]] else mgr.low[u]
+    return u == 1
+
+
+
+def collected(ast, order):
+    """(BDDManager in order, root) of ast with every other node collected, ready to reorder."""
+    from app.core.manager import BDDManager
+    mgr = BDDManager(order)
+    f = mgr.build(ast)
+    mgr.collect([f])
+    return mgr, f
+
+
+def size_in(ast, order):
+    """Node count of the diagram of ast built fresh in order."""
+    from app.core.manager import BDDManager
+    mgr = BDDManager(order)
+    return mgr.size(mgr.build(ast))
+
+@pytest.fixture
+def rng():
+    return random.Random(1234)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
@@ -0,0 +1,134 @@
+import json
+import itertools
+
+import pytest
+
+from app.core.parser import parse_formula
+from conftest import random_formula, value
+
+VARIABLES = ["a", "b", "c", "d"]
+
+
+def models(formula, variables):
+    ast = parse_formula(formula)
+    return {"".join(map(str, bits)) for bits in itertools.product((0, 1), repeat=len(variables))
+            if value(ast, dict(zip(variables, bits)))}
+
+
+def formulas(rng, n=15):
+    # every variable occurs, so the columns are the formula variables
+    return [f"({random_formula(rng, VARIABLES, 3)})&(a|~a)&(b|~b)&(c|~c)&(d|~d)" for _ in range(n)]
+
+
+def test_satcount(client, rng):
+    for formula in formulas(rng):
+        r = client.post("/api/bdd/satcount", json={"formula": formula, "variables": VARIABLES + ["z"]})
+        assert r.status_code == 200, r.text
+        count = 2 * len(models(formula, VARIABLES))
+        assert int(r.json()["count"]) == count, formula
+        assert r.json()["fraction"] == count / 32
+
+
+def test_probability(client, rng):
+    weights = {"a": 0.1, "b": 0.7, "c": 1, "d": 0.25}
+    for formula in formulas(rng):
+        r = client.post("/api/bdd/probability", json={"formula": formula, "variables": VARIABLES, "weights": weights})
+        assert r.status_code == 200, r.text
+        expected = 0.0
+        for m in models(formula, VARIABLES):
+            p = 1.0
+            for v, bit in zip(VARIABLES, m):
+                p *= weights[v] if bit == "1" else 1 - weights[v]
+            expected += p
+        assert r.json()["probability"] == pytest.approx(expected), formula
+
+
+@pytest.mark.parametrize("weights", [[0.5, 0.5], "a:0.5", 3])
+def test_probability_weights_400(client, weights):
+    r = client.post("/api/bdd/probability", json={"formula": "a&b", "weights": weights})
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"
+
+
+def test_sample(client, rng):
+    for formula in formulas(rng):
+        body = {"formula": formula, "variables": VARIABLES, "k": 50, "seed": 7}
+        r = client.post("/api/bdd/sample", json=body)
+        expected = models(formula, VARIABLES)
+        if not expected:
+            assert r.status_code == 422
+            continue
+        samples = r.json()["samples"]
+        assert len(samples) == 50 and set(samples) <= expected, formula
+        # a seed gives the same draw
+        assert client.post("/api/bdd/sample", json=body).json()["samples"] == samples
+
+
+def test_sample_uniform(client):
+    # three models of a|b, each drawn about a third of the time
+    samples = client.post("/api/bdd/sample", json={"formula": "a|b", "k": 3000, "seed": 1}).json()["samples"]
+    for m in ("01", "10", "11"):
+        assert 800 < samples.count(m) < 1200
+
+
+def test_cubes(client, rng):
+    for formula in formulas(rng):
+        r = client.post("/api/bdd/cubes", json={"formula": formula, "variables": VARIABLES})
+        assert r.status_code == 200, r.text
+        covered = []
+        for line in r.text.splitlines():
+            cube = json.loads(line)["cube"]
+            covered += ["".join(bits) for bits in itertools.product(*("01" if c == "-" else c for c in cube))]
+        # disjoint cubes covering exactly the models
+        assert len(covered) == len(set(covered))
+        assert set(covered) == models(formula, VARIABLES), formula
+
+
+def test_cubes_limit(client):
+    r = client.post("/api/bdd/cubes", json={"formula": "a^b^c", "limit": 2})
+    assert len(r.text.splitlines()) == 2
+    assert r.headers["X-Variables"] == "a b c"
+
+
+
+@pytest.mark.parametrize("path, body", [
+    ("satcount", {"formula": "a&(b"}),
+    ("satcount", {"formula": "a&b", "variables": ["a"]}),
+    ("probability", {"formula": "a&b", "weights": {"a": 2}}),
+    ("sample", {"formula": "a&b", "k": 0}),
+    ("sample", {"formula": "a&b", "seed": [1]}),
+    ("cubes", {"formula": "a&b", "limit": -1}),
+])
+def test_analysis_400(client, path, body):
+    r = client.post(f"/api/bdd/{path}", json=body)
+    assert r.status_code == 400, r.text
+
+
+def test_satcount_over_extra_variables(client):
+    r = client.post("/api/bdd/satcount", json={"formula": "a&b", "variables": ["a", "b", "c"]})
+    assert r.json()["count"] == "2" and r.json()["fraction"] == 0.25
+
+@pytest.mark.parametrize("before, formula", [
+    ("c&(a|~a)", "c"),
+    ("c", "c&(a|~a)"),
+    ("c->~(a|~a)", "~c"),
+    ("c&(a|~a)&(d|~d)", "(c->~(((a<->a)|(d&d))))"),
+])
+def test_same_structure_more_variables(client, before, formula):
+    # the diagram of before has the same nodes over another number of variables
+    for path in ("satcount", "probability", "sample"):
+        assert client.post(f"/api/bdd/{path}", json={"formula": before}).status_code in (200, 422)
+    variables = client.post("/api/bdd/satcount", json={"formula": formula}).json()["variables"]
+    expected = models(formula, variables)
+
+    r = client.post("/api/bdd/satcount", json={"formula": formula}).json()
+    assert int(r["count"]) == len(expected)
+    assert r["fraction"] == len(expected) / 2 ** len(variables)
+    r = client.post("/api/bdd/probability", json={"formula": formula, "weights": {"c": 0.2}}).json()
+    assert r["probability"] == pytest.approx(sum(
+        (0.2 if m[variables.index("c")] == "1" else 0.8) / 2 ** (len(variables) - 1) for m in expected))
+    r = client.post("/api/bdd/sample", json={"formula": formula, "k": 50, "seed": 3})
+    if expected:
+        assert set(r.json()["samples"]) <= expected
+    else:
+        assert r.status_code == 422
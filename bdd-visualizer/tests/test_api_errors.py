@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.mark.parametrize("body", [
+    {},
+    {"formula": "a&&b"},
+    {"formula": "a&(b"},
+    {"formula": "a&b", "var_order": ["a"]},
+    {"formula": "a&b", "var_order": ["a", "b", "c"]},
+    {"formula": "a&b", "var_order": ["a", "a", "b"]},
+    {"formula": "a&b", "var_order": 3},
+])
+def test_generate_400(client, body):
+    r = client.post("/api/bdd/generate", json=body)
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"
+
+
+def test_valid_requests(client):
+    # the same endpoint answers 200 once the input is fixed
+    assert client.post("/api/bdd/generate", json={"formula": "a&b", "var_order": ["b", "a"]}).status_code == 200
@@ -0,0 +1,61 @@
+import json
+
+from conftest import random_formula
+
+VARIABLES = ["a", "b", "c", "d"]
+
+
+def batch(client, body):
+    r = client.post("/api/bdd/generate-batch", json=body)
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == list(range(len(lines)))
+    return {line["index"]: line for line in lines}
+
+
+def generated(client, formula, var_order=None):
+    r = client.post("/api/bdd/generate", json={"formula": formula, "var_order": var_order})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_batch_matches_generate(client, rng):
+    # shared subformulas, so the items are built together in one manager
+    formulas = [f"({random_formula(rng, VARIABLES, 3)})|(a&b)" for _ in range(12)]
+    lines = batch(client, {"formulas": formulas})
+    for i, formula in enumerate(formulas):
+        line = lines[i]
+        assert line["status"] == "success", line
+        single = generated(client, formula)
+        assert line["graph"] == single["graph"], formula
+        assert line["id"] == single["id"]
+        assert line["size"] == len(single["graph"]["nodes"])
+
+
+def test_batch_of_orders(client):
+    orders = ["a b c d", "d c b a", "b d a c"]
+    lines = batch(client, {"formula": "a&b|c&d", "var_orders": orders, "include_graph": False})
+    for i, order in enumerate(orders):
+        assert "graph" not in lines[i]
+        single = generated(client, "a&b|c&d", order)
+        assert lines[i]["size"] == len(single["graph"]["nodes"]) and lines[i]["id"] == single["id"]
+    # pairs side by side are smaller than interleaved
+    assert lines[0]["size"] < lines[2]["size"]
+
+
+def test_batch_auto_order(client):
+    lines = batch(client, {"formulas": ["a&d|b&e|c&f"], "auto_order": "exact"})
+    assert lines[0]["size"] == 8
+    assert lines[0]["order_info"]["size"] == 8
+
+
+def test_batch_400(client):
+    assert client.post("/api/bdd/generate-batch", json={"formulas": "a&b"}).status_code == 400
+    assert client.post("/api/bdd/generate-batch", json={"formulas": ["a"], "auto_order": "best"}).status_code == 400
+    # a bad item fails alone
+    r = client.post("/api/bdd/generate-batch", json={"formulas": ["a&b", 3, "a&(", "b|c"], "include_graph": False})
+    assert r.status_code == 200
+    lines = {line["index"]: line for line in map(json.loads, r.text.splitlines())}
+    assert [lines[i]["status"] for i in range(4)] == ["success", "error", "error", "success"]
+    assert lines[1]["code"] == lines[2]["code"] == 400
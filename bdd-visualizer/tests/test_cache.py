@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+import pytest
+
+from app.utils.cache import BDD_Cache
+
+
+class Entry:
+    """A cached value that records its release, as a diagram on a shared manager."""
+    def __init__(self, name):
+        self.name = name
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """BDD_Cache emptied, with room for 3 entries and 10 nodes, restored after the test."""
+    for name, fresh in (("cache", OrderedDict()), ("weights", {}), ("total_nodes", 0), ("hits", 0), ("misses", 0),
+                        ("evictions", 0), ("MAX_SIZE", 3), ("MAX_NODES", 10)):
+        monkeypatch.setattr(BDD_Cache, name, fresh)
+    return BDD_Cache
+
+
+def test_lru_order(cache):
+    entries = {k: Entry(k) for k in "abcd"}
+    for k in "abc":
+        cache.add_to_cache(k, entries[k])
+    # a becomes the most recently used, b is evicted by d
+    assert cache.get("a") is entries["a"]
+    cache.add_to_cache("d", entries["d"])
+    assert list(cache.cache) == ["c", "a", "d"]
+    assert entries["b"].released and not any(entries[k].released for k in "acd")
+    assert cache.get("b") is None
+
+
+def test_eviction_by_nodes(cache):
+    entries = {k: Entry(k) for k in "abc"}
+    cache.add_to_cache("a", entries["a"], 4)
+    cache.add_to_cache("b", entries["b"], 4)
+    assert cache.total_nodes == 8
+    cache.add_to_cache("c", entries["c"], 5)
+    assert list(cache.cache) == ["b", "c"] and cache.total_nodes == 9
+    assert entries["a"].released
+    # an entry heavier than the limit is kept alone
+    big = Entry("big")
+    cache.add_to_cache("big", big, 50)
+    assert list(cache.cache) == ["big"] and cache.total_nodes == 50
+    assert cache.evictions == 3
+
+
+def test_existing_entry_wins(cache):
+    first, second = Entry(1), Entry(2)
+    assert cache.add_to_cache("a", first, 2) is first
+    assert cache.add_to_cache("a", second, 2) is first
+    assert second.released and not first.released
+    assert cache.total_nodes == 2
+
+
+def test_stats_counters(cache, client):
+    for k in "abcd":
+        cache.add_to_cache(k, Entry(k), 2)
+    cache.get("a")
+    cache.get("d")
+    cache.get("c")
+    stats = client.get("/stats").json()["cache"]
+    assert stats == {"entries": 3, "nodes": 6, "max_entries": 3, "max_nodes": 10,
+                     "hits": 2, "misses": 1, "evictions": 1}
@@ -0,0 +1,45 @@
+import pytest
+
+from app.core.parser import parse_formula, canonical_form, normalize
+from conftest import random_formula, value, truth_table
+
+VARIABLES = ["a", "b", "c", "d"]
+
+
+def test_normalize_keeps_function(rng):
+    for _ in range(200):
+        ast = parse_formula(random_formula(rng, VARIABLES, 4))
+        form = normalize(ast)
+        assert truth_table(lambda v: value(form, v), VARIABLES) == truth_table(lambda v: value(ast, v), VARIABLES)
+
+
+@pytest.mark.parametrize("left, right", [
+    ("a&b", "b&a"),
+    ("(a|b)|c", "c|(b|a)"),
+    ("a^b^c", "c^(a^b)"),
+    ("~~a&b", "b&a"),
+    ("x&y", "b&a"),
+    ("(p->q)&r", "r&(p->q)"),
+    ("a->b", "b->a"),
+])
+def test_canonical_form_equal(left, right):
+    assert canonical_form(parse_formula(left))[0] == canonical_form(parse_formula(right))[0]
+
+
+@pytest.mark.parametrize("left, right", [
+    ("a->b", "a<->b"),
+    ("a&b", "a|b"),
+    ("a&b&c", "a&b"),
+])
+def test_canonical_form_different(left, right):
+    assert canonical_form(parse_formula(left))[0] != canonical_form(parse_formula(right))[0]
+
+
+def test_canonical_mapping(rng):
+    for _ in range(100):
+        formula = random_formula(rng, VARIABLES, 3)
+        ast = parse_formula(formula)
+        _, form, mapping = canonical_form(ast)
+        # the canonical formula is the input renamed
+        assert truth_table(lambda v: value(form, {mapping[x]: v[x] for x in mapping}), VARIABLES) == \
+            truth_table(lambda v: value(ast, v), VARIABLES)
@@ -0,0 +1,76 @@
+import pytest
+
+from app.core.checks import check
+from app.core.parser import parse_formula
+from conftest import random_formula, value, truth_table
+
+VARIABLES = ["a", "b", "c", "d"]
+
+
+def table(formula):
+    ast = parse_formula(formula)
+    return truth_table(lambda values: value(ast, values), VARIABLES)
+
+
+def assert_witness(res, formula, expected):
+    # the assignment gives the formula the reported value, and that value shows the check result
+    assert set(res["assignment"]) == set(VARIABLES)
+    assert value(parse_formula(formula), res["assignment"]) == bool(res["values"]["left"]) == expected
+
+
+def test_check_matches_truth_tables(rng):
+    for _ in range(100):
+        left, right = random_formula(rng, VARIABLES, 3), random_formula(rng, VARIABLES, 3)
+        f, g = table(left), table(right)
+        res = check("equivalent", VARIABLES, parse_formula(left), parse_formula(right))
+        assert res["holds"] == (f == g), (left, right)
+        if not res["holds"]:
+            values = res["assignment"]
+            assert value(parse_formula(left), values) != value(parse_formula(right), values)
+        res = check("implies", VARIABLES, parse_formula(left), parse_formula(right))
+        assert res["holds"] == all(not x or y for x, y in zip(f, g)), (left, right)
+        if not res["holds"]:
+            assert res["values"] == {"left": 1, "right": 0}
+        res = check("tautology", VARIABLES, parse_formula(left))
+        assert res["holds"] == all(f), left
+        if not res["holds"]:
+            assert_witness(res, left, False)
+        res = check("satisfiable", VARIABLES, parse_formula(left))
+        assert res["holds"] == any(f), left
+        if res["holds"]:
+            assert_witness(res, left, True)
+
+
+def test_check_endpoints(client):
+    r = client.post("/api/bdd/equivalent", json={"left": "a&b|c", "right": "c|b&a"})
+    assert r.json()["equivalent"] is True
+    r = client.post("/api/bdd/equivalent", json={"left": "a->b", "right": "~a|b"})
+    assert r.json()["equivalent"] is True and r.json()["counterexample"] is None
+    r = client.post("/api/bdd/equivalent", json={"left": "a&b", "right": "a|b", "var_order": ["b", "a"]})
+    assert r.json()["equivalent"] is False and r.json()["var_order"] == ["b", "a"]
+    assert r.json()["values"]["left"] != r.json()["values"]["right"]
+    r = client.post("/api/bdd/implies", json={"left": "a&b", "right": "a|c"})
+    assert r.json()["implies"] is True
+    r = client.post("/api/bdd/implies", json={"left": "a|c", "right": "a&b"})
+    assert r.json()["implies"] is False and r.json()["values"] == {"left": 1, "right": 0}
+    assert client.post("/api/bdd/tautology", json={"formula": "a|~a"}).json()["tautology"] is True
+    r = client.post("/api/bdd/satisfiable", json={"formula": "a&~b"})
+    assert r.json()["satisfiable"] is True and r.json()["model"] == {"a": 1, "b": 0}
+    assert client.post("/api/bdd/satisfiable", json={"formula": "a&~a"}).json()["satisfiable"] is False
+
+
+@pytest.mark.parametrize("path, body", [
+    ("equivalent", {"left": "a", "right": "b", "var_order": [1, 2]}),
+    ("equivalent", {"left": "a", "right": "b", "var_order": 1}),
+    ("equivalent", {"left": "a", "right": "b", "var_order": True}),
+    ("equivalent", {"left": 1, "right": "b"}),
+    ("implies", {"left": "a", "right": ["b"]}),
+    ("tautology", {"formula": 3}),
+    ("tautology", {"formula": "a|"}),
+    ("equivalent", {"left": "a"}),
+    ("equivalent", {"left": "a&(", "right": "a"}),
+])
+def test_check_400(client, path, body):
+    r = client.post(f"/api/bdd/{path}", json=body)
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"
@@ -0,0 +1,75 @@
+import json
+
+from conftest import random_formula
+
+VARIABLES = ["a", "b", "c", "d"]
+
+
+def sse_events(client, **params):
+    r = client.get("/api/bdd/construct", params=params)
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in r.text.strip().split("\n\n"):
+        name, data = block.split("\n")
+        event = json.loads(data[len("data: "):])
+        assert name == f"event: {event['event']}"
+        events.append(event)
+    return events
+
+
+def generated(client, formula, graph_type):
+    r = client.post("/api/bdd/generate", json={"formula": formula, "graph_type": graph_type})
+    return r.json()["graph"]
+
+
+def test_robdd_stream_ends_on_the_generated_diagram(client, rng):
+    for _ in range(15):
+        formula = random_formula(rng, VARIABLES, 3)
+        events = sse_events(client, formula=formula)
+        assert events[0]["event"] == "start" and events[-1]["event"] == "done"
+        graph = generated(client, formula, "robdd")
+        decision = {k: (n["low"], n["high"]) for k, n in graph["nodes"].items() if n["var"] is not None}
+        kept = {e["id"]: (e["low"], e["high"]) for e in events if e["event"] == "keep"}
+        assert kept == decision, formula
+        assert events[-1]["root"] == graph["root"]
+        assert events[-1]["size"] == len(graph["nodes"])
+        # every node event is reduced once: kept, merged or removed
+        nodes = [e["id"] for e in events if e["event"] == "node"]
+        reduced = [e["id"] for e in events if e["event"] in ("keep", "merge", "redundant")]
+        assert sorted(nodes) == sorted(reduced)
+        assert events[-1]["nodes"] == len(nodes)
+
+
+def test_bdd_stream_is_the_generated_tree(client, rng):
+    for _ in range(10):
+        formula = random_formula(rng, VARIABLES, 3)
+        events = sse_events(client, formula=formula, graph_type="bdd")
+        graph = generated(client, formula, "bdd")
+        nodes = {e["id"]: (e["parent"], e["branch"]) for e in events if e["event"] == "node"}
+        assert set(nodes) == {k for k, n in graph["nodes"].items() if n["var"] is not None}, formula
+        for k, (parent, branch) in nodes.items():
+            if parent is not None:
+                assert graph["nodes"][parent]["high" if branch else "low"] == k
+        assert not any(e["event"] in ("keep", "merge", "redundant") for e in events)
+
+
+def test_websocket_stream(client):
+    with client.websocket_connect("/api/bdd/construct/ws") as ws:
+        ws.send_json({"formula": "a&b|c", "var_order": ["c", "a", "b"], "labels": False})
+        events = [ws.receive_json()]
+        while events[-1]["event"] not in ("done", "error"):
+            events.append(ws.receive_json())
+    assert events[0] == {"event": "start", "type": "ROBDD", "variables": ["c", "a", "b"]}
+    assert events[-1]["event"] == "done"
+    assert all(e["expr"] is None for e in events if e["event"] == "node")
+    assert events == sse_events(client, formula="a&b|c", var_order="c a b", labels=False)
+
+
+def test_construct_400(client):
+    assert client.get("/api/bdd/construct", params={"formula": "a&(b"}).status_code == 400
+    assert client.get("/api/bdd/construct", params={"formula": "a&b", "graph_type": "robdd"}).status_code == 200
+    with client.websocket_connect("/api/bdd/construct/ws") as ws:
+        ws.send_json({"formula": "a&b", "var_order": ["a"]})
+        event = ws.receive_json()
+        assert event["event"] == "error" and event["code"] == 400
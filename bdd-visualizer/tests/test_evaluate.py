@@ -0,0 +1,80 @@
+import base64
+import itertools
+
+import numpy as np
+import pytest
+
+from app.core.parser import parse_formula
+from conftest import random_formula, value
+
+VARIABLES = ["a", "b", "c", "d"]
+
+
+def rows_of(n):
+    return ["".join(map(str, bits)) for bits in itertools.product((0, 1), repeat=n)]
+
+
+def expected(formula, columns, rows):
+    ast = parse_formula(formula)
+    return "".join(str(int(value(ast, {v: int(b) for v, b in zip(columns, row)}))) for row in rows)
+
+
+def evaluate(client, body):
+    r = client.post("/api/bdd/evaluate", json=body)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_assignments(client, rng):
+    rows = rows_of(4)
+    for _ in range(20):
+        formula = random_formula(rng, VARIABLES, 3) + "&(a|b|c|d|~a)"
+        out = evaluate(client, {"formula": formula, "variables": VARIABLES, "assignments": rows})
+        assert out["results"] == expected(formula, VARIABLES, rows), formula
+        assert out["ones"] == out["results"].count("1") and out["rows"] == 16
+
+
+def test_packed(client, rng):
+    rows = rows_of(4)
+    bits = np.array([[int(b) for b in row] for row in rows], dtype=np.uint8)
+    packed = base64.b64encode(np.packbits(bits, axis=1).tobytes()).decode("ascii")
+    for _ in range(20):
+        formula = random_formula(rng, VARIABLES, 3) + "&(a|b|c|d|~a)"
+        out = evaluate(client, {"formula": formula, "variables": VARIABLES, "packed": packed, "rows": 16})
+        got = np.unpackbits(np.frombuffer(base64.b64decode(out["packed"]), dtype=np.uint8), count=16)
+        assert "".join(map(str, got)) == expected(formula, VARIABLES, rows), formula
+        assert "results" not in out
+
+
+def test_column_order_and_unused_columns(client):
+    # columns in another order than the formula variables, with columns the formula does not read
+    columns = ["z", "c", "y", "a", "b"]
+    rows = rows_of(5)
+    out = evaluate(client, {"formula": "a&b|~c", "variables": columns, "assignments": rows})
+    assert out["results"] == expected("a&b|~c", ["z", "c", "y", "a", "b"], [r for r in rows])
+    out = evaluate(client, {"formula": "a&b|~c", "variables": "z c y a b", "assignments": rows})
+    assert out["variables"] == columns
+
+
+def test_variables_dropped_from_the_diagram(client):
+    # c and c&(a|~a)&(b|~b) have the same nodes over one and three variables
+    assert evaluate(client, {"formula": "c", "assignments": ["0", "1"]})["results"] == "01"
+    rows = ["000", "001", "111", "110"]
+    out = evaluate(client, {"formula": "c&(a|~a)&(b|~b)", "assignments": rows})
+    assert out["results"] == expected("c&(a|~a)&(b|~b)", ["c", "a", "b"], rows)
+    assert evaluate(client, {"formula": "c", "assignments": ["1", "0"]})["results"] == "10"
+
+
+@pytest.mark.parametrize("body", [
+    {"formula": "a&(b", "assignments": ["01"]},
+    {"formula": "a&b", "variables": ["a"], "assignments": ["0"]},
+    {"formula": "a&b", "variables": ["a", "a", "b"], "assignments": ["010"]},
+    {"formula": "a&b", "assignments": ["011"]},
+    {"formula": "a&b", "assignments": ["0x"]},
+    {"formula": "a&b", "packed": "not base64!", "rows": 1},
+    {"formula": "a&b", "packed": "AA==", "rows": 2},
+])
+def test_evaluate_400(client, body):
+    r = client.post("/api/bdd/evaluate", json=body)
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"
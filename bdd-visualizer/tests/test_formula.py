@@ -0,0 +1,20 @@
+from app.core.parser import parse_formula, to_formula, substitute
+from conftest import random_formula, value, truth_table
+
+VARIABLES = ["a", "b", "c", "d"]
+
+
+def test_to_formula_round_trip(rng):
+    for _ in range(200):
+        ast = parse_formula(random_formula(rng, VARIABLES, 4))
+        again = parse_formula(to_formula(ast))
+        assert truth_table(lambda v: value(again, v), VARIABLES) == truth_table(lambda v: value(ast, v), VARIABLES)
+
+
+def test_substitute(rng):
+    for _ in range(100):
+        ast = parse_formula(random_formula(rng, VARIABLES, 4))
+        res = substitute(ast, {"a": 1, "c": 0})
+        expected = truth_table(lambda v: value(ast, dict(v, a=1, c=0)), VARIABLES)
+        got = truth_table(lambda v: res if isinstance(res, bool) else value(res, v), VARIABLES)
+        assert got == expected
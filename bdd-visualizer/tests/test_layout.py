@@ -0,0 +1,95 @@
+import pytest
+
+from app.core.bdd import BDD
+from app.export.sugiyama import sugiyama_layout, _crossings, NODE_SEP
+from conftest import random_formula
+
+VARIABLES = ["a", "b", "c", "d", "e"]
+
+
+def diagram(formula):
+    bdd = BDD(formula, labels=False)
+    bdd.build_robdd()
+    return bdd
+
+
+def check_layout(root, layout):
+    nodes = list(BDD.walk(root, False))
+    assert set(layout["nodes_json"]) == {("node_%d" % n.id) if n.var is not None else
+                                         "terminal_" + str(n.expr).lower() for n in nodes}
+    by_name = {str(n.id): n for n in nodes}
+    geometry = layout["nodes"]
+    # deeper levels lower down, terminals at the bottom
+    for a in nodes:
+        for b in nodes:
+            la = a.level if a.var is not None else len(VARIABLES)
+            lb = b.level if b.var is not None else len(VARIABLES)
+            if la < lb:
+                assert geometry[str(a.id)]["y"] > geometry[str(b.id)]["y"]
+    # nodes of a rank do not overlap
+    rows = {}
+    for name, g in geometry.items():
+        rows.setdefault(g["y"], []).append(g)
+    for row in rows.values():
+        row.sort(key=lambda g: g["x"])
+        for g, h in zip(row, row[1:]):
+            assert h["x"] - g["x"] >= (g["w"] + h["w"]) / 2 + NODE_SEP - 1e-6
+    # inside the box, one edge per branch, ending on the borders of its nodes
+    for g in geometry.values():
+        assert 0 <= g["x"] - g["w"] / 2 and g["x"] + g["w"] / 2 <= layout["bbox"]["width"] + 1e-6
+    assert len(layout["edges"]) == sum(len(list(BDD.children(n))) for n in nodes)
+    for e in layout["edges"]:
+        tail, head = geometry[e["tail"]], geometry[e["head"]]
+        (x0, y0), (x1, y1) = e["points"][0], e["points"][-1]
+        assert abs(x0 - tail["x"]) <= tail["w"] / 2 + 1e-6 and abs(y0 - tail["y"]) <= tail["h"] / 2 + 1e-6
+        assert abs(x1 - head["x"]) <= head["w"] / 2 + 1e-6 and abs(y1 - head["y"]) <= head["h"] / 2 + 1e-6
+        node = by_name[e["tail"]]
+        assert e["head"] == str((node.high if e["style"] == "solid" else node.low).id)
+
+
+def test_sugiyama(rng):
+    for _ in range(30):
+        bdd = diagram(random_formula(rng, VARIABLES, 4) + "|(a&b&c&d&e)")
+        root = bdd.robdd_root
+        if root.var is None:
+            continue
+        check_layout(root, sugiyama_layout(root))
+
+
+def test_sugiyama_unreduced():
+    bdd = diagram("a&b|c")
+    bdd.build_bdd()
+    layout = sugiyama_layout(bdd.root)
+    check_layout(bdd.root, layout)
+
+
+def test_no_crossings():
+    # a chain of ands has a planar drawing
+    bdd = diagram("a&b&c&d")
+    assert sugiyama_layout(bdd.robdd_root)["crossings"] == 0
+
+
+def test_crossings():
+    assert _crossings([(0, 0), (1, 1)]) == 0
+    assert _crossings([(0, 1), (1, 0)]) == 1
+    assert _crossings([(0, 2), (1, 1), (2, 0)]) == 3
+
+
+def test_export_layout(client):
+    assert client.post("/api/bdd/generate", json={"formula": "a&b|c"}).status_code == 200
+    r = client.post("/api/export/layout", json={"formula": "a&b|c", "engine": "native", "eval_path": "a:1 b:1 c:0"})
+    assert r.status_code == 200, r.text
+    layout = r.json()["layout"]
+    assert layout["highlight"]["nodes"][-1] == "terminal_true"
+    assert set(layout["highlight"]["nodes"]) <= set(layout["nodes_json"])
+
+
+@pytest.mark.parametrize("body", [
+    {"formula": "a&b|c", "engine": "foo"},
+    {"formula": "a&b|c", "engine": 1},
+    {"formula": 1},
+])
+def test_export_layout_400(client, body):
+    r = client.post("/api/export/layout", json=body)
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"
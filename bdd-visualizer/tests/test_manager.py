@@ -0,0 +1,74 @@
+import pytest
+
+from app.core.manager import BDDManager, FALSE, TRUE
+from app.core.parser import parse_formula
+from conftest import random_formula, value, truth_table, node_value
+
+VARIABLES = ["a", "b", "c", "d", "e"]
+
+
+def table_of(mgr, u):
+    return truth_table(lambda values: node_value(mgr, u, values), mgr.var_order)
+
+
+def test_build_matches_truth_table(rng):
+    mgr = BDDManager(VARIABLES)
+    for _ in range(200):
+        formula = random_formula(rng, VARIABLES, 4)
+        ast = parse_formula(formula)
+        assert table_of(mgr, mgr.build(ast)) == truth_table(lambda values: value(ast, values), VARIABLES), formula
+
+
+@pytest.mark.parametrize("op, fn", [
+    ("&", lambda x, y: x and y),
+    ("|", lambda x, y: x or y),
+    ("^", lambda x, y: x != y),
+    ("->", lambda x, y: (not x) or y),
+    ("<->", lambda x, y: x == y),
+])
+def test_apply(rng, op, fn):
+    mgr = BDDManager(VARIABLES)
+    for _ in range(50):
+        f = mgr.build(parse_formula(random_formula(rng, VARIABLES)))
+        g = mgr.build(parse_formula(random_formula(rng, VARIABLES)))
+        expected = [fn(x, y) for x, y in zip(table_of(mgr, f), table_of(mgr, g))]
+        assert table_of(mgr, mgr.apply(op, f, g)) == expected
+
+
+def test_ite_and_not(rng):
+    mgr = BDDManager(VARIABLES)
+    for _ in range(50):
+        f, g, h = (mgr.build(parse_formula(random_formula(rng, VARIABLES))) for _ in range(3))
+        expected = [y if x else z for x, y, z in zip(table_of(mgr, f), table_of(mgr, g), table_of(mgr, h))]
+        assert table_of(mgr, mgr.ite(f, g, h)) == expected
+        assert table_of(mgr, mgr.apply_not(f)) == [not x for x in table_of(mgr, f)]
+
+
+def test_equal_functions_share_a_node(rng):
+    mgr = BDDManager(VARIABLES)
+    nodes = {}
+    for _ in range(300):
+        f = mgr.build(parse_formula(random_formula(rng, VARIABLES, 3)))
+        key = tuple(table_of(mgr, f))
+        assert nodes.setdefault(key, f) == f
+    assert mgr.build(parse_formula("a|~a")) == TRUE
+    assert mgr.build(parse_formula("a&~a")) == FALSE
+
+
+def test_reduced():
+    mgr = BDDManager(VARIABLES)
+    f = mgr.build(parse_formula("(a&b)|(~a&b)|(c^c)"))
+    assert f == mgr.var("b")
+    for u in mgr.nodes(mgr.build(parse_formula("a&b|c&d|e"))):
+        if not mgr.is_terminal(u):
+            assert mgr.low[u] != mgr.high[u]
+
+
+def test_deep_formula_is_not_recursive():
+    # far deeper than the recursion limit, each step adds one node on top in this order
+    variables = [f"x{i}" for i in range(5000)]
+    mgr = BDDManager(variables[::-1])
+    f = mgr.build(parse_formula("&".join(variables)))
+    assert mgr.size(f) == len(variables) + 2
+    g = mgr.build(parse_formula("(" * len(variables) + ")&".join(variables) + ")"))
+    assert g == f
@@ -0,0 +1,106 @@
+import pytest
+
+from app.core.parser import parse_formula
+from conftest import random_formula, value, truth_table
+
+VARIABLES = ["a", "b", "c", "d"]
+FUNCTIONS = {
+    "and": lambda x, y: x and y,
+    "or": lambda x, y: x or y,
+    "xor": lambda x, y: x != y,
+    "implies": lambda x, y: (not x) or y,
+    "equiv": lambda x, y: x == y,
+}
+
+
+def fn(formula):
+    ast = parse_formula(formula)
+    # variables the formula does not use make no difference
+    return lambda values: value(ast, dict(values, **{v: 0 for v in VARIABLES if v not in values}))
+
+
+def table(formula):
+    return truth_table(fn(formula), VARIABLES)
+
+
+def diagram_id(client, formula):
+    r = client.post("/api/bdd/generate", json={"formula": formula})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def operation(client, path, body):
+    r = client.post(f"/api/bdd/{path}", json=body)
+    assert r.status_code == 200, r.text
+    out = r.json()
+    # the result is a diagram id of its own, usable as an operand
+    assert out["id"] and out["size"] >= 1
+    return out["formula"]
+
+
+def test_apply(client, rng):
+    for _ in range(10):
+        left, right = random_formula(rng, VARIABLES, 3), random_formula(rng, VARIABLES, 3)
+        ids = diagram_id(client, left), diagram_id(client, right)
+        for op, f in FUNCTIONS.items():
+            formula = operation(client, "apply", {"op": op, "left": ids[0], "right": ids[1], "include_graph": False})
+            expected = [f(x, y) for x, y in zip(table(left), table(right))]
+            if formula in ("True", "False"):
+                assert set(expected) == {formula == "True"}
+            else:
+                assert table(formula) == expected, (left, op, right)
+
+
+def test_restrict(client, rng):
+    for _ in range(10):
+        formula = random_formula(rng, VARIABLES, 3) + "&(a|b|~a)"
+        got = operation(client, "restrict", {"id": diagram_id(client, formula), "values": "a:1 b:0"})
+        f = fn(formula)
+        expected = truth_table(lambda v: f(dict(v, a=1, b=0)), VARIABLES)
+        assert (table(got) if got not in ("True", "False") else [got == "True"] * 16) == expected, formula
+
+
+@pytest.mark.parametrize("quantifier, combine", [("exists", any), ("forall", all)])
+def test_quantify(client, rng, quantifier, combine):
+    for _ in range(10):
+        formula = random_formula(rng, VARIABLES, 3) + "&(a|b|~a)"
+        got = operation(client, "quantify", {"id": diagram_id(client, formula), "variables": ["a", "b"],
+                                             "quantifier": quantifier})
+        f = fn(formula)
+        expected = truth_table(lambda v: combine(f(dict(v, a=x, b=y)) for x in (0, 1) for y in (0, 1)), VARIABLES)
+        assert (table(got) if got not in ("True", "False") else [got == "True"] * 16) == expected, formula
+
+
+def test_compose(client, rng):
+    for _ in range(10):
+        formula = random_formula(rng, VARIABLES, 3) + "&(a|~a)"
+        by = random_formula(rng, ["b", "c", "d"], 2)
+        got = operation(client, "compose", {"id": diagram_id(client, formula), "var": "a",
+                                            "by": diagram_id(client, by)})
+        f, g = fn(formula), fn(by)
+        expected = truth_table(lambda v: f(dict(v, a=int(g(v)))), VARIABLES)
+        assert (table(got) if got not in ("True", "False") else [got == "True"] * 16) == expected, (formula, by)
+
+
+@pytest.mark.parametrize("path, body", [
+    ("apply", {"op": ["and"], "left": "x", "right": "y"}),
+    ("apply", {"op": {"and": 1}, "left": "x", "right": "y"}),
+    ("apply", {"op": "nand", "left": "x", "right": "y"}),
+    ("restrict", {"id": "x", "values": 1}),
+    ("restrict", {"id": "x", "values": [1]}),
+])
+def test_operation_400(client, path, body):
+    r = client.post(f"/api/bdd/{path}", json=body)
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"
+
+
+def test_restrict_values_400(client):
+    diagram = diagram_id(client, "a&b")
+    for values in ({"a": 2}, {"z": 1}, "a=1", {"a": [1]}):
+        r = client.post("/api/bdd/restrict", json={"id": diagram, "values": values})
+        assert r.status_code == 400, (values, r.text)
+
+
+def test_unknown_id(client):
+    assert client.post("/api/bdd/restrict", json={"id": "nope", "values": "a:1"}).status_code == 404
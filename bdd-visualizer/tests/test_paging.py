@@ -0,0 +1,59 @@
+import pytest
+
+FORMULA = "a&b|c^d"
+
+
+def graph(client, **fields):
+    r = client.post("/api/bdd/generate", json=dict({"formula": FORMULA, "graph_type": "bdd"}, **fields))
+    assert r.status_code == 200, r.text
+    return r.json()["graph"]
+
+
+def test_pages_cover_the_tree(client):
+    whole = graph(client)["nodes"]
+    seen = {}
+    for page in range(10):
+        g = graph(client, page=page, page_size=5)
+        assert not set(g["nodes"]) & set(seen) - {"terminal_true", "terminal_false"}
+        seen.update(g["nodes"])
+        if not g["page"]["has_more"]:
+            break
+    assert seen == whole
+    assert g["page"]["total"] == len(whole)
+
+
+def test_max_depth(client):
+    g = graph(client, max_depth=1)
+    levels = {n["level"] for n in g["nodes"].values() if n["var"] is not None}
+    assert levels == {0, 1}
+
+
+@pytest.mark.parametrize("fields", [
+    {"max_depth": "2"},
+    {"max_depth": -1},
+    {"max_depth": True},
+    {"page": {}},
+    {"page": 1.5},
+    {"page_size": ""},
+])
+def test_paging_400(client, fields):
+    body = dict({"formula": FORMULA, "graph_type": "bdd"}, **fields)
+    for path in ("/api/bdd/generate", "/api/export/json"):
+        r = client.post(path, json=body)
+        assert r.status_code == 400, (path, r.text)
+        assert r.json()["status"] == "error"
+    r = client.post("/api/bdd/generate-batch", json=dict(body, formulas=[FORMULA]))
+    assert r.status_code == 400, r.text
+    r = client.post("/api/bdd/apply", json=dict(body, op="and", left="x", right="y"))
+    assert r.status_code == 400, r.text
+    if "max_depth" in fields:
+        r = client.post("/api/export/layout", json=body)
+        assert r.status_code == 400, r.text
+
+
+def test_export_json_page(client):
+    graph(client)
+    r = client.post("/api/export/json", json={"formula": FORMULA, "graph_type": "bdd", "page": "x"})
+    assert r.status_code == 400
+    r = client.post("/api/export/json", json={"formula": FORMULA, "graph_type": "bdd", "page": 0, "page_size": 3})
+    assert r.status_code == 200 and r.json()["json"]["page"]["count"] == 3
@@ -0,0 +1,41 @@
+import time
+
+from app.core.parser import parse_formula
+from app.core import reorder as reorder_module
+from app.core.reorder import Budget, parallel_search
+from conftest import random_formula, size_in
+
+VARIABLES = ["a", "b", "c", "d", "e"]
+
+
+def test_shared_deadline():
+    assert Budget(10, deadline=time.time() - 1).expired()
+    assert not Budget(None, deadline=time.time() + 10).expired()
+    assert Budget(0.001, deadline=time.time() + 10).deadline < Budget(10).deadline
+
+
+def test_parallel_search_shares_the_time_budget(monkeypatch):
+    # seeds run one after the other here: together they take the time budget, not the budget each
+    def slow_seed(job):
+        time.sleep(0.1)
+        return 1, job[1], False, False
+
+    monkeypatch.setattr(reorder_module, "search_seed", slow_seed)
+    ast = parse_formula("a&d|b&e|c&f")
+    start = time.time()
+    info = parallel_search(ast, "a&d|b&e|c&f", ["a", "b", "c", "d", "e", "f"], n_seeds=30, time_budget=0.3)
+    assert time.time() - start < 1.5
+    assert 1 <= info["seeds"] < 30
+
+
+def test_parallel_search(rng):
+    for _ in range(5):
+        ast = parse_formula(random_formula(rng, VARIABLES, 4))
+        info = parallel_search(ast, "", VARIABLES, n_seeds=4)
+        assert info["size"] == size_in(ast, info["order"])
+        assert sorted(info["order"]) == sorted(VARIABLES)
+
+
+def test_seeds_400(client):
+    r = client.post("/api/bdd/generate", json={"formula": "a&b", "auto_order": "parallel", "seeds": 0})
+    assert r.status_code == 400, r.text
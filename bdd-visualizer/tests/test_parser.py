@@ -0,0 +1,50 @@
+import pytest
+
+from app.core.parser import FormulaError, parse_formula
+from conftest import value, truth_table
+
+
+@pytest.mark.parametrize("formula, fn", [
+    # ~ binds tightest, then &, |, ^, ->, <->
+    ("~a&b", lambda a, b, c: (not a) and b),
+    ("a|b&c", lambda a, b, c: a or (b and c)),
+    ("a^b|c", lambda a, b, c: a != (b or c)),
+    ("a->b^c", lambda a, b, c: (not a) or (b != c)),
+    ("a<->b->c", lambda a, b, c: a == ((not b) or c)),
+    # -> is right associative, the others left associative
+    ("a->b->c", lambda a, b, c: (not a) or ((not b) or c)),
+    ("a<->b<->c", lambda a, b, c: (a == b) == c),
+    ("(a->b)->c", lambda a, b, c: (not ((not a) or b)) or c),
+    ("~~a", lambda a, b, c: bool(a)),
+    ("~(a|b)&c", lambda a, b, c: (not (a or b)) and c),
+])
+def test_precedence(formula, fn):
+    ast = parse_formula(formula)
+    variables = ["a", "b", "c"]
+    assert truth_table(lambda v: value(ast, v), variables) == truth_table(lambda v: fn(v["a"], v["b"], v["c"]), variables)
+
+
+@pytest.mark.parametrize("formula, pos", [
+    ("a&&b", 2),
+    ("a&(b", 4),
+    ("a)", 1),
+    ("a$b", 1),
+    ("", 0),
+    ("a b", 2),
+])
+def test_syntax_errors(formula, pos):
+    with pytest.raises(FormulaError) as e:
+        parse_formula(formula)
+    assert e.value.pos == pos
+
+
+def test_shared_subterms():
+    ast = parse_formula("(a&b)|(a&b)")
+    assert ast[0] is ast[2]
+
+
+
+def test_deep_nesting():
+    # the parser keeps its own stack: nesting far deeper than the recursion limit parses
+    ast = parse_formula("(" * 5000 + "a" + "&b)" * 5000)
+    assert ast[1] == "&" and ast[2] == "b"
@@ -0,0 +1,85 @@
+import time
+import asyncio
+
+import pytest
+
+from app.core.manager import BDDManager
+from app.utils import pool
+
+
+def test_deadline_fires_once(monkeypatch):
+    # the cleanup of an interrupted job outlasts CHECK_INTERVAL and still runs to its end
+    monkeypatch.setattr(pool, "_cancel_flags", [0])
+    BDDManager.shared(["a", "b"])
+    cleaned = []
+
+    def job():
+        try:
+            time.sleep(5)
+        finally:
+            time.sleep(4 * pool.CHECK_INTERVAL)
+            cleaned.append(True)
+
+    start = time.time()
+    with pytest.raises(TimeoutError):
+        pool._run_job(0, time.time() + 0.2, job, ())
+    assert time.time() - start < 2
+    assert cleaned == [True]
+    assert BDDManager.stats()["managers"] == 0
+
+
+def test_cancel_flag(monkeypatch):
+    flags = [0]
+    monkeypatch.setattr(pool, "_cancel_flags", flags)
+
+    def job():
+        flags[0] = 1
+        time.sleep(5)
+
+    with pytest.raises(pool.JobCancelled):
+        pool._run_job(0, time.time() + 10, job, ())
+
+
+def test_worker_past_deadline(monkeypatch):
+    # a real worker process: the job is stopped in the worker, which then takes the next job
+    monkeypatch.setattr(pool, "POOL_WORKERS", 1)
+
+    async def run():
+        assert await pool.run_in_pool(pow, 2, 3, timeout=30) == 8
+        start = time.time()
+        with pytest.raises((TimeoutError, pool.JobCancelled)):
+            await pool.run_in_pool(time.sleep, 30, timeout=0.5)
+        assert await pool.run_in_pool(pow, 2, 5, timeout=10) == 32
+        return time.time() - start
+
+    try:
+        assert asyncio.run(run()) < 10
+    finally:
+        pool.shutdown_process_pool()
+
+
+@pytest.mark.parametrize("timeout", ["abc", -1, 0, True, [5]])
+def test_timeout_400(client, timeout):
+    # every endpoint with a deadline refuses a bad one before any work
+    assert client.post("/api/bdd/generate", json={"formula": "a|b"}).status_code == 200
+    for path, body in [
+        ("/api/bdd/generate", {"formula": "a|b"}),
+        ("/api/bdd/evaluate", {"formula": "a|b", "assignments": ["01"]}),
+        ("/api/bdd/satcount", {"formula": "a|b"}),
+        ("/api/bdd/apply", {"op": "and", "left": "x", "right": "y"}),
+        ("/api/bdd/equivalent", {"left": "a", "right": "b"}),
+        ("/api/bdd/generate-batch", {"formulas": ["a|b"]}),
+        ("/api/export/layout", {"formula": "a|b"}),
+        ("/api/export/latex", {"formula": "a|b", "engine": "native"}),
+    ]:
+        r = client.post(path, json=dict(body, timeout=timeout))
+        assert r.status_code == 400, (path, r.text)
+        assert r.json()["status"] == "error"
+    with client.websocket_connect("/api/bdd/construct/ws") as ws:
+        ws.send_json({"formula": "a|b", "timeout": timeout})
+        assert ws.receive_json()["code"] == 400
+    assert client.get("/api/bdd/construct", params={"formula": "a|b", "timeout": -1}).status_code == 400
+
+
+def test_numeric_string_timeout(client):
+    assert client.post("/api/bdd/generate", json={"formula": "a|b", "timeout": "5"}).status_code == 200
@@ -0,0 +1,83 @@
+import itertools
+
+import pytest
+
+from app.core.parser import parse_formula
+from app.core.reorder import Budget, local_sift, sift, window_permute, exact_order, reorder
+from conftest import random_formula, value, truth_table, node_value, collected, size_in
+
+VARIABLES = ["a", "b", "c", "d", "e"]
+
+
+def function_of(mgr, f):
+    # truth table over the fixed VARIABLES, whatever the order of mgr
+    return truth_table(lambda values: node_value(mgr, f, values), VARIABLES)
+
+
+def formulas(rng, n=25):
+    return [parse_formula(random_formula(rng, VARIABLES, 4)) for _ in range(n)]
+
+
+@pytest.mark.parametrize("search", [
+    local_sift,
+    sift,
+    lambda mgr, budget: window_permute(mgr, budget, 2),
+    lambda mgr, budget: window_permute(mgr, budget, 3),
+])
+def test_search_keeps_function_and_reports_true_size(rng, search):
+    for ast in formulas(rng):
+        expected = truth_table(lambda values: value(ast, values), VARIABLES)
+        mgr, f = collected(ast, VARIABLES)
+        before = mgr.size(f)
+        search(mgr, Budget())
+        assert function_of(mgr, f) == expected
+        assert mgr.size(f) == size_in(ast, mgr.var_order) <= before
+
+
+@pytest.mark.parametrize("strategy", ["ls", "sift", "win2", "win3", "exact"])
+def test_reorder_report(rng, strategy):
+    for ast in formulas(rng, 10):
+        mgr, f = collected(ast, VARIABLES)
+        info = reorder(mgr, f, strategy, Budget())
+        assert info["order"] == mgr.var_order
+        assert info["size"] == size_in(ast, info["order"])
+        assert not info["timed_out"] and not info["over_budget"]
+
+
+def test_exact_is_the_optimum(rng):
+    for ast in formulas(rng):
+        expected = truth_table(lambda values: value(ast, values), VARIABLES)
+        mgr, f = collected(ast, VARIABLES)
+        assert exact_order(mgr, f, Budget())
+        assert function_of(mgr, f) == expected
+        assert mgr.size(f) == min(size_in(ast, order) for order in itertools.permutations(VARIABLES))
+
+
+def test_exact_known_order():
+    # pairs side by side are linear, interleaved they are exponential
+    ast = parse_formula("a&d|b&e|c&f")
+    mgr, f = collected(ast, ["a", "b", "c", "d", "e", "f"])
+    assert mgr.size(f) == 16
+    exact_order(mgr, f, Budget())
+    assert mgr.size(f) == 8
+
+
+def test_node_budget_stops_the_search():
+    ast = parse_formula("a&d|b&e|c&f")
+    mgr, f = collected(ast, ["a", "d", "b", "e", "c", "f"])
+    budget = Budget(node_budget=1)
+    sift(mgr, budget)
+    assert budget.over_budget
+    assert mgr.size(f) == size_in(ast, mgr.var_order)
+
+
+@pytest.mark.parametrize("body", [
+    {"formula": "a&b", "auto_order": "best"},
+    {"formula": "a&b", "auto_order": "sift", "time_budget": "soon"},
+    {"formula": "a&b", "auto_order": "sift", "time_budget": -1},
+    {"formula": "a&b", "auto_order": "sift", "node_budget": 1.5},
+])
+def test_auto_order_400(client, body):
+    r = client.post("/api/bdd/generate", json=body)
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"
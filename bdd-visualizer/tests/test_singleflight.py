@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.utils import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_coalesces_identical_calls():
+    calls = []
+
+    async def work(is_disconnected):
+        calls.append(1)
+        n = len(calls)
+        await asyncio.sleep(0.05)
+        return n
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)), flight.do("other", work))
+        assert flight.stats() == {"in_flight": 0, "coalesced": 4}
+        # done calls are forgotten, the next one runs again
+        assert await flight.do("k", work) == 3
+        return results
+
+    results = run(main())
+    assert len(set(results[:5])) == 1 and results[5] != results[0]
+
+
+def test_error_reaches_every_waiter():
+    async def fail(is_disconnected):
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    assert [type(r) for r in run(main())] == [ValueError, ValueError]
+
+
+def test_a_waiter_leaving_does_not_cancel_the_work():
+    async def work(is_disconnected):
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    run(main())
+
+
+def test_disconnected_once_every_waiter_is_gone():
+    seen = []
+    gone = {"a": False, "b": False}
+
+    async def work(is_disconnected):
+        seen.append(await is_disconnected())
+        gone["a"] = True
+        seen.append(await is_disconnected())
+        gone["b"] = True
+        seen.append(await is_disconnected())
+        return None
+
+    async def main():
+        flight = SingleFlight()
+
+        async def a():
+            return gone["a"]
+
+        async def b():
+            return gone["b"]
+
+        await asyncio.gather(flight.do("k", work, a), flight.do("k", work, b))
+
+    run(main())
+    assert seen == [False, False, True]
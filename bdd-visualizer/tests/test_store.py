@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from app.utils import store
+from app.utils.store import DiskStore
+
+
+@pytest.fixture
+def disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(DiskStore, "PATH", str(tmp_path / "sub" / "store.sqlite3"))
+    return DiskStore
+
+
+def test_round_trip(disk):
+    key = disk.key("robdd", ["a", "b"], None)
+    assert disk.get("robdd", key) is None
+    disk.put("robdd", key, {"root": 3, "low": [0, 1]})
+    assert disk.get("robdd", key) == {"root": 3, "low": [0, 1]}
+    # kinds do not share entries
+    assert disk.get("json", key) is None
+    assert disk.stats()["entries"]["robdd"]["count"] == 1
+    assert os.path.exists(disk.PATH)
+
+
+def test_key():
+    assert DiskStore.key("json", {"b": 1, "a": 2}) == DiskStore.key("json", {"a": 2, "b": 1})
+    assert DiskStore.key("json", [1, 2]) != DiskStore.key("json", [2, 1])
+
+
+def test_format_version(disk, monkeypatch):
+    # entries written by code of another format version are never read
+    key = disk.key("json", "a&b")
+    disk.put("json", key, {"graph": "old"})
+    monkeypatch.setattr(DiskStore, "FORMAT_VERSION", DiskStore.FORMAT_VERSION + 1)
+    new_key = disk.key("json", "a&b")
+    assert new_key != key
+    assert disk.get("json", new_key) is None
+
+
+def test_prune(disk, monkeypatch):
+    monkeypatch.setattr(DiskStore, "MAX_MB", 0.5)
+    payload = os.urandom(2000).hex()
+    for i in range(300):
+        disk.put("layout", disk.key(i), payload)
+    disk.prune()
+    assert 0 < disk.stats()["entries"]["layout"]["bytes"] <= 0.5 * 1024 * 1024
+    # the newest entry is kept, the oldest went first
+    assert disk.get("layout", disk.key(299)) == payload
+    assert disk.get("layout", disk.key(0)) is None
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(DiskStore, "PATH", "")
+    DiskStore.put("json", "k", 1)
+    assert DiskStore.get("json", "k") is None
+    assert DiskStore.stats() == {"enabled": False}
+
+
+def test_failures_are_misses(tmp_path, monkeypatch):
+    # a path that cannot be created: reads miss, writes are dropped
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setattr(DiskStore, "PATH", str(blocker / "store.sqlite3"))
+    DiskStore.put("json", "k", 1)
+    assert DiskStore.get("json", "k") is None
+
+
+def test_data_dir():
+    assert os.path.isabs(store.DATA_DIR)
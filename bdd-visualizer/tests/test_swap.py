@@ -0,0 +1,17 @@
+from app.core.parser import parse_formula
+from conftest import random_formula, value, truth_table, node_value, collected, size_in
+
+VARIABLES = ["a", "b", "c", "d", "e"]
+
+
+def test_swap_keeps_function_and_size(rng):
+    for _ in range(25):
+        ast = parse_formula(random_formula(rng, VARIABLES, 4))
+        expected = truth_table(lambda values: value(ast, values), VARIABLES)
+        mgr, f = collected(ast, VARIABLES)
+        for _ in range(20):
+            mgr.swap(rng.randrange(len(VARIABLES) - 1))
+            assert truth_table(lambda values: node_value(mgr, f, values), VARIABLES) == expected
+            # live counts the decision nodes, the size is that of a fresh build in the new order
+            assert mgr.live == sum(not mgr.is_terminal(u) for u in mgr.nodes(f))
+            assert mgr.size(f) == size_in(ast, mgr.var_order)
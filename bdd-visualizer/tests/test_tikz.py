@@ -0,0 +1,60 @@
+import pytest
+
+from app.core.bdd import BDD
+from app.export import bdd2tex, bdd2layout
+from app.export.layout_export import highlight_overlay
+from app.export.tikz_export import layout2tex
+
+
+def diagram(formula):
+    bdd = BDD(formula, labels=False)
+    bdd.build_robdd()
+    return bdd
+
+
+def test_native_tikz():
+    bdd = diagram("(a&b)|c")
+    root = bdd.robdd_root
+    tex = bdd2tex(root, engine="native")
+    assert tex.startswith("\\begin{tikzpicture}") and tex.rstrip().endswith("\\end{tikzpicture}")
+    layout = bdd2layout(root, engine="native")
+    # a node per node of the layout, a path per edge
+    assert tex.count("\\node") == len(layout["nodes_json"])
+    assert tex.count("\\draw") == len(layout["edges_json"])
+    assert tex.count("dashed") == sum(e["style"] == "dashed" for e in layout["edges_json"])
+    assert "orange" not in tex
+    # the given layout is the one drawn
+    assert bdd2tex(root, engine="native", layout=layout) == tex
+
+
+def test_native_tikz_highlight():
+    bdd = diagram("a&b")
+    root = bdd.robdd_root
+    overlay = highlight_overlay(root, "a:1 b:1")
+    tex = layout2tex(root, bdd2layout(root, engine="native"), overlay)
+    assert tex.count("fill=orange") == len(overlay["nodes"]) == 3
+    assert tex.count("draw=orange") == len(overlay["edges"]) == 2
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        bdd2tex(diagram("a").robdd_root, engine="foo")
+
+
+def test_export_latex(client):
+    assert client.post("/api/bdd/generate", json={"formula": "a|b&c"}).status_code == 200
+    r = client.post("/api/export/latex", json={"formula": "a|b&c", "engine": "native", "eval_path": "a:0 b:1 c:1"})
+    assert r.status_code == 200, r.text
+    assert "fill=orange" in r.json()["latex"]
+
+
+@pytest.mark.parametrize("body", [
+    {"formula": "a|b&c", "engine": "foo"},
+    {"formula": "a|b&c", "engine": ["native"]},
+    {"formula": 3},
+    {"formula": ["a"]},
+])
+def test_export_latex_400(client, body):
+    r = client.post("/api/export/latex", json=body)
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"
@@ -0,0 +1,55 @@
+import pytest
+
+from app.core.manager import BDDManager
+from app.core.nodestore import NodeStore
+from app.core.parser import parse_formula
+from app.core.truthtable import build_truthtable
+from conftest import random_formula, value, truth_table, node_value
+
+
+def structure(mgr, f):
+    store = NodeStore.from_manager(mgr, f, mgr.var_order)
+    return store.root, store.level.tolist(), store.low.tolist(), store.high.tolist()
+
+
+@pytest.mark.parametrize("variables", [["a"], ["a", "b"], ["a", "b", "c"], ["a", "b", "c", "d", "e"],
+                                       [f"x{i}" for i in range(10)]])
+def test_truthtable_matches_apply(rng, variables):
+    # tables shorter than a byte, of a few bytes and of many bytes
+    for _ in range(40):
+        formula = random_formula(rng, variables, 4)
+        ast = parse_formula(formula)
+        by_table, by_apply = BDDManager(variables), BDDManager(variables)
+        f, g = build_truthtable(by_table, ast), by_apply.build(ast)
+        assert truth_table(lambda v: node_value(by_table, f, v), variables) == \
+            truth_table(lambda v: value(ast, v), variables), formula
+        assert by_table.size(f) == by_apply.size(g), formula
+        assert structure(by_table, f) == structure(by_apply, g), formula
+
+
+@pytest.mark.parametrize("formula", ["a->b->c", "a<->b<->c", "a^b^c", "~(a->b)", "a&~a", "a|~a"])
+def test_truthtable_chains(formula):
+    variables = ["a", "b", "c"]
+    ast = parse_formula(formula)
+    mgr = BDDManager(variables)
+    f = build_truthtable(mgr, ast)
+    assert truth_table(lambda v: node_value(mgr, f, v), variables) == truth_table(lambda v: value(ast, v), variables)
+
+
+def test_generate_truthtable_engine(client, rng):
+    variables = ["a", "b", "c", "d"]
+    for _ in range(10):
+        formula = random_formula(rng, variables, 3)
+        graphs = [client.post("/api/bdd/generate", json={"formula": formula, "engine": engine}).json()["graph"]
+                  for engine in ("truthtable", "apply")]
+        assert graphs[0] == graphs[1], formula
+
+
+@pytest.mark.parametrize("body", [
+    {"formula": "a&b", "engine": "magic"},
+    {"formula": "&".join(f"x{i}" for i in range(25)), "engine": "truthtable"},
+])
+def test_engine_400(client, body):
+    r = client.post("/api/bdd/generate", json=body)
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"
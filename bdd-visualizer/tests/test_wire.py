@@ -0,0 +1,85 @@
+import gzip
+import json
+
+import pytest
+
+from app.utils import wire
+from app.utils.wire import check_format, make_etag, etag_matches, encode, compress
+
+
+class Headers:
+    def __init__(self, **headers):
+        self.headers = {k.replace("_", "-"): v for k, v in headers.items()}
+
+
+def test_check_format():
+    check_format("json")
+    check_format("columns")
+    with pytest.raises(ValueError):
+        check_format("xml")
+
+
+def test_etag():
+    etag = make_etag("key", "json")
+    assert etag.startswith('W/"') and etag == make_etag("key", "json")
+    assert etag != make_etag("key", "columns")
+    assert etag != make_etag("other", "json")
+
+
+def test_etag_matches():
+    etag = make_etag("key", "json")
+    assert etag_matches(Headers(if_none_match=etag), etag)
+    assert etag_matches(Headers(if_none_match=etag[2:]), etag)      # weak comparison
+    assert etag_matches(Headers(if_none_match=f'"x", {etag}'), etag)
+    assert etag_matches(Headers(if_none_match="*"), etag)
+    assert not etag_matches(Headers(if_none_match='"x"'), etag)
+    assert not etag_matches(Headers(), etag)
+
+
+def test_encode_json():
+    payload = {"a": [1, 2, {"b": None}], "c": "d"}
+    body, media_type = encode(payload)
+    assert media_type == "application/json"
+    assert json.loads(body) == payload
+
+
+def test_compress():
+    body = json.dumps(list(range(2000))).encode()
+    small = b"{}"
+    assert compress(small, "gzip") == (small, None)
+    assert compress(body, None) == (body, None)
+    assert compress(body, "identity") == (body, None)
+    if wire.brotli is None:
+        packed, encoding = compress(body, "gzip, br")
+        assert encoding == "gzip" and gzip.decompress(packed) == body
+
+
+def test_generate_etag(client):
+    r = client.post("/api/bdd/generate", json={"formula": "a&b|c"})
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    again = client.post("/api/bdd/generate", json={"formula": "a&b|c"}, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.headers["etag"] == etag
+    other = client.post("/api/bdd/generate", json={"formula": "a&b|c", "labels": False}, headers={"If-None-Match": etag})
+    assert other.status_code == 200 and other.headers["etag"] != etag
+
+
+def test_generate_columns(client):
+    graph = client.post("/api/bdd/generate", json={"formula": "a&b|c"}).json()["graph"]
+    columns = client.post("/api/bdd/generate", json={"formula": "a&b|c", "format": "columns"}).json()["graph"]
+    assert columns["format"] == "columns"
+    assert columns["count"] == len(graph["nodes"])
+    assert columns["variables"] == graph["variables"]
+
+
+def test_generate_gzip(client):
+    formula = "|".join(f"x{i}&y{i}" for i in range(12))
+    r = client.post("/api/bdd/generate", json={"formula": formula}, headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200 and r.headers.get("content-encoding") == "gzip"
+    assert r.json()["status"] == "success"
+
+
+def test_format_400(client):
+    r = client.post("/api/bdd/generate", json={"formula": "a&b", "format": "xml"})
+    assert r.status_code == 400, r.text
+    assert r.json()["status"] == "error"